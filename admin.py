@@ -0,0 +1,490 @@
+"""
+Admin control plane for a running GameServer.
+Serves a small JSON API over HTTP, bound to loopback by default, for live
+stats, listing and stopping sessions, broadcasting SERVER_MESSAGE, changing
+logging and profiling, leaderboards, and draining the server before a restart.
+Every request must carry the server's bearer token, and POST bodies must be
+sent as application/json, so web pages cannot forge requests to it.
+Run this module to send commands to a server's admin API.
+"""
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+from profiling import TRACE_FORMATS
+
+if TYPE_CHECKING:
+    from server import GameServer
+
+
+DEFAULT_ADMIN_HOST = '127.0.0.1'
+DEFAULT_ADMIN_PORT = 8001
+
+# Largest request body the API accepts
+MAX_BODY_SIZE = 64 * 1024
+
+# Environment variable holding the admin token; overrides the token file
+ADMIN_TOKEN_ENV = 'SOCKCONNECT_ADMIN_TOKEN'
+
+# File the server keeps its admin token in, readable only by its user
+DEFAULT_ADMIN_TOKEN_PATH = os.path.join(os.path.expanduser('~'), '.sockconnect', 'admin_token')
+
+_SESSION_PATH = re.compile(r'^/sessions/(\d+)/stop$')
+
+
+class AdminError(Exception):
+    """A request the admin API refuses, with the HTTP status to answer with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _AdminHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], admin: 'AdminServer'):
+        super().__init__(address, _AdminRequestHandler)
+        self.admin = admin
+
+
+class _AdminRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'GameServerAdmin/1.0'
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method: str):
+        try:
+            self._authorize()
+            body = self._read_body() if method == 'POST' else {}
+            status, result = 200, self.server.admin.handle(method, self.path, body)
+        except AdminError as e:
+            status, result = e.status, {'error': str(e)}
+        except Exception as e:
+            status, result = 500, {'error': f"{type(e).__name__}: {e}"}
+
+        if isinstance(result, str):
+            payload, content_type = result.encode('utf-8'), 'text/plain; charset=utf-8'
+        else:
+            payload, content_type = json.dumps(result).encode('utf-8'), 'application/json'
+        self.send_response(status)
+        if status == 401:
+            self.send_header('WWW-Authenticate', 'Bearer')
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorize(self):
+        scheme, _, token = (self.headers.get('Authorization') or '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(
+                token.strip().encode('utf-8'), self.server.admin.token.encode('utf-8')):
+            raise AdminError(401, "Missing or wrong admin token")
+
+    def _read_body(self) -> Dict[str, Any]:
+        # Browsers send cross-site form posts without asking first, but never as JSON
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            raise AdminError(415, "Request body must be sent as application/json")
+        # int() would also take signs, spaces and underscores; a negative length blocks read()
+        raw_length = self.headers.get('Content-Length', '0').strip()
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            raise AdminError(400, "Content-Length must be a non-negative integer")
+        length = int(raw_length)
+        if length > MAX_BODY_SIZE:
+            raise AdminError(413, "Request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise AdminError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise AdminError(400, "Request body must be a JSON object")
+        return body
+
+    def log_message(self, format: str, *args):
+        self.server.admin.game_server.log(f"[admin] {format % args}")
+
+
+class AdminServer:
+    """
+    HTTP admin API for a GameServer.
+
+    Endpoints (request and response bodies are JSON; GET takes query parameters):
+        GET  /stats                 Live counters and settings
+        GET  /sessions              Sessions being played, with their memory estimates
+        GET  /sessions/suspended    Sessions waiting for their players to return
+        POST /sessions/<id>/stop    End a session {"message": str}
+        POST /broadcast             SERVER_MESSAGE {"message": str, "sessions": [id, ...]}
+        GET  /config                Logging and profiling settings
+        POST /config                Change them {"logging": bool, "profile_rate": float,
+                                    "profile_format": str}; the trace directory is
+                                    only set when the server starts
+        GET  /profile               Collapsed stacks of all profiled sessions (text)
+        GET  /leaderboard           Top players ?game=<key>&limit=<n>&offset=<n>
+        GET  /rating                A player's rating and rank ?game=<key>&name=<name>
+        POST /drain                 Finish running games, then exit {"timeout": float}
+        POST /shutdown              Stop immediately
+
+    Every request needs an 'Authorization: Bearer <token>' header, and POST
+    bodies a JSON Content-Type. Keep the API on a loopback address anyway.
+    """
+
+    def __init__(self, game_server: 'GameServer', host: str = DEFAULT_ADMIN_HOST,
+                 port: int = DEFAULT_ADMIN_PORT, token: Optional[str] = None):
+        """
+        Initialize the admin API.
+
+        Args:
+            game_server: Server to control
+            host: Address to bind to
+            port: Port to listen on; 0 picks a free port
+            token: Bearer token requests must carry, e.g. from load_admin_token;
+                a random one if omitted
+        """
+        self.game_server = game_server
+        self.token = token or secrets.token_urlsafe(32)
+        self.host = host
+        self.port = port
+        self.http_server: Optional[_AdminHTTPServer] = None
+        self.routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Any]] = {
+            ('GET', '/stats'): self._stats,
+            ('GET', '/sessions'): self._sessions,
+            ('GET', '/sessions/suspended'): self._suspended_sessions,
+            ('POST', '/broadcast'): self._broadcast,
+            ('GET', '/config'): self._config,
+            ('POST', '/config'): self._set_config,
+            ('GET', '/profile'): self._profile,
+            ('GET', '/leaderboard'): self._leaderboard,
+            ('GET', '/rating'): self._rating,
+            ('POST', '/drain'): self._drain,
+            ('POST', '/shutdown'): self._shutdown,
+        }
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self.http_server = _AdminHTTPServer((self.host, self.port), self)
+        self.port = self.http_server.server_address[1]
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        self.game_server.log(f"Admin API on http://{self.host}:{self.port}")
+
+    def stop(self):
+        """Stop serving requests."""
+        if self.http_server:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_server = None
+
+    def handle(self, method: str, path: str, body: Dict[str, Any]) -> Any:
+        """
+        Run an admin request.
+
+        Args:
+            method: HTTP method
+            path: Request path, with query parameters for GET requests
+            body: Parsed JSON body
+
+        Returns:
+            Response body: a JSON-serializable value, or a string for plain text
+
+        Raises:
+            AdminError: If the request is invalid
+        """
+        path, _, query = path.partition('?')
+        path = path.rstrip('/') or '/'
+        if method == 'GET':
+            body = {key: values[-1] for key, values in urllib.parse.parse_qs(query).items()}
+        route = self.routes.get((method, path))
+        if route is not None:
+            return route(body)
+        match = _SESSION_PATH.match(path)
+        if match and method == 'POST':
+            return self._stop_session(int(match.group(1)), body)
+        raise AdminError(404, f"No such endpoint: {method} {path}")
+
+    def _stats(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self.game_server.stats()
+
+    def _sessions(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        sessions = list(self.game_server.sessions.values())
+        return {'sessions': [session.info() for session in sessions]}
+
+    def _suspended_sessions(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        table = self.game_server.session_table
+        return {'sessions': table.sessions() if table else []}
+
+    def _stop_session(self, session_id: int, body: Dict[str, Any]) -> Dict[str, Any]:
+        session = self.game_server.sessions.get(session_id)
+        if session is None:
+            raise AdminError(404, f"No session {session_id}")
+        session.stop(_string(body, 'message', "This game has been stopped by the server."))
+        return {'stopped': session_id}
+
+    def _broadcast(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        text = _string(body, 'message')
+        session_ids = body.get('sessions')
+        if session_ids is not None and (not isinstance(session_ids, list) or
+                                        not all(isinstance(i, int) for i in session_ids)):
+            raise AdminError(400, "'sessions' must be a list of session IDs")
+        return {'sent': self.game_server.broadcast(text, session_ids)}
+
+    def _config(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        profiler = self.game_server.profiler
+        return {
+            'logging': self.game_server.logging,
+            'profile_rate': profiler.sample_rate,
+            'profile_dir': profiler.output_dir,
+            'profile_format': profiler.trace_format,
+        }
+
+    def _set_config(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        profiler = self.game_server.profiler
+        if 'logging' in body:
+            if not isinstance(body['logging'], bool):
+                raise AdminError(400, "'logging' must be true or false")
+            self.game_server.logging = body['logging']
+        if 'profile_rate' in body:
+            rate = body['profile_rate']
+            if isinstance(rate, bool) or not isinstance(rate, (int, float)):
+                raise AdminError(400, "'profile_rate' must be a number")
+            try:
+                profiler.set_sample_rate(float(rate))
+            except ValueError as e:
+                raise AdminError(400, str(e))
+        if 'profile_dir' in body:
+            # The server would write traces wherever a request pointed it
+            raise AdminError(400, "'profile_dir' can only be set when the server starts")
+        if 'profile_format' in body:
+            if body['profile_format'] not in TRACE_FORMATS:
+                raise AdminError(400, f"'profile_format' must be one of {', '.join(TRACE_FORMATS)}")
+            profiler.trace_format = body['profile_format']
+        return self._config(body)
+
+    def _profile(self, body: Dict[str, Any]) -> str:
+        return self.game_server.profiler.collapsed()
+
+    def _ratings(self):
+        if self.game_server.ratings is None:
+            raise AdminError(404, "Ratings are not enabled on this server")
+        return self.game_server.ratings
+
+    def _leaderboard(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        game = body.get('game') or self.game_server.default_game
+        limit = _int(body, 'limit', 10)
+        offset = _int(body, 'offset', 0)
+        return {'game': game, 'players': self._ratings().top(game, limit, offset)}
+
+    def _rating(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        game = body.get('game') or self.game_server.default_game
+        name = _string(body, 'name')
+        player = self._ratings().player(game, name)
+        if player is None:
+            raise AdminError(404, f"{name} has no rating in {game}")
+        return dict(player, game=game)
+
+    def _drain(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        timeout = body.get('timeout')
+        if timeout is not None and (isinstance(timeout, bool) or
+                                    not isinstance(timeout, (int, float))):
+            raise AdminError(400, "'timeout' must be a number of seconds")
+        self.game_server.drain(timeout)
+        return {'draining': True, 'sessions_active': len(self.game_server.sessions)}
+
+    def _shutdown(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.game_server.log("Shutting down server...")
+        self.game_server.stop()
+        return {'running': False}
+
+
+def _string(body: Dict[str, Any], key: str, default: Optional[str] = None) -> str:
+    """Get a string field from a request body."""
+    value = body.get(key, default)
+    if not isinstance(value, str) or not value:
+        raise AdminError(400, f"'{key}' must be a non-empty string")
+    return value
+
+
+def _int(body: Dict[str, Any], key: str, default: int) -> int:
+    """Get a non-negative integer query parameter."""
+    try:
+        value = int(body.get(key, default))
+    except (TypeError, ValueError):
+        value = -1
+    if value < 0:
+        raise AdminError(400, f"'{key}' must be a non-negative integer")
+    return value
+
+
+def load_admin_token(path: Optional[str] = DEFAULT_ADMIN_TOKEN_PATH, create: bool = False) -> str:
+    """
+    Get the admin token from ADMIN_TOKEN_ENV or a token file.
+
+    Args:
+        path: Token file, or None to use the environment variable only
+        create: Write a new random token to path, readable only by this
+            user, if neither the variable nor the file exists (server side)
+
+    Returns:
+        The token
+
+    Raises:
+        OSError: If the token file cannot be read, or created when create is set
+        ValueError: If no token is found, or the token file is empty
+    """
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    if token:
+        return token.strip()
+    if path is None:
+        raise ValueError(f"Set {ADMIN_TOKEN_ENV} to the admin token")
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(secrets.token_urlsafe(32) + '\n')
+    with open(path, 'r', encoding='utf-8') as f:
+        token = f.read().strip()
+    if not token:
+        raise ValueError(f"Admin token file {path} is empty")
+    return token
+
+
+def request(method: str, path: str, body: Optional[Dict[str, Any]] = None,
+            host: str = DEFAULT_ADMIN_HOST, port: int = DEFAULT_ADMIN_PORT,
+            timeout: float = 5.0, token: Optional[str] = None) -> Tuple[int, Any]:
+    """
+    Send a request to a server's admin API.
+
+    Args:
+        method: HTTP method
+        path: Endpoint path, e.g. '/stats'
+        body: JSON body for POST requests
+        host: Admin API host
+        port: Admin API port
+        timeout: Seconds to wait for the response
+        token: Admin token; read with load_admin_token if omitted
+
+    Returns:
+        Tuple of (status, response) where response is parsed JSON or text
+    """
+    # Only the command line client needs urllib.request, which is slow to import
+    import urllib.error
+    import urllib.request
+    if token is None:
+        token = load_admin_token()
+    data = json.dumps(body or {}).encode('utf-8') if method == 'POST' else None
+    req = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                 headers={'Content-Type': 'application/json',
+                                          'Authorization': f"Bearer {token}"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, content_type, payload = (response.status,
+                                             response.headers.get('Content-Type', ''),
+                                             response.read())
+    except urllib.error.HTTPError as e:
+        status, content_type, payload = e.code, e.headers.get('Content-Type', ''), e.read()
+    text = payload.decode('utf-8')
+    return status, json.loads(text) if content_type.startswith('application/json') else text
+
+
+def main():
+    """Main entry point for the admin command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Control a running game server")
+    parser.add_argument('--host', default=DEFAULT_ADMIN_HOST, help='Admin API host')
+    parser.add_argument('--port', type=int, default=DEFAULT_ADMIN_PORT, help='Admin API port')
+    parser.add_argument('--token-file', default=DEFAULT_ADMIN_TOKEN_PATH,
+                        help=f'File holding the admin token ({ADMIN_TOKEN_ENV} overrides it)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('stats', help='Show live server statistics')
+    commands.add_parser('sessions', help='List sessions being played')
+    commands.add_parser('suspended', help='List sessions waiting for their players to return')
+    stop = commands.add_parser('stop', help='Stop a session')
+    stop.add_argument('session', type=int, help='Session ID')
+    stop.add_argument('--message', default=None, help='Message shown to its players')
+    broadcast = commands.add_parser('broadcast', help='Send a message to players')
+    broadcast.add_argument('message', help='Message to send')
+    broadcast.add_argument('--session', type=int, action='append', default=None,
+                           help='Only message this session (repeatable)')
+    config = commands.add_parser('config', help='Show or change logging and profiling')
+    config.add_argument('--logging', choices=('on', 'off'), default=None)
+    config.add_argument('--profile-rate', type=float, default=None,
+                        help='Fraction of new sessions to profile, from 0 to 1')
+    config.add_argument('--profile-format', choices=TRACE_FORMATS, default=None)
+    commands.add_parser('profile', help='Print collapsed stacks of profiled sessions')
+    leaderboard = commands.add_parser('leaderboard', help='Show the top rated players')
+    leaderboard.add_argument('--game', default=None, help='Game key (server default if omitted)')
+    leaderboard.add_argument('--limit', type=int, default=10, help='Number of players')
+    rating = commands.add_parser('rating', help="Show a player's rating and rank")
+    rating.add_argument('name', help='Player name')
+    rating.add_argument('--game', default=None, help='Game key (server default if omitted)')
+    drain = commands.add_parser('drain', help='Finish running games, then exit')
+    drain.add_argument('--timeout', type=float, default=None,
+                       help='Seconds before remaining games are stopped')
+    commands.add_parser('shutdown', help='Stop the server immediately')
+
+    args = parser.parse_args()
+
+    if args.command == 'stop':
+        body = {'message': args.message} if args.message else {}
+        method, path = 'POST', f"/sessions/{args.session}/stop"
+    elif args.command == 'broadcast':
+        body = {'message': args.message, 'sessions': args.session}
+        method, path = 'POST', '/broadcast'
+    elif args.command == 'config':
+        body = {}
+        if args.logging is not None:
+            body['logging'] = args.logging == 'on'
+        if args.profile_rate is not None:
+            body['profile_rate'] = args.profile_rate
+        if args.profile_format is not None:
+            body['profile_format'] = args.profile_format
+        method, path = ('POST' if body else 'GET'), '/config'
+    elif args.command == 'drain':
+        body = {'timeout': args.timeout}
+        method, path = 'POST', '/drain'
+    elif args.command == 'shutdown':
+        body, method, path = {}, 'POST', '/shutdown'
+    elif args.command in ('leaderboard', 'rating'):
+        query = {'game': args.game, 'limit': getattr(args, 'limit', None),
+                 'name': getattr(args, 'name', None)}
+        query = urllib.parse.urlencode({k: v for k, v in query.items() if v is not None})
+        body, method, path = {}, 'GET', f"/{args.command}?{query}"
+    elif args.command == 'suspended':
+        body, method, path = {}, 'GET', '/sessions/suspended'
+    else:
+        body, method, path = {}, 'GET', f"/{args.command}"
+
+    try:
+        token = load_admin_token(args.token_file)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the admin token: {e}")
+        sys.exit(1)
+    try:
+        status, response = request(method, path, body, args.host, args.port, token=token)
+    except OSError as e:
+        print(f"Could not reach the admin API at {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    print(response if isinstance(response, str) else json.dumps(response, indent=2))
+    if status >= 400:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
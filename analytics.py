@@ -0,0 +1,436 @@
+"""
+Columnar export of completed games and moves, and queries over it.
+An AnalyticsWriter subscribes to the server's event bus and writes rows
+to column files: every column is stored as one compressed typed array
+(strings dictionary-encoded), so queries load only the columns they use
+and aggregate without parsing a record at a time.
+
+Files are rotated by row count and age and never modified once written:
+    <table>-<timestamp>-<n>.cols
+Run this module for a summary of an export directory.
+"""
+import array
+import glob
+import json
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+from itertools import compress
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from events import (Event, GAME_STARTED, MOVE_PLAYED, ROUND_PLAYED, GAME_ENDED,
+                    PLAYER_DISCONNECTED, SESSION_STOPPED, SESSION_RESUMED, SESSION_EXPIRED)
+
+
+FILE_MAGIC = b'GCOLS1\n'
+FILE_SUFFIX = '.cols'
+
+# Column types and the array typecodes they are stored as
+COLUMN_TYPES = {
+    'int': 'q',
+    'float': 'd',
+    'bool': 'b',
+    'str': 'i',  # indexes into the column's dictionary
+}
+
+# Integer columns use this for missing values, e.g. the winner of a draw
+NULL_INT = -1
+
+# Table schemas: (column name, column type)
+TABLES = {
+    'games': (
+        ('session', 'int'),
+        ('game', 'str'),
+        ('finished', 'float'),
+        ('players', 'int'),
+        ('winner', 'int'),
+        ('winner_name', 'str'),
+        ('draw', 'bool'),
+        ('moves', 'int'),
+        ('duration', 'float'),
+    ),
+    'moves': (
+        ('session', 'int'),
+        ('game', 'str'),
+        ('time', 'float'),
+        ('turn', 'int'),
+        ('player', 'int'),
+        ('move', 'str'),
+        ('latency', 'float'),
+    ),
+}
+
+# Rows per file before it is rotated
+DEFAULT_ROWS_PER_FILE = 100000
+
+# Seconds a file stays open before it is rotated, even if it is small
+DEFAULT_MAX_FILE_AGE = 300.0
+
+Column = Union[array.array, List[str]]
+
+
+def write_columns(path: str, table: str, columns: Dict[str, Column]):
+    """
+    Write a table to a column file.
+
+    The file is written under a temporary name and renamed, so readers
+    never see a partial file.
+
+    Args:
+        path: File to create
+        table: Table name, a key of TABLES
+        columns: Values per column of the table's schema
+    """
+    header_columns = []
+    blobs = []
+    offset = 0
+    rows = 0
+    for name, column_type in TABLES[table]:
+        values = columns[name]
+        rows = len(values)
+        entry: Dict[str, Any] = {'name': name, 'type': column_type}
+        if column_type == 'str':
+            dictionary: Dict[str, int] = {}
+            codes = array.array('i', (dictionary.setdefault(value, len(dictionary))
+                                      for value in values))
+            entry['dictionary'] = list(dictionary)
+            data = codes.tobytes()
+        else:
+            data = array.array(COLUMN_TYPES[column_type], values).tobytes()
+        blob = zlib.compress(data, 1)
+        entry['offset'] = offset
+        entry['length'] = len(blob)
+        offset += len(blob)
+        header_columns.append(entry)
+        blobs.append(blob)
+
+    header = json.dumps({'table': table, 'rows': rows, 'byteorder': sys.byteorder,
+                         'columns': header_columns}).encode('utf-8')
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(FILE_MAGIC)
+        f.write(len(header).to_bytes(4, byteorder='big'))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temporary, path)
+
+
+def read_columns(path: str,
+                 columns: Optional[Iterable[str]] = None) -> Tuple[int, Dict[str, Column]]:
+    """
+    Read columns from a column file.
+
+    Args:
+        path: File to read
+        columns: Names of the columns to load; all columns if None
+
+    Returns:
+        Tuple of (row count, values per column). Numeric columns are arrays;
+        string columns are lists.
+
+    Raises:
+        ValueError: If the file is not a column file
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a column file")
+        header = json.loads(f.read(int.from_bytes(f.read(4), byteorder='big')))
+        data_start = f.tell()
+        wanted = None if columns is None else set(columns)
+        result: Dict[str, Column] = {}
+        for entry in header['columns']:
+            if wanted is not None and entry['name'] not in wanted:
+                continue
+            f.seek(data_start + entry['offset'])
+            values = array.array(COLUMN_TYPES[entry['type']])
+            values.frombytes(zlib.decompress(f.read(entry['length'])))
+            if header['byteorder'] != sys.byteorder:
+                values.byteswap()
+            if entry['type'] == 'str':
+                values = list(map(entry['dictionary'].__getitem__, values))
+            result[entry['name']] = values
+    return header['rows'], result
+
+
+class AnalyticsWriter:
+    """
+    Event handler turning game events into rows of the games and moves tables.
+
+    Subscribe it to GameServer.events. Rows are buffered per table and
+    written as a new file when the table reaches rows_per_file or, as
+    later events arrive, its oldest row is max_file_age old, and when the
+    writer is closed.
+    """
+
+    def __init__(self, directory: str, rows_per_file: int = DEFAULT_ROWS_PER_FILE,
+                 max_file_age: float = DEFAULT_MAX_FILE_AGE):
+        """
+        Initialize the writer.
+
+        Args:
+            directory: Directory to write column files to
+            rows_per_file: Rows per file before rotating
+            max_file_age: Seconds before a partly filled file is written anyway
+        """
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.max_file_age = max_file_age
+        self.files_written = 0
+        os.makedirs(directory, exist_ok=True)
+        self._buffers = {table: self._empty(table) for table in TABLES}
+        self._buffer_started = {table: 0.0 for table in TABLES}
+        # Game key and moves so far per session in progress
+        self._sessions: Dict[int, List[Any]] = {}
+
+    @staticmethod
+    def _empty(table: str) -> Dict[str, Column]:
+        return {name: [] if column_type == 'str' else array.array(COLUMN_TYPES[column_type])
+                for name, column_type in TABLES[table]}
+
+    def __call__(self, batch: List[Event]):
+        for event in batch:
+            if event.type == MOVE_PLAYED:
+                self._add_move(event, event.data['player'], event.data['move'],
+                               event.data.get('latency', 0.0))
+            elif event.type == ROUND_PLAYED:
+                latencies = event.data.get('latencies', {})
+                for player_id, move in sorted(event.data['moves'].items()):
+                    self._add_move(event, player_id, move, latencies.get(player_id, 0.0))
+            elif event.type == GAME_STARTED:
+                self._sessions[event.session_id] = [event.data['game'], 0]
+            elif event.type == GAME_ENDED:
+                self._add_game(event)
+            elif event.type == SESSION_RESUMED:
+                # Suspended sessions keep counting turns where they left off
+                self._sessions.setdefault(event.session_id,
+                                          [event.data['game'], event.data['moves']])
+            elif event.type in (PLAYER_DISCONNECTED, SESSION_STOPPED, SESSION_EXPIRED):
+                self._sessions.pop(event.session_id, None)
+
+        now = time.monotonic()
+        for table, buffer in self._buffers.items():
+            rows = len(buffer['session'])
+            if rows >= self.rows_per_file or (
+                    rows and now - self._buffer_started[table] >= self.max_file_age):
+                self.flush(table)
+
+    def _append(self, table: str, row: Tuple):
+        buffer = self._buffers[table]
+        if not buffer['session']:
+            self._buffer_started[table] = time.monotonic()
+        for (name, _), value in zip(TABLES[table], row):
+            buffer[name].append(value)
+
+    def _add_move(self, event: Event, player_id: int, move: Any, latency: float):
+        session = self._sessions.get(event.session_id)
+        game = ''
+        turn = 0
+        if session is not None:
+            game, turn = session
+            session[1] += 1
+        self._append('moves', (event.session_id, game, event.time, turn, int(player_id),
+                               str(move), latency))
+
+    def _add_game(self, event: Event):
+        data = event.data
+        game, moves = self._sessions.pop(event.session_id, (data.get('game', ''), 0))
+        winner = data.get('winner')
+        players = data.get('players') or []
+        winner_name = ''
+        if winner is not None and winner < len(players):
+            winner_name = players[winner] or ''
+        self._append('games', (event.session_id, game, event.time, len(players),
+                               NULL_INT if winner is None else winner, winner_name,
+                               bool(data.get('draw')), moves, data.get('duration', 0.0)))
+
+    def flush(self, table: Optional[str] = None) -> List[str]:
+        """
+        Write buffered rows to new files.
+
+        Args:
+            table: Table to flush; every table if None
+
+        Returns:
+            Paths of the files written
+        """
+        written = []
+        for name in ([table] if table else list(TABLES)):
+            buffer = self._buffers[name]
+            if not buffer['session']:
+                continue
+            self.files_written += 1
+            path = os.path.join(self.directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}"
+                                                f"-{self.files_written}{FILE_SUFFIX}")
+            write_columns(path, name, buffer)
+            self._buffers[name] = self._empty(name)
+            written.append(path)
+        return written
+
+    def close(self):
+        """Write everything still buffered."""
+        self.flush()
+
+
+class Table:
+    """Columns of one table loaded from every file in an export directory."""
+
+    def __init__(self, columns: Dict[str, Column], rows: int):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    @classmethod
+    def load(cls, directory: str, table: str,
+             columns: Optional[Iterable[str]] = None) -> 'Table':
+        """
+        Load a table from an export directory.
+
+        Args:
+            directory: Directory the AnalyticsWriter wrote to
+            table: Table name, a key of TABLES
+            columns: Columns to load; all columns if None
+
+        Returns:
+            Table with the rows of every file, in file order
+        """
+        wanted = None if columns is None else set(columns)
+        names = [name for name, _ in TABLES[table] if wanted is None or name in wanted]
+        loaded: Dict[str, Column] = {
+            name: [] if column_type == 'str' else array.array(COLUMN_TYPES[column_type])
+            for name, column_type in TABLES[table] if name in names}
+        rows = 0
+        for path in sorted(glob.glob(os.path.join(directory, f"{table}-*{FILE_SUFFIX}"))):
+            count, values = read_columns(path, names)
+            rows += count
+            for name in names:
+                loaded[name].extend(values[name])
+        return cls(loaded, rows)
+
+    def where(self, column: str, value: Any) -> 'Table':
+        """Get the rows where a column equals a value."""
+        mask = [item == value for item in self.columns[column]]
+        rows = mask.count(True)
+        if rows == self.rows:
+            return self
+        filtered: Dict[str, Column] = {}
+        for name, values in self.columns.items():
+            if isinstance(values, array.array):
+                filtered[name] = array.array(values.typecode, compress(values, mask))
+            else:
+                filtered[name] = list(compress(values, mask))
+        return Table(filtered, rows)
+
+    def count_by(self, column: str) -> Dict[Any, int]:
+        """Count rows per value of a column."""
+        return dict(Counter(self.columns[column]))
+
+
+def win_rates(directory: str, game: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Summarize game outcomes per game.
+
+    Args:
+        directory: Export directory
+        game: Only this game key; every game if None
+
+    Returns:
+        Dictionary mapping game keys to games played, draw rate and win
+        rate per player seat
+    """
+    games = Table.load(directory, 'games', ('game', 'winner', 'draw'))
+    if game is not None:
+        games = games.where('game', game)
+    summary: Dict[str, Dict[str, Any]] = {}
+    for key in sorted(set(games['game'])):
+        subset = games.where('game', key)
+        total = len(subset)
+        wins = Counter(winner for winner in subset['winner'] if winner != NULL_INT)
+        summary[key] = {
+            'games': total,
+            'draw_rate': sum(subset['draw']) / total,
+            'win_rate_by_seat': {seat: count / total for seat, count in sorted(wins.items())},
+        }
+    return summary
+
+
+def move_distribution(directory: str, game: str,
+                      top: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Count how often each move was played in a game.
+
+    Args:
+        directory: Export directory
+        game: Game key
+        top: Only the most common moves; all moves if None
+
+    Returns:
+        (move, count) pairs, most common first
+    """
+    moves = Table.load(directory, 'moves', ('game', 'move')).where('game', game)
+    return Counter(moves['move']).most_common(top)
+
+
+def latency_stats(directory: str, game: Optional[str] = None) -> Dict[str, float]:
+    """
+    Summarize how long players took to move.
+
+    Args:
+        directory: Export directory
+        game: Only this game key; every game if None
+
+    Returns:
+        Dictionary with count, mean, p50, p95, p99 and max in seconds
+    """
+    moves = Table.load(directory, 'moves', ('game', 'latency'))
+    if game is not None:
+        moves = moves.where('game', game)
+    latencies = sorted(moves['latency'])
+    if not latencies:
+        return {'count': 0}
+
+    def percentile(fraction: float) -> float:
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    return {
+        'count': len(latencies),
+        'mean': sum(latencies) / len(latencies),
+        'p50': percentile(0.50),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'max': latencies[-1],
+    }
+
+
+def main():
+    """Print a summary of an export directory."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Summarize exported game analytics')
+    parser.add_argument('directory', help='Directory written by the server with --analytics-dir')
+    parser.add_argument('--game', default=None, help='Only this game')
+    parser.add_argument('--top-moves', type=int, default=10, help='Most common moves to show')
+
+    args = parser.parse_args()
+
+    rates = win_rates(args.directory, args.game)
+    for key, stats in rates.items():
+        seats = ', '.join(f"player {seat + 1}: {rate:.1%}"
+                          for seat, rate in stats['win_rate_by_seat'].items())
+        print(f"{key}: {stats['games']} games, {stats['draw_rate']:.1%} draws, wins {seats}")
+        moves = move_distribution(args.directory, key, args.top_moves)
+        print("  moves: " + ', '.join(f"{move} x{count}" for move, count in moves))
+        latency = latency_stats(args.directory, key)
+        if latency['count']:
+            print(f"  latency: mean {latency['mean'] * 1000:.1f} ms, "
+                  f"p95 {latency['p95'] * 1000:.1f} ms, max {latency['max'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
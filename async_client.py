@@ -0,0 +1,494 @@
+"""
+Asyncio game client with independent reader, writer and input tasks.
+Server messages are processed while the user is typing, and any frontend
+(console, UI, bot or test harness) can drive the client through callbacks.
+"""
+import asyncio
+import ssl
+import sys
+import threading
+from typing import Dict, List, Callable, Optional, Union, Any
+from protocol import Protocol, MessageType, type_code
+from messages import Message, ConnectMessage, DisconnectMessage, MoveMessage
+from game_interface import GameInterface
+from prediction import MovePredictor, can_predict
+from state_delta import apply_changes
+
+
+# Event emitted once the connection to the server is gone
+DISCONNECTED = 'DISCONNECTED'
+
+# Event emitted with the MOVE_REJECTED message after a predicted move is rolled back
+ROLLED_BACK = 'ROLLED_BACK'
+
+Callback = Callable[[Optional[Message]], Any]
+
+
+class AsyncGameClient:
+    """Event-driven client core; frontends subscribe with on()."""
+
+    def __init__(self, host: str = 'localhost', port: int = 8000,
+                 game_logic: Optional[GameInterface] = None, compression: bool = False,
+                 game: Optional[str] = None, predict: bool = False,
+                 unix_path: Optional[str] = None, tls: Optional[ssl.SSLContext] = None,
+                 name: Optional[str] = None, deltas: bool = False, local_game: bool = False,
+                 resume_token: Optional[str] = None):
+        """
+        Initialize the client.
+
+        Args:
+            host: Server host address
+            port: Server port number
+            game_logic: Optional GameInterface used to render the board locally.
+                When given, the server is asked to omit 'board_display'.
+            compression: Ask the server for compressed frames
+            game: Registry key of the game to play, or None for the server's default
+            predict: Apply own moves locally before the server confirms them.
+                Requires game_logic of a turn-based game.
+            unix_path: Connect to a Unix-domain socket path instead of host and port
+            tls: Client SSLContext (see tls.client_context) to connect over TLS
+            name: Player name to be rated under, or None to play unrated
+            deltas: Ask for state messages as changes to the previous state,
+                which keeps them small on large boards
+            local_game: Without game_logic, load it from GameRegistry.default()
+                for the game the server confirms in CONNECTED, to render the
+                board locally and predict moves
+            resume_token: Token the server gave this name on an earlier
+                connection, to return to a game suspended when it dropped
+        """
+        self.host = host
+        self.port = port
+        self.game_logic = game_logic
+        self.compression = compression
+        self.game = game
+        self.unix_path = unix_path
+        self.tls = tls
+        self.name = name
+        self.deltas = deltas
+        self.resume_token = resume_token
+        self.player_id: Optional[int] = None
+        self.game_name: Optional[str] = None
+        self.game_state: Optional[Dict[str, Any]] = None
+        # Last state received from the server, without predicted moves
+        self.server_state: Optional[Dict[str, Any]] = None
+        self.awaiting_move = False
+        self.running = False
+        self.local_game = local_game and game_logic is None
+        self.predict = predict and (self.local_game or can_predict(game_logic))
+        self.predictor = MovePredictor(game_logic) if self.predict and game_logic else None
+        self.predicting = False
+
+        self._callbacks: Dict[str, List[Callback]] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._outgoing: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closed: Optional[asyncio.Event] = None
+
+    def on(self, event: Union[MessageType, str], callback: Callback):
+        """
+        Subscribe to a message type, DISCONNECTED or ROLLED_BACK.
+
+        Callbacks receive the message (None for DISCONNECTED) and may be
+        plain functions or coroutines.
+
+        Args:
+            event: A MessageType, a custom type string, DISCONNECTED or ROLLED_BACK
+            callback: Callable invoked for each matching event
+        """
+        self._callbacks.setdefault(type_code(event), []).append(callback)
+
+    def is_my_turn(self) -> bool:
+        """Check whether the server is waiting for a move from this player."""
+        return self.awaiting_move
+
+    def render_board(self, message: Optional[Message] = None) -> str:
+        """Get the board for a state message, rendering it locally if omitted."""
+        board_display = getattr(message, 'board_display', None)
+        if not board_display and self.game_logic and self.game_state:
+            board_display = self.game_logic.format_state_for_display(self.game_state)
+        return board_display or ''
+
+    async def connect(self) -> bool:
+        """
+        Connect to the server and start the reader and writer tasks.
+
+        Returns:
+            True if connection successful, False otherwise
+        """
+        try:
+            if self.unix_path:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.unix_path)
+            else:
+                self._reader, self._writer = await asyncio.open_connection(
+                    self.host, self.port, ssl=self.tls)
+        except (OSError, ssl.SSLError) as e:
+            print(f"Error connecting to server: {e}")
+            return False
+
+        self.running = True
+        self._closed = asyncio.Event()
+        self._outgoing = asyncio.Queue()
+        self.send(ConnectMessage(options={
+            'board_display': self.game_logic is None and not self.local_game,
+            'compression': 'zlib' if self.compression else None,
+            'game': self.game,
+            'predict': self.predict,
+            'deltas': self.deltas,
+            'name': self.name,
+            'resume_token': self.resume_token
+        }))
+        self._tasks = [
+            asyncio.create_task(self._read_loop()),
+            asyncio.create_task(self._write_loop()),
+        ]
+        return True
+
+    def send(self, message: Message):
+        """Queue a message for the writer task."""
+        if self.running:
+            self._outgoing.put_nowait(message)
+
+    def send_move(self, move: Any) -> bool:
+        """
+        Queue a MOVE message.
+
+        When prediction is on, the move is validated and applied to
+        game_state immediately, and invalid moves are not sent.
+
+        Returns:
+            True if the move was queued
+        """
+        if not self.predicting:
+            self.send(MoveMessage(move=move))
+            return self.running
+        seq, predicted_state, error_msg = self.predictor.predict(self.game_state, self.player_id, move)
+        if predicted_state is None:
+            print(f"Move rejected: {error_msg}")
+            return False
+        self.send(MoveMessage(move=move, seq=seq))
+        self.game_state = predicted_state
+        self.awaiting_move = False
+        return self.running
+
+    async def run(self):
+        """Connect and wait until the connection is closed."""
+        if await self.connect():
+            await self.wait_closed()
+
+    async def wait_closed(self):
+        """Wait until the connection is closed."""
+        if self._closed is not None:
+            await self._closed.wait()
+
+    async def close(self):
+        """Say goodbye to the server and close the connection."""
+        if self.running:
+            self.running = False
+            try:
+                await Protocol.send_async(self._writer, DisconnectMessage())
+            except Exception:
+                pass
+        await self._shutdown()
+
+    async def _shutdown(self):
+        """Stop the tasks and close the stream."""
+        self.running = False
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        if self._closed is not None and not self._closed.is_set():
+            self._closed.set()
+            await self._emit(DISCONNECTED, None)
+
+    async def _emit(self, event: str, message: Optional[Message]):
+        """Call every callback subscribed to an event."""
+        for callback in self._callbacks.get(event, ()):
+            result = callback(message)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def _read_loop(self):
+        """Receive messages and hand them to subscribers."""
+        try:
+            while self.running:
+                message = await Protocol.receive_async(self._reader, self._writer)
+                if message is None:
+                    break
+                if self._update_state(message):
+                    await self._emit(ROLLED_BACK, message)
+                await self._emit(message.type, message)
+                if message.message_type == MessageType.GAME_END:
+                    break
+        finally:
+            await self._shutdown()
+
+    async def _write_loop(self):
+        """Send queued messages in order."""
+        while True:
+            message = await self._outgoing.get()
+            if not await Protocol.send_async(self._writer, message):
+                break
+
+    def _receive_state(self, message: Message) -> Optional[Dict[str, Any]]:
+        """Get the server state a state message carries, or None if it has none."""
+        if message.game_state is not None:
+            self.server_state = message.game_state
+        elif message.changes is not None:
+            self.server_state = apply_changes(self.server_state, message.changes)
+        else:
+            return None
+        return self.server_state
+
+    def _load_game_logic(self, key: Optional[str]):
+        """Load the logic of the game the server confirmed, for local rendering and prediction."""
+        from game_registry import GameRegistry
+        try:
+            self.game_logic = GameRegistry.default().get(key)
+        except (KeyError, ImportError) as e:
+            print(f"Cannot load game '{key}' locally ({e}); boards will not be shown")
+            self.predict = False
+            return
+        if self.predict and can_predict(self.game_logic):
+            self.predictor = MovePredictor(self.game_logic)
+        else:
+            self.predict = False
+
+    def _update_state(self, message: Message) -> bool:
+        """
+        Track connection and game state from a received message.
+
+        Returns:
+            True if the message rolled back a predicted move
+        """
+        msg_type = message.message_type
+        if msg_type == MessageType.CONNECTED:
+            self.player_id = message.player_id
+            self.game_name = message.game_name
+            options = message.options or {}
+            if options.get('compression'):
+                Protocol.enable_compression(self._writer)
+            if self.local_game and self.game_logic is None:
+                self._load_game_logic(options.get('game'))
+            self.predicting = self.predictor is not None and bool(options.get('predict'))
+            if options.get('resume_token'):
+                self.resume_token = options['resume_token']
+        elif msg_type == MessageType.GAME_START:
+            self.player_id = message.player_id
+            self.game_name = message.game_name
+            self.game_state = self.server_state = message.initial_state
+        elif msg_type in (MessageType.YOUR_TURN, MessageType.GAME_STATE):
+            game_state = self._receive_state(message)
+            if self.predicting and self.predictor.pending:
+                game_state = self.predictor.rebase(game_state)
+            self.game_state = game_state
+            if msg_type == MessageType.YOUR_TURN:
+                self.awaiting_move = True
+        elif msg_type == MessageType.MOVE_ACCEPTED:
+            if self.predicting:
+                self.predictor.confirm(message.seq)
+            game_state = self._receive_state(message)
+            if game_state is not None:
+                self.game_state = game_state
+                self.awaiting_move = False
+        elif msg_type == MessageType.MOVE_REJECTED:
+            if self.predicting:
+                previous_state = self.predictor.reject(message.seq)
+                if previous_state is not None:
+                    self.game_state = previous_state
+                    self.awaiting_move = True
+                    return True
+        elif msg_type == MessageType.GAME_END:
+            self.awaiting_move = False
+            if self.predictor is not None:
+                self.predictor.clear()
+        return False
+
+
+class ConsoleFrontend:
+    """Console user interface for AsyncGameClient with its own input task."""
+
+    def __init__(self, client: AsyncGameClient):
+        """
+        Attach the console frontend to a client.
+
+        Args:
+            client: Client to display and send moves for
+        """
+        self.client = client
+        self._lines: Optional[asyncio.Queue] = None
+
+        client.on(MessageType.CONNECTED, self._on_connected)
+        client.on(MessageType.GAME_START, self._on_game_start)
+        client.on(MessageType.YOUR_TURN, self._on_your_turn)
+        client.on(MessageType.GAME_STATE, self._on_game_state)
+        client.on(MessageType.MOVE_ACCEPTED, self._on_move_accepted)
+        client.on(MessageType.MOVE_REJECTED, self._on_move_rejected)
+        client.on(MessageType.GAME_END, self._on_game_end)
+        client.on(MessageType.ERROR, self._on_error)
+        client.on(MessageType.SERVER_MESSAGE, self._on_server_message)
+        client.on(DISCONNECTED, self._on_disconnected)
+        client.on(ROLLED_BACK, self._on_rolled_back)
+
+    async def run(self):
+        """Run the client and the input task until the game ends."""
+        if not await self.client.connect():
+            return
+        client = self.client
+        print(f"Connected to server at {client.unix_path or f'{client.host}:{client.port}'}")
+        input_task = asyncio.create_task(self._input_loop())
+        try:
+            await self.client.wait_closed()
+        finally:
+            input_task.cancel()
+
+    def _start_stdin_thread(self):
+        """Read stdin lines in a daemon thread, so input never blocks the loop."""
+        loop = asyncio.get_running_loop()
+        self._lines = asyncio.Queue()
+
+        def read_lines():
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(self._lines.put_nowait, line)
+            loop.call_soon_threadsafe(self._lines.put_nowait, None)
+
+        threading.Thread(target=read_lines, daemon=True).start()
+
+    async def _input_loop(self):
+        """Turn typed lines into moves while the reader keeps running."""
+        self._start_stdin_thread()
+        while self.client.running:
+            line = await self._lines.get()
+            if not self.client.running:
+                return
+            if line is None or line.strip().lower() == 'exit':
+                print("\nDisconnecting...")
+                await self.client.close()
+                return
+            move = line.strip()
+            if not move:
+                continue
+            if self.client.is_my_turn():
+                if self.client.send_move(move) and self.client.predicting:
+                    print(self.client.render_board())
+                    print("Move played!")
+                elif self.client.predicting:
+                    self._prompt()
+            else:
+                print("Please wait for your turn.")
+
+    def _prompt(self):
+        print("Enter your move (or 'exit' to quit): ", end='', flush=True)
+
+    def _on_connected(self, message: Message):
+        print(f"Connected! You are player {message.player_id + 1}")
+        print(f"Game: {message.game_name}")
+        print(f"Waiting for players... ({message.current_players}/{message.max_players})")
+        if self.client.resume_token and self.client.name:
+            print(f"Resume token: {self.client.resume_token} (reconnect with --name "
+                  f"{self.client.name} --resume-token {self.client.resume_token} if you drop out)")
+
+    def _on_game_start(self, message: Message):
+        print(f"\n{'='*50}")
+        print(f"Game Started: {message.game_name}")
+        print(f"You are Player {message.player_id + 1}")
+        print(f"{'='*50}")
+        if message.help:
+            print(f"\n{message.help}\n")
+
+    def _on_your_turn(self, message: Message):
+        print(self.client.render_board(message))
+        print("\n>>> It's YOUR turn! <<<")
+        self._prompt()
+
+    def _on_game_state(self, message: Message):
+        print(self.client.render_board(message))
+        if message.current_player is not None:
+            print(f"\nWaiting for Player {message.current_player + 1} to move...")
+
+    def _on_move_accepted(self, message: Message):
+        if message.game_state is None and message.changes is None:
+            return
+        print(self.client.render_board(message))
+        print("Move accepted!")
+
+    def _on_move_rejected(self, message: Message):
+        print(f"Move rejected: {message.error or 'Invalid move'}")
+        print("Please try again.")
+        if self.client.is_my_turn():
+            self._prompt()
+
+    def _on_game_end(self, message: Message):
+        print(f"\n{'='*50}")
+        print("GAME OVER")
+        print(f"{'='*50}")
+        print(message.message)
+        if message.draw:
+            print("It's a tie!")
+        elif message.won:
+            print("🎉 Congratulations! You won! 🎉")
+        else:
+            print("Better luck next time!")
+        print(f"{'='*50}\n")
+
+    def _on_error(self, message: Message):
+        print(f"Error: {message.error or 'Unknown error occurred'}")
+
+    def _on_server_message(self, message: Message):
+        if message.message:
+            print(f"[SERVER] {message.message}")
+
+    def _on_rolled_back(self, message: Message):
+        print(self.client.render_board())
+
+    def _on_disconnected(self, message: None):
+        if self._lines is not None:
+            self._lines.put_nowait(None)
+
+
+def main():
+    """Main entry point for the asyncio console client."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Connect to game server')
+    parser.add_argument('--host', default='localhost', help='Server host address')
+    parser.add_argument('--port', type=int, default=8000, help='Server port number')
+    parser.add_argument('--unix', metavar='PATH', default=None,
+                        help='Connect to a Unix-domain socket instead of TCP')
+    parser.add_argument('--compress', action='store_true',
+                        help='Ask the server to compress large frames')
+    parser.add_argument('--game', default=None, help='Game to play (server default if omitted)')
+    parser.add_argument('--predict', action='store_true',
+                        help='Show own moves immediately instead of waiting for the server')
+    parser.add_argument('--name', default=None, help='Player name to be rated under')
+    parser.add_argument('--resume-token', default=None,
+                        help='Token printed when you connected under --name, to return to '
+                             'a game suspended after you dropped')
+
+    args = parser.parse_args()
+
+    # Without --game the server picks the game, so its logic is loaded once CONNECTED names it
+    game_logic = None
+    if args.predict and args.game:
+        from game_registry import GameRegistry
+        game_logic = GameRegistry.default().get(args.game)
+
+    client = AsyncGameClient(host=args.host, port=args.port, game_logic=game_logic,
+                             compression=args.compress, game=args.game, predict=args.predict,
+                             unix_path=args.unix, name=args.name, local_game=args.predict,
+                             resume_token=args.resume_token)
+    try:
+        asyncio.run(ConsoleFrontend(client).run())
+    except KeyboardInterrupt:
+        print("\nDisconnecting...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,764 @@
+"""
+Microbenchmarks for the protocol and game logic hot paths.
+Run `python benchmarks.py --save baseline.json` to record a baseline and
+`python benchmarks.py --compare baseline.json` to fail on regressions.
+`python benchmarks.py --check-imports` fails when an entry point imports
+slower than its budget; tests/test_import_budgets.py enforces the same
+budgets in the test suite. Network conditions are benchmarked with chaos.py.
+"""
+import functools
+import itertools
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from typing import Dict, Any, List, Callable, Optional, Tuple
+from protocol import Protocol, MessageType
+from messages import MoveMessage, GameStateMessage
+from game_interface import GameInterface
+from state_cache import ViewCache
+from state_delta import apply_changes
+from transport import Transport, StreamTransport, QueueTransport
+
+
+# Fractional slowdown against the baseline reported as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Number of timed repeats per benchmark; the best one is compared
+DEFAULT_REPEAT = 5
+
+BASELINE_FORMAT_VERSION = 1
+
+# Registered benchmarks: name -> setup function returning the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+# Game states of increasing size used as message payloads
+PAYLOAD_SIZES = {
+    'tiny': 0,
+    'small': 16,
+    'medium': 512,
+    'large': 8192,
+}
+
+
+# Seconds a fresh interpreter may spend importing each entry point module
+IMPORT_BUDGETS = {
+    'server': 0.100,
+    'client': 0.080,
+    'bots': 0.150,
+}
+
+# Timed in a fresh interpreter so nothing is already imported
+_IMPORT_TIMER = ("import time; start = time.perf_counter(); import {module}; "
+                 "print(time.perf_counter() - start)")
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark's setup when it cannot run in this environment."""
+    pass
+
+
+def benchmark(name: str):
+    """
+    Register a benchmark.
+
+    The decorated function does the setup and returns a zero-argument
+    callable; only that callable is timed.
+
+    Args:
+        name: Unique benchmark name, dotted by area
+    """
+    def register(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _payload(size: int) -> Dict[str, Any]:
+    """Build a game state with size cells."""
+    return {'board': list(range(size)), 'current_player': 0, 'round': 1}
+
+
+def _socketpair(compression: bool = False) -> Tuple[socket.socket, socket.socket]:
+    """Create a connected socket pair, optionally with compressed frames."""
+    left, right = socket.socketpair()
+    if compression:
+        Protocol.enable_compression(left)
+        Protocol.enable_compression(right)
+    return left, right
+
+
+def _register_protocol_benchmarks():
+    for size_name, size in PAYLOAD_SIZES.items():
+        data = {'game_state': _payload(size)}
+        encoded = Protocol.create_message(MessageType.GAME_STATE, data)
+
+        @benchmark(f"protocol.create_message.{size_name}")
+        def create_message(data=data):
+            return lambda: Protocol.create_message(MessageType.GAME_STATE, data)
+
+        @benchmark(f"protocol.parse_message.{size_name}")
+        def parse_message(encoded=encoded):
+            return lambda: Protocol.parse_message(encoded)
+
+        @benchmark(f"protocol.send_receive.{size_name}")
+        def send_receive(data=data):
+            left, right = _socketpair()
+
+            def run():
+                Protocol.send_message(left, MessageType.GAME_STATE, data)
+                return Protocol.receive_message(right)
+            return run
+
+        @benchmark(f"protocol.send_receive_zlib.{size_name}")
+        def send_receive_zlib(data=data):
+            left, right = _socketpair(compression=True)
+            message = GameStateMessage(**data)
+
+            def run():
+                Protocol.send(left, message)
+                return Protocol.receive_message(right)
+            return run
+
+    @benchmark("protocol.send_receive.move")
+    def send_receive_move():
+        left, right = _socketpair()
+        message = MoveMessage(move='5', seq=1)
+
+        def run():
+            Protocol.send(left, message)
+            return Protocol.receive_message(right)
+        return run
+
+
+def _midgame_tictactoe() -> Tuple[GameInterface, Dict[str, Any]]:
+    from tictactoe import TicTacToeGame
+    game = TicTacToeGame()
+    state = game.initialize_game(2)
+    for player_id, move in ((0, '1'), (1, '5'), (0, '9')):
+        state = game.apply_move(state, player_id, move)
+    return game, state
+
+
+def _midgame_rockpaperscissors() -> Tuple[GameInterface, Dict[str, Any]]:
+    from example_game import RockPaperScissorsGame
+    game = RockPaperScissorsGame()
+    state = game.initialize_game(2)
+    state = game.apply_moves(state, {0: 'rock', 1: 'paper'})
+    return game, game.apply_move(state, 1, 'scissors')
+
+
+def _midgame_mnk(size: int = 19) -> Tuple[GameInterface, Dict[str, Any]]:
+    from mnk_game import MNKGame
+    game = MNKGame(size, size, 5)
+    state = game.initialize_game(2)
+    middle = size // 2
+    for index, (row, col) in enumerate(((0, 0), (0, 1), (1, 1), (1, 0), (-1, -1), (2, 2))):
+        state = game.apply_move(state, index % 2, f"{middle + row},{middle + col}")
+    return game, state
+
+
+def _register_game_benchmarks():
+    # (game name, mid-game factory, player to move, a valid move)
+    games = (
+        ('tictactoe', _midgame_tictactoe, 1, '3'),
+        ('rockpaperscissors', _midgame_rockpaperscissors, 0, 'rock'),
+        ('gomoku', _midgame_mnk, 0, '3,3'),
+    )
+    for game_name, factory, player_id, move in games:
+
+        @benchmark(f"game.{game_name}.validate_move")
+        def validate_move(factory=factory, player_id=player_id, move=move):
+            game, state = factory()
+            return lambda: game.validate_move(state, player_id, move)
+
+        @benchmark(f"game.{game_name}.apply_move")
+        def apply_move(factory=factory, player_id=player_id, move=move):
+            game, state = factory()
+            return lambda: game.apply_move(state, player_id, move)
+
+        @benchmark(f"game.{game_name}.check_game_over")
+        def check_game_over(factory=factory):
+            game, state = factory()
+            return lambda: game.check_game_over(state)
+
+        @benchmark(f"game.{game_name}.views")
+        def views(factory=factory):
+            game, state = factory()
+
+            def run():
+                cache = ViewCache(game)
+                return [cache.get_view(state, pid) for pid in range(game.get_max_players())]
+            return run
+
+
+def _play_bot(connection: Transport, game: GameInterface):
+    """Play the first legal move whenever asked until the game ends."""
+    player_id = None
+    game_state = None
+    while True:
+        message = connection.receive()
+        if message is None:
+            return
+        msg_type = message.message_type
+        if msg_type == MessageType.GAME_START:
+            player_id = message.player_id
+            game_state = message.initial_state
+        elif msg_type in (MessageType.YOUR_TURN, MessageType.GAME_STATE,
+                          MessageType.MOVE_ACCEPTED):
+            if message.game_state is not None:
+                game_state = message.game_state
+            elif message.changes is not None:
+                game_state = apply_changes(game_state, message.changes)
+            if msg_type == MessageType.YOUR_TURN:
+                moves = game.get_legal_moves(game_state, player_id)
+                connection.send(MoveMessage(move=moves[0]))
+        elif msg_type == MessageType.GAME_END:
+            return
+
+
+def simulate_session(game: GameInterface, num_players: Optional[int] = None,
+                     transport: str = 'queue', profiled: bool = False,
+                     deltas: bool = False):
+    """
+    Play one full game through a GameSession.
+
+    Each player is a thread that plays the first legal move.
+
+    Args:
+        game: GameInterface that supports get_legal_moves
+        num_players: Number of players (defaults to the game's minimum)
+        transport: 'queue' for in-process transports, 'socket' for socket pairs
+        profiled: Profile the session, to measure the cost of the instrumentation
+        deltas: Players negotiate state deltas instead of whole states
+    """
+    from server import GameServer, DEFAULT_CLIENT_OPTIONS
+    from session import GameSession
+    from game_registry import GameRegistry
+    from profiling import Profiler
+
+    server = GameServer(registry=GameRegistry(), profiler=Profiler(1.0 if profiled else 0.0))
+    server.logging = False
+    server.running = True
+
+    players = []
+    bots = []
+    for idx in range(num_players or game.get_min_players()):
+        if transport == 'queue':
+            server_side, client_side = QueueTransport.pair()
+        else:
+            server_side, client_side = (StreamTransport(sock) for sock in socket.socketpair())
+        players.append((server_side, f"bench-{idx}"))
+        server.client_options[server_side] = dict(DEFAULT_CLIENT_OPTIONS, deltas=deltas,
+                                                  board_display=False)
+        bot = threading.Thread(target=_play_bot, args=(client_side, game), daemon=True)
+        bot.start()
+        bots.append((bot, client_side))
+
+    GameSession(server, game, players).run()
+    for bot, client_side in bots:
+        bot.join()
+        client_side.close()
+
+
+def _register_session_benchmarks():
+    for transport in ('queue', 'socket'):
+
+        @benchmark(f"session.tictactoe.{transport}")
+        def session_tictactoe(transport=transport):
+            from tictactoe import TicTacToeGame
+            game = TicTacToeGame()
+            return lambda: simulate_session(game, transport=transport)
+
+        @benchmark(f"session.rockpaperscissors.{transport}")
+        def session_rockpaperscissors(transport=transport):
+            from example_game import RockPaperScissorsGame
+            game = RockPaperScissorsGame()
+            return lambda: simulate_session(game, transport=transport)
+
+        @benchmark(f"session.tictactoe.{transport}.profiled")
+        def session_tictactoe_profiled(transport=transport):
+            from tictactoe import TicTacToeGame
+            game = TicTacToeGame()
+            return lambda: simulate_session(game, transport=transport, profiled=True)
+
+    for deltas in (False, True):
+        suffix = '.deltas' if deltas else ''
+
+        @benchmark(f"session.gomoku.socket{suffix}")
+        def session_gomoku(deltas=deltas):
+            from mnk_game import GomokuGame
+            game = GomokuGame()
+            return lambda: simulate_session(game, transport='socket', deltas=deltas)
+
+        @benchmark(f"session.mnk.12_players.socket{suffix}")
+        def session_mnk_party(deltas=deltas):
+            from mnk_game import MNKGame
+            game = MNKGame(16, 16, 5, min_players=12, max_players=12)
+            return lambda: simulate_session(game, transport='socket', deltas=deltas)
+
+
+@functools.lru_cache(maxsize=None)
+def _tls_contexts():
+    """Server and client contexts for a throwaway self-signed certificate."""
+    from tls import server_context, client_context, generate_self_signed_cert
+    try:
+        certfile, keyfile = generate_self_signed_cert(tempfile.mkdtemp(prefix='benchmark-tls-'))
+    except RuntimeError as e:
+        raise SkipBenchmark(str(e))
+    return server_context(certfile, keyfile), client_context(certfile)
+
+
+def _tls_socketpair() -> Tuple[socket.socket, socket.socket]:
+    """Create a socket pair with a completed TLS handshake."""
+    server_ctx, client_ctx = _tls_contexts()
+    left, right = socket.socketpair()
+    accepted = []
+    handshake = threading.Thread(
+        target=lambda: accepted.append(server_ctx.wrap_socket(right, server_side=True)))
+    handshake.start()
+    client = client_ctx.wrap_socket(left, server_hostname='localhost')
+    handshake.join()
+    return client, accepted[0]
+
+
+def _serve_greetings(server_ctx=None) -> int:
+    """Accept loopback connections forever, sending one byte on each."""
+    listener = socket.create_server(('127.0.0.1', 0))
+
+    def serve():
+        while True:
+            sock, _ = listener.accept()
+            try:
+                if server_ctx is not None:
+                    sock = server_ctx.wrap_socket(sock, server_side=True)
+                sock.sendall(b'x')
+            except OSError:
+                pass
+            finally:
+                sock.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def _register_tls_benchmarks():
+    for size_name, size in PAYLOAD_SIZES.items():
+
+        @benchmark(f"tls.send_receive.{size_name}")
+        def send_receive(size=size):
+            left, right = _tls_socketpair()
+            message = GameStateMessage(game_state=_payload(size))
+
+            def run():
+                Protocol.send(left, message)
+                return Protocol.receive_message(right)
+            return run
+
+    @benchmark("tls.connect.plaintext")
+    def connect_plaintext():
+        port = _serve_greetings()
+
+        def run():
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.recv(1)
+            sock.close()
+        return run
+
+    for resume in (False, True):
+
+        @benchmark(f"tls.connect.{'resumed' if resume else 'full'}")
+        def connect_tls(resume=resume):
+            from tls import TLSTransport, session_cache_for
+            server_ctx, client_ctx = _tls_contexts()
+            port = _serve_greetings(server_ctx)
+            cache = session_cache_for(client_ctx)
+
+            def run():
+                if not resume:
+                    cache.clear()
+                transport = TLSTransport.connect('127.0.0.1', port, client_ctx, 'localhost')
+                # Reading also processes the session tickets sent after the handshake
+                transport.sock.recv(1)
+                transport.close()
+            return run
+
+
+# Players on the leaderboard in rating benchmarks
+RATED_PLAYERS = 10000
+
+
+def _rating_service(path: Optional[str] = None):
+    """A rating service whose leaderboard holds RATED_PLAYERS players."""
+    import random
+    from ratings import RatingService, PlayerRating
+    service = RatingService(path)
+    board = service.leaderboard('bench')
+    rng = random.Random(0)
+    for index in range(RATED_PLAYERS):
+        board.set(PlayerRating(f"player-{index}"), rng.gauss(1500, 200))
+    return service
+
+
+def _register_rating_benchmarks():
+
+    @benchmark("ratings.rank")
+    def rank():
+        service = _rating_service()
+        names = itertools.cycle([f"player-{index}" for index in range(0, RATED_PLAYERS, 7)])
+        return lambda: service.rank('bench', next(names))
+
+    @benchmark("ratings.top")
+    def top():
+        service = _rating_service()
+        return lambda: service.top('bench', 10)
+
+    for store in (False, True):
+
+        @benchmark(f"ratings.record_result.{'sqlite' if store else 'memory'}")
+        def record_result(store=store):
+            path = None
+            if store:
+                path = tempfile.mkdtemp(prefix='benchmark-ratings-') + '/ratings.db'
+            service = _rating_service(path)
+            pairs = itertools.cycle([[f"player-{index}", f"player-{index * 7 % RATED_PLAYERS}"]
+                                     for index in range(1, RATED_PLAYERS)])
+            # Times the game loop's side only; the database is written in the background
+            return lambda: service.record_result('bench', next(pairs), 0, False)
+
+
+def _register_event_benchmarks():
+    for subscribers in (0, 1, 4):
+
+        @benchmark(f"events.publish.{subscribers}")
+        def publish(subscribers=subscribers):
+            from events import EventBus, MOVE_PLAYED
+            bus = EventBus()
+            for index in range(subscribers):
+                # Large buffers and batches keep delivery threads mostly idle
+                bus.subscribe(f"bench-{index}", lambda batch: None, batch_size=4096)
+            return lambda: bus.publish(MOVE_PLAYED, 1, player=0, move='5')
+
+
+def _register_session_store_benchmarks():
+    from session_store import SessionTable, SessionSnapshot
+
+    def snapshots():
+        game, game_state = _midgame_tictactoe()
+        for session_id in itertools.count(1):
+            yield SessionSnapshot(session_id, 'bench', [f"a{session_id}", f"b{session_id}"],
+                                  game_state, 0.0, 4)
+
+    @benchmark("sessions.suspend.memory")
+    def suspend_memory():
+        table = SessionTable(tempfile.mkdtemp(prefix='benchmark-sessions-'))
+        new_snapshots = snapshots()
+        return lambda: table.suspend(next(new_snapshots))
+
+    @benchmark("sessions.suspend.evict")
+    def suspend_evict():
+        # A zero budget writes every suspended session straight to disk
+        table = SessionTable(tempfile.mkdtemp(prefix='benchmark-sessions-'), memory_budget=0)
+        new_snapshots = snapshots()
+        return lambda: table.suspend(next(new_snapshots))
+
+    @benchmark("sessions.memory_usage")
+    def memory_usage():
+        from session import GameSession
+        from server import GameServer
+        game, game_state = _midgame_tictactoe()
+        session = GameSession(GameServer(game_logic=game), game, [])
+        session._set_state(game_state)
+        session.view_cache.get_view(game_state, 0)
+        return session.memory_usage
+
+
+def _register_tournament_benchmarks():
+    from bots import RandomStrategy
+    from tournament import play_game
+
+    @benchmark("tournament.play_game.tictactoe")
+    def play_tictactoe():
+        from tictactoe import TicTacToeGame
+        game = TicTacToeGame()
+        strategies = [RandomStrategy(game, 1), RandomStrategy(game, 2)]
+        return lambda: play_game(game, strategies)
+
+    @benchmark("tournament.play_game.rockpaperscissors")
+    def play_rockpaperscissors():
+        from example_game import RockPaperScissorsGame
+        game = RockPaperScissorsGame()
+        strategies = [RandomStrategy(game, 1), RandomStrategy(game, 2)]
+        return lambda: play_game(game, strategies)
+
+
+def _register_history_benchmarks():
+    from history import GameHistory, position_hash
+
+    @benchmark("history.play_undo.tictactoe")
+    def play_undo():
+        game, game_state = _midgame_tictactoe()
+        history = GameHistory(game, game_state)
+        player_id = game.get_current_player(game_state)
+        move = game.get_legal_moves(game_state, player_id)[0]
+
+        def run():
+            history.play(player_id, move)
+            return history.undo()
+        return run
+
+    @benchmark("history.play_undo.tictactoe.copying")
+    def play_undo_copying():
+        game, game_state = _midgame_tictactoe()
+        history = GameHistory(game, game_state, in_place=False)
+        player_id = game.get_current_player(game_state)
+        move = game.get_legal_moves(game_state, player_id)[0]
+
+        def run():
+            history.play(player_id, move)
+            return history.undo()
+        return run
+
+    for size in (19, 101):
+        # In-place moves and win checks cost the same on any board size
+        @benchmark(f"history.play_undo.mnk.{size}x{size}")
+        def play_undo_mnk(size=size):
+            game, game_state = _midgame_mnk(size)
+            history = GameHistory(game, game_state)
+
+            def run():
+                history.play(0, '3,3')
+                return history.undo()
+            return run
+
+    @benchmark("history.position_hash.tictactoe")
+    def full_hash():
+        game, game_state = _midgame_tictactoe()
+        return lambda: position_hash(game, game_state)
+
+    @benchmark("history.search.tictactoe")
+    def search():
+        from bots import SearchStrategy
+        game = _midgame_tictactoe()[0]
+        game_state = game.initialize_game(2)
+
+        def run():
+            # A fresh table each time, so the whole game tree is searched
+            return SearchStrategy(game, 1).choose_move(game_state, 0)
+        return run
+
+
+def _register_network_benchmarks():
+    # One game per call through a fresh server and a fault-injecting proxy;
+    # the slower scenarios are measured with `python chaos.py scenarios`
+    for scenario in ('loopback', 'lan', 'fragmented'):
+        @benchmark(f"network.{scenario}.tictactoe")
+        def network_game(scenario=scenario):
+            from chaos import SCENARIOS, run_scenario
+            profile = SCENARIOS[scenario]
+            return lambda: run_scenario(profile, 'tictactoe', games=1, concurrency=1)
+
+
+def time_import(module: str) -> float:
+    """
+    Time importing a module in a fresh interpreter.
+
+    Args:
+        module: Module name, importable from this directory
+
+    Returns:
+        Seconds spent in the import statement
+    """
+    output = subprocess.run([sys.executable, '-c', _IMPORT_TIMER.format(module=module)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            check=True, capture_output=True, text=True).stdout
+    return float(output)
+
+
+def check_import_budgets(budgets: Optional[Dict[str, float]] = None,
+                         repeat: int = DEFAULT_REPEAT) -> List[str]:
+    """
+    Compare the best of several cold import times against their budgets.
+
+    Args:
+        budgets: Module name -> allowed seconds; defaults to IMPORT_BUDGETS
+        repeat: Number of fresh interpreters per module
+
+    Returns:
+        Names of modules that took longer than their budget
+    """
+    over = []
+    for module, budget in (budgets or IMPORT_BUDGETS).items():
+        best = min(time_import(module) for _ in range(repeat))
+        marker = ''
+        if best > budget:
+            over.append(module)
+            marker = '  OVER BUDGET'
+        print(f"import {module:<41} {best * 1e3:>9.1f} ms  (budget {budget * 1e3:.0f} ms){marker}")
+    return over
+
+
+def _register_startup_benchmarks():
+    for module in IMPORT_BUDGETS:
+        @benchmark(f"startup.import.{module}")
+        def import_module(module=module):
+            return lambda: time_import(module)
+
+
+_register_protocol_benchmarks()
+_register_game_benchmarks()
+_register_session_benchmarks()
+_register_tls_benchmarks()
+_register_rating_benchmarks()
+_register_event_benchmarks()
+_register_session_store_benchmarks()
+_register_tournament_benchmarks()
+_register_history_benchmarks()
+_register_network_benchmarks()
+_register_startup_benchmarks()
+
+
+def run_benchmark(name: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """
+    Time one registered benchmark.
+
+    The number of calls per repeat is calibrated so each repeat takes at
+    least 0.2 seconds.
+
+    Args:
+        name: Registered benchmark name
+        repeat: Number of timed repeats
+
+    Returns:
+        Dictionary with 'best' and 'median' seconds per call and 'number'
+        of calls per repeat
+    """
+    timer = timeit.Timer(BENCHMARKS[name]())
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {'best': min(times), 'median': statistics.median(times), 'number': number}
+
+
+def run_benchmarks(names: List[str], repeat: int = DEFAULT_REPEAT) -> Dict[str, Dict[str, Any]]:
+    """
+    Time several benchmarks, printing each result as it completes.
+
+    Args:
+        names: Registered benchmark names
+        repeat: Number of timed repeats per benchmark
+
+    Returns:
+        Dictionary mapping benchmark name to its run_benchmark result
+    """
+    results = {}
+    for name in names:
+        try:
+            result = run_benchmark(name, repeat)
+        except SkipBenchmark as e:
+            print(f"{name:<48} skipped: {e}")
+            continue
+        results[name] = result
+        print(f"{name:<48} {result['best'] * 1e6:>12.2f} us  "
+              f"{1 / result['best']:>12.0f} ops/s")
+    return results
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], path: str):
+    """Write benchmark results to a JSON baseline file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': BASELINE_FORMAT_VERSION,
+            'created_at': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read the results from a JSON baseline file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported baseline version: {baseline.get('version')}")
+    return baseline['results']
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Compare results against a baseline.
+
+    Args:
+        results: Results of this run
+        baseline: Results loaded from a baseline file
+        threshold: Allowed fractional slowdown of the best time
+
+    Returns:
+        Names of benchmarks slower than the baseline by more than threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result['best'] / baseline[name]['best'] - 1
+        marker = ''
+        if change > threshold:
+            regressions.append(name)
+            marker = '  REGRESSION'
+        print(f"{name:<48} {change:>+8.1%}{marker}")
+    return regressions
+
+
+def main():
+    """Run benchmarks from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark protocol and game hot paths')
+    parser.add_argument('filters', nargs='*', help='Only run benchmarks containing one of these')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed repeats')
+    parser.add_argument('--save', metavar='PATH', help='Write results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed fractional slowdown before failing')
+    parser.add_argument('--list', action='store_true', help='List benchmarks and exit')
+    parser.add_argument('--check-imports', action='store_true',
+                        help='Only check cold import times against IMPORT_BUDGETS')
+
+    args = parser.parse_args()
+
+    if args.check_imports:
+        over = check_import_budgets(repeat=args.repeat)
+        if over:
+            print(f"{len(over)} import(s) over budget")
+            return 1
+        return 0
+
+    names = [name for name in BENCHMARKS
+             if not args.filters or any(f in name for f in args.filters)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    results = run_benchmarks(names, args.repeat)
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        print(f"\nCompared with {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, load_baseline(args.compare), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
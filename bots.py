@@ -0,0 +1,485 @@
+"""
+Embeddable client SDK for automated players.
+A BotClient plays games on the server with a pluggable MoveStrategy, and a
+BotPool runs many bots in one event loop without a thread per bot, and
+run_forked spreads pools over worker processes forked after startup.
+"""
+import asyncio
+import json
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List, Callable
+from async_client import AsyncGameClient
+from protocol import MessageType
+from messages import Message
+from game_interface import GameInterface
+from history import GameHistory
+
+
+# Rejected moves tolerated per turn before a bot gives up on the game
+MAX_REJECTED_MOVES = 5
+
+# Positions a SearchStrategy remembers before its transposition table is cleared
+TRANSPOSITION_TABLE_LIMIT = 1 << 18
+
+# Kinds of value stored in the transposition table
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+
+class MoveStrategy(ABC):
+    """Chooses a move from the game state sent with YOUR_TURN."""
+
+    @abstractmethod
+    def choose_move(self, game_state: Dict[str, Any], player_id: int) -> Any:
+        """
+        Choose the next move.
+
+        Args:
+            game_state: Game state visible to the player
+            player_id: ID of the player to move for (0-indexed)
+
+        Returns:
+            The move to send to the server
+        """
+        pass
+
+    def game_over(self, result: Message):
+        """Called with the GAME_END message after each game."""
+        pass
+
+
+class RandomStrategy(MoveStrategy):
+    """Plays a uniformly random legal move."""
+
+    def __init__(self, game_logic: GameInterface, seed: Optional[int] = None):
+        """
+        Initialize the strategy.
+
+        Args:
+            game_logic: GameInterface that can list legal moves
+            seed: Seed for reproducible move choices
+        """
+        self.game_logic = game_logic
+        self.random = random.Random(seed)
+
+    def choose_move(self, game_state: Dict[str, Any], player_id: int) -> Any:
+        moves = self.game_logic.get_legal_moves(game_state, player_id)
+        if not moves:
+            raise ValueError(f"{self.game_logic.get_game_name()} has no legal moves to choose from")
+        return self.random.choice(moves)
+
+
+class FirstLegalStrategy(MoveStrategy):
+    """Plays the first legal move; a deterministic baseline for tournaments."""
+
+    def __init__(self, game_logic: GameInterface, seed: Optional[int] = None):
+        """
+        Initialize the strategy.
+
+        Args:
+            game_logic: GameInterface that can list legal moves
+            seed: Ignored; accepted so the class works as a tournament entrant
+        """
+        self.game_logic = game_logic
+
+    def choose_move(self, game_state: Dict[str, Any], player_id: int) -> Any:
+        moves = self.game_logic.get_legal_moves(game_state, player_id)
+        if not moves:
+            raise ValueError(f"{self.game_logic.get_game_name()} has no legal moves to choose from")
+        return moves[0]
+
+
+class SearchStrategy(MoveStrategy):
+    """
+    Alpha-beta search for two-player sequential games with full information.
+
+    Moves are played and taken back on a GameHistory, and searched
+    positions are remembered by position hash, so positions reached by
+    different move orders are only searched once.
+    """
+
+    def __init__(self, game_logic: GameInterface, seed: Optional[int] = None, depth: int = 9):
+        """
+        Initialize the strategy.
+
+        Args:
+            game_logic: GameInterface that can list legal moves
+            seed: Seed for choosing between equally good moves
+            depth: Number of moves searched ahead
+        """
+        self.game_logic = game_logic
+        self.random = random.Random(seed)
+        self.depth = depth
+        # Position hash -> (depth, value, kind of value)
+        self.table: Dict[int, tuple] = {}
+
+    def choose_move(self, game_state: Dict[str, Any], player_id: int) -> Any:
+        moves = self.game_logic.get_legal_moves(game_state, player_id)
+        if not moves:
+            raise ValueError(f"{self.game_logic.get_game_name()} has no legal moves to choose from")
+        if len(self.table) > TRANSPOSITION_TABLE_LIMIT:
+            self.table.clear()
+        history = GameHistory(self.game_logic, game_state)
+        moves = list(moves)
+        self.random.shuffle(moves)
+        best_move, best_value = moves[0], float('-inf')
+        for move in moves:
+            history.play(player_id, move)
+            value = -self._search(history, self.depth - 1, float('-inf'), -best_value)
+            history.undo()
+            if value > best_value:
+                best_move, best_value = move, value
+        return best_move
+
+    def _search(self, history: GameHistory, depth: int, alpha: float, beta: float) -> float:
+        """Value of the position for the player to move; sooner wins are worth more."""
+        game_logic = self.game_logic
+        player_id = game_logic.get_current_player(history.state)
+        result = history.check_game_over()
+        if result:
+            if result.get('draw') or result.get('winner') is None:
+                return 0
+            return (1 + depth) if result['winner'] == player_id else -(1 + depth)
+        if depth <= 0:
+            return 0
+
+        entry = self.table.get(history.hash)
+        if entry is not None and entry[0] >= depth:
+            _, value, kind = entry
+            if kind == _EXACT:
+                return value
+            if kind == _LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        original_alpha = alpha
+        best = float('-inf')
+        for move in game_logic.get_legal_moves(history.state, player_id) or ():
+            history.play(player_id, move)
+            value = -self._search(history, depth - 1, -beta, -alpha)
+            history.undo()
+            if value > best:
+                best = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        if best == float('-inf'):
+            # No legal moves without the game being over
+            return 0
+
+        if best <= original_alpha:
+            kind = _UPPER
+        elif best >= beta:
+            kind = _LOWER
+        else:
+            kind = _EXACT
+        self.table[history.hash] = (depth, best, kind)
+        return best
+
+
+class CallbackStrategy(MoveStrategy):
+    """Adapts a plain function of (game_state, player_id) into a strategy."""
+
+    def __init__(self, callback: Callable[[Dict[str, Any], int], Any]):
+        self.callback = callback
+
+    def choose_move(self, game_state: Dict[str, Any], player_id: int) -> Any:
+        return self.callback(game_state, player_id)
+
+
+class BotClient:
+    """Automated player that plays one or more games with a strategy."""
+
+    __slots__ = ('host', 'port', 'strategy', 'compression', 'game', 'unix_path', 'name', 'client',
+                 'wins', 'losses', 'draws', 'aborted', '_rejections')
+
+    def __init__(self, strategy: MoveStrategy, host: str = 'localhost', port: int = 8000,
+                 compression: bool = False, game: Optional[str] = None,
+                 unix_path: Optional[str] = None, name: Optional[str] = None):
+        """
+        Initialize the bot.
+
+        Args:
+            strategy: Strategy choosing this bot's moves
+            host: Server host address
+            port: Server port number
+            compression: Ask the server for compressed frames
+            game: Registry key of the game to play, or None for the server's default
+            unix_path: Connect to a Unix-domain socket path instead of host and port
+            name: Player name to be rated under, or None to play unrated
+        """
+        self.host = host
+        self.port = port
+        self.strategy = strategy
+        self.compression = compression
+        self.game = game
+        self.unix_path = unix_path
+        self.name = name
+        self.client: Optional[AsyncGameClient] = None
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.aborted = 0
+        self._rejections = 0
+
+    @property
+    def games_played(self) -> int:
+        return self.wins + self.losses + self.draws + self.aborted
+
+    async def play(self, games: int = 1):
+        """
+        Play games one after another, reconnecting between them.
+
+        Args:
+            games: Number of games to play
+        """
+        for _ in range(games):
+            if not await self.play_game():
+                break
+
+    async def play_game(self) -> bool:
+        """
+        Connect and play a single game.
+
+        Returns:
+            True if the game finished, False if it was aborted or never started
+        """
+        finished = []
+        client = AsyncGameClient(self.host, self.port, compression=self.compression,
+                                 game=self.game, unix_path=self.unix_path, name=self.name,
+                                 deltas=True)
+        self.client = client
+        self._rejections = 0
+
+        client.on(MessageType.YOUR_TURN, self._on_your_turn)
+        client.on(MessageType.MOVE_ACCEPTED, self._on_move_accepted)
+        client.on(MessageType.MOVE_REJECTED, self._on_move_rejected)
+        client.on(MessageType.GAME_END, lambda message: finished.append(message))
+
+        await client.run()
+        self.client = None
+
+        if not finished:
+            self.aborted += 1
+            return False
+        result = finished[0]
+        if result.draw:
+            self.draws += 1
+        elif result.won:
+            self.wins += 1
+        else:
+            self.losses += 1
+        self.strategy.game_over(result)
+        return True
+
+    def _send_move(self):
+        client = self.client
+        try:
+            move = self.strategy.choose_move(client.game_state, client.player_id)
+        except Exception as e:
+            print(f"Strategy error: {e}")
+            asyncio.ensure_future(client.close())
+            return
+        client.send_move(move)
+
+    def _on_your_turn(self, message: Message):
+        self._rejections = 0
+        self._send_move()
+
+    def _on_move_accepted(self, message: Message):
+        self._rejections = 0
+
+    def _on_move_rejected(self, message: Message):
+        self._rejections += 1
+        if self._rejections >= MAX_REJECTED_MOVES:
+            asyncio.ensure_future(self.client.close())
+        elif self.client.is_my_turn():
+            self._send_move()
+
+
+class BotPool:
+    """Runs many bots concurrently in one event loop."""
+
+    def __init__(self, strategy_factory: Callable[[int], MoveStrategy], size: int,
+                 host: str = 'localhost', port: int = 8000,
+                 max_connections: Optional[int] = None, compression: bool = False,
+                 game: Optional[str] = None, unix_path: Optional[str] = None,
+                 name_prefix: Optional[str] = None, first_index: int = 0,
+                 min_players: int = 2):
+        """
+        Initialize the pool.
+
+        Args:
+            strategy_factory: Called with a bot index to create its strategy
+            size: Number of bots
+            host: Server host address
+            port: Server port number
+            max_connections: Cap on simultaneous connections (defaults to size)
+            compression: Ask the server for compressed frames
+            game: Registry key of the game to play, or None for the server's default
+            unix_path: Connect to a Unix-domain socket path instead of host and port
+            name_prefix: Name bots <prefix><index> so their games are rated
+            first_index: Index of the first bot, when pools share out a range of bots
+            min_players: Players a game needs to start
+
+        Raises:
+            ValueError: If max_connections is below min_players, which would
+                leave every connected bot waiting in the lobby for a game
+                that cannot start
+        """
+        self.max_connections = max_connections or size
+        if self.max_connections < min_players:
+            raise ValueError(f"max_connections ({self.max_connections}) must be at least the "
+                             f"{min_players} players a game needs")
+        self.bots: List[BotClient] = [
+            BotClient(strategy_factory(index), host, port, compression, game, unix_path,
+                      None if name_prefix is None else f"{name_prefix}{index}")
+            for index in range(first_index, first_index + size)
+        ]
+
+    async def run(self, games_per_bot: int = 1):
+        """
+        Let every bot play its games, at most max_connections at a time.
+
+        Args:
+            games_per_bot: Number of games each bot plays
+        """
+        slots = asyncio.Semaphore(self.max_connections)
+
+        async def play(bot: BotClient):
+            for _ in range(games_per_bot):
+                async with slots:
+                    await bot.play_game()
+
+        await asyncio.gather(*(play(bot) for bot in self.bots))
+
+    def stats(self) -> Dict[str, int]:
+        """Get the combined results of all bots."""
+        return {
+            'games': sum(bot.games_played for bot in self.bots),
+            'wins': sum(bot.wins for bot in self.bots),
+            'losses': sum(bot.losses for bot in self.bots),
+            'draws': sum(bot.draws for bot in self.bots),
+            'aborted': sum(bot.aborted for bot in self.bots),
+        }
+
+
+def run_forked(make_pool: Callable[[int, int], BotPool], size: int, processes: int,
+               games_per_bot: int = 1) -> Dict[str, int]:
+    """
+    Run bots in worker processes forked from this one.
+
+    Whatever the caller imported and loaded before calling is inherited by
+    the workers, so they start playing without paying the import and game
+    loading cost again.
+
+    Args:
+        make_pool: Called in each worker with (first_index, size) to build its pool
+        size: Total number of bots
+        processes: Number of worker processes
+        games_per_bot: Number of games each bot plays
+
+    Returns:
+        Combined stats of all workers' pools
+
+    Raises:
+        RuntimeError: If this platform cannot fork
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Forked workers need a platform with os.fork")
+
+    workers = []
+    for worker in range(processes):
+        first_index = size * worker // processes
+        share = size * (worker + 1) // processes - first_index
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 1
+            try:
+                pool = make_pool(first_index, share)
+                asyncio.run(pool.run(games_per_bot))
+                with os.fdopen(write_fd, 'w') as f:
+                    json.dump(pool.stats(), f)
+                status = 0
+            except Exception:
+                import traceback
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        workers.append((pid, read_fd))
+
+    totals: Dict[str, int] = {}
+    for pid, read_fd in workers:
+        with os.fdopen(read_fd, 'r') as f:
+            output = f.read()
+        os.waitpid(pid, 0)
+        if not output:
+            print(f"Bot worker {pid} failed")
+            continue
+        for key, value in json.loads(output).items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def main():
+    """Run a pool of random bots against a server."""
+    import argparse
+    import time
+    from game_registry import GameRegistry, DEFAULT_GAME
+
+    parser = argparse.ArgumentParser(description='Run automated players against a game server')
+    parser.add_argument('--host', default='localhost', help='Server host address')
+    parser.add_argument('--port', type=int, default=8000, help='Server port number')
+    parser.add_argument('--unix', metavar='PATH', default=None,
+                        help='Connect to a Unix-domain socket instead of TCP')
+    parser.add_argument('--bots', type=int, default=2, help='Number of bots')
+    parser.add_argument('--games', type=int, default=1, help='Games per bot')
+    parser.add_argument('--max-connections', type=int, default=None,
+                        help='Cap on simultaneous connections')
+    parser.add_argument('--seed', type=int, default=None, help='Base seed for move choices')
+    parser.add_argument('--game', default=DEFAULT_GAME, help='Game to play')
+    parser.add_argument('--name-prefix', default=None,
+                        help='Name bots <prefix><index> so their games are rated')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Fork this many worker processes after startup to share the bots')
+
+    args = parser.parse_args()
+
+    game = GameRegistry.default().get(args.game)
+    min_players = game.get_min_players()
+    if args.max_connections is not None and args.max_connections < min_players * args.processes:
+        parser.error(f"--max-connections must allow {min_players} connections per process")
+
+    def strategy_factory(index: int) -> MoveStrategy:
+        seed = None if args.seed is None else args.seed + index
+        return RandomStrategy(game, seed)
+
+    def make_pool(first_index: int, size: int) -> BotPool:
+        max_connections = args.max_connections
+        if max_connections and args.processes > 1:
+            max_connections = max_connections // args.processes
+        return BotPool(strategy_factory, size, args.host, args.port, max_connections,
+                       game=args.game, unix_path=args.unix, name_prefix=args.name_prefix,
+                       first_index=first_index, min_players=min_players)
+
+    start = time.perf_counter()
+    if args.processes > 1:
+        stats = run_forked(make_pool, args.bots, args.processes, args.games)
+    else:
+        pool = make_pool(0, args.bots)
+        asyncio.run(pool.run(args.games))
+        stats = pool.stats()
+    elapsed = time.perf_counter() - start
+    print(f"{stats} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+"""
+Fault injection between clients and a game server.
+A ChaosProxy forwards TCP connections to a server while delaying,
+throttling, fragmenting and resetting the traffic, so the server and
+clients can be tested under bad network conditions on one machine.
+`python chaos.py scenarios` plays bot games through each built-in network
+scenario and reports turn latency and how many sessions survived;
+`python chaos.py proxy --target HOST:PORT` puts a proxy in front of a
+running server for manual testing.
+"""
+import asyncio
+import math
+import queue
+import random
+import socket
+import statistics
+import struct
+import threading
+import time
+from typing import Dict, Any, Optional, List, Set
+
+
+# Largest chunk read from a socket at once
+RECV_SIZE = 65536
+
+# Seconds between the pieces of a fragmented write, so each arrives in its own read
+FRAGMENT_GAP = 0.0002
+
+# Seconds the accept loop waits before checking whether the proxy stopped
+ACCEPT_POLL_INTERVAL = 0.2
+
+# Seconds a scenario may run before the games still in progress are abandoned
+DEFAULT_SCENARIO_TIMEOUT = 120.0
+
+# Seconds between checks of whether a scenario's games are done
+SCENARIO_POLL_INTERVAL = 0.05
+
+
+class FaultProfile:
+    """Network conditions a ChaosProxy imposes on both directions of a connection."""
+
+    __slots__ = ('latency', 'jitter', 'bandwidth', 'fragment_size', 'drop_rate')
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 bandwidth: Optional[int] = None, fragment_size: Optional[int] = None,
+                 drop_rate: float = 0.0):
+        """
+        Initialize the profile.
+
+        Args:
+            latency: One-way delay in seconds added to everything forwarded
+            jitter: Largest extra random delay in seconds; data is still
+                delivered in order, as TCP would
+            bandwidth: Bytes per second each direction carries, or None for no cap
+            fragment_size: Largest write in bytes; data is written in pieces of
+                random size up to this, or as it was read if None
+            drop_rate: Chance that reading a chunk resets the connection
+                abruptly, dropping what is in flight
+        """
+        if latency < 0 or jitter < 0:
+            raise ValueError("Latency and jitter cannot be negative")
+        if bandwidth is not None and bandwidth <= 0:
+            raise ValueError("Bandwidth must be positive")
+        if fragment_size is not None and fragment_size < 1:
+            raise ValueError("Fragment size must be at least 1 byte")
+        if not 0.0 <= drop_rate <= 1.0:
+            raise ValueError("Drop rate must be between 0 and 1")
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.fragment_size = fragment_size
+        self.drop_rate = drop_rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the profile's settings."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        settings = ', '.join(f"{name}={value!r}" for name, value in self.to_dict().items()
+                             if value)
+        return f"FaultProfile({settings})"
+
+
+# Built-in network conditions, from best to worst
+SCENARIOS: Dict[str, FaultProfile] = {
+    'loopback': FaultProfile(),
+    'lan': FaultProfile(latency=0.0005, jitter=0.0005),
+    'broadband': FaultProfile(latency=0.015, jitter=0.005, bandwidth=1_000_000),
+    'fragmented': FaultProfile(fragment_size=16),
+    'mobile': FaultProfile(latency=0.05, jitter=0.03, bandwidth=50_000, fragment_size=536),
+    'flaky': FaultProfile(latency=0.01, jitter=0.005, drop_rate=0.005),
+}
+
+
+class _Link:
+    """One proxied connection: a pump thread pair per direction."""
+
+    def __init__(self, proxy: 'ChaosProxy', client: socket.socket, upstream: socket.socket,
+                 rng: random.Random):
+        self.proxy = proxy
+        self.profile = proxy.profile
+        self.sockets = (client, upstream)
+        self.rng = rng
+        self.closed = False
+        self._open_directions = 2
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start forwarding in both directions."""
+        client, upstream = self.sockets
+        for source, destination in ((client, upstream), (upstream, client)):
+            pending: queue.Queue = queue.Queue()
+            threading.Thread(target=self._read, args=(source, pending), daemon=True).start()
+            threading.Thread(target=self._write, args=(destination, pending),
+                             daemon=True).start()
+
+    def _read(self, source: socket.socket, pending: queue.Queue):
+        """Read from source and queue each chunk with the time it is due at the other end."""
+        profile, rng = self.profile, self.rng
+        # When the capped line finishes sending what is queued, and the last chunk is due
+        line_free = 0.0
+        last_due = 0.0
+        while True:
+            try:
+                data = source.recv(RECV_SIZE)
+            except OSError:
+                data = b''
+            if not data:
+                pending.put(None)
+                return
+            if profile.drop_rate and rng.random() < profile.drop_rate:
+                self.reset(dropped=True)
+                pending.put(None)
+                return
+            sent = time.monotonic()
+            if profile.bandwidth:
+                line_free = sent = max(sent, line_free) + len(data) / profile.bandwidth
+            due = sent + profile.latency + rng.uniform(0.0, profile.jitter)
+            # A chunk never overtakes the one before it
+            last_due = due = max(due, last_due)
+            pending.put((due, data))
+
+    def _write(self, destination: socket.socket, pending: queue.Queue):
+        """Write queued chunks to destination once they are due."""
+        while True:
+            item = pending.get()
+            if item is None:
+                self._finish(destination)
+                return
+            due, data = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                if self.profile.fragment_size:
+                    for piece in self._fragments(data):
+                        destination.sendall(piece)
+                        time.sleep(FRAGMENT_GAP)
+                else:
+                    destination.sendall(data)
+            except OSError:
+                self.reset()
+                return
+            self.proxy._count('bytes_forwarded', len(data))
+
+    def _fragments(self, data: bytes):
+        """Split data into pieces of random size up to the profile's fragment size."""
+        size = self.profile.fragment_size
+        offset = 0
+        while offset < len(data):
+            step = self.rng.randint(1, size)
+            yield data[offset:offset + step]
+            offset += step
+
+    def _finish(self, destination: socket.socket):
+        """Pass on the end of one direction, closing the link once both have ended."""
+        try:
+            destination.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        with self._lock:
+            self._open_directions -= 1
+            if self._open_directions or self.closed:
+                return
+            self.closed = True
+        for sock in self.sockets:
+            sock.close()
+        self.proxy._forget(self)
+
+    def reset(self, dropped: bool = False):
+        """
+        Close both ends with a TCP reset, losing the data in flight.
+
+        Args:
+            dropped: The reset is an injected fault, counted in the proxy's drops
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        if dropped:
+            self.proxy._count('drops')
+        for sock in self.sockets:
+            try:
+                # Closing with a zero linger time sends RST instead of FIN
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                # Wakes the reader blocked on this socket without sending anything
+                sock.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+            sock.close()
+        self.proxy._forget(self)
+
+
+class ChaosProxy:
+    """TCP proxy that forwards connections to a server through a FaultProfile."""
+
+    def __init__(self, target_host: str, target_port: int, profile: FaultProfile,
+                 host: str = 'localhost', port: int = 0, seed: Optional[int] = None):
+        """
+        Initialize the proxy.
+
+        Args:
+            target_host: Host of the server to forward to
+            target_port: Port of the server to forward to
+            profile: Faults to inject
+            host: Address to listen on
+            port: Port to listen on, or 0 for any free port
+            seed: Seed of the fault choices, so runs drop and fragment alike;
+                each connection draws from its own generator
+        """
+        self.target = (target_host, target_port)
+        self.profile = profile
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.running = False
+        self.counters = {'connections': 0, 'refused': 0, 'drops': 0, 'bytes_forwarded': 0}
+        self._listener: Optional[socket.socket] = None
+        self._links: Set[_Link] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> int:
+        """
+        Start listening and forwarding in a background thread.
+
+        Returns:
+            The port the proxy listens on
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(128)
+        listener.settimeout(ACCEPT_POLL_INTERVAL)
+        self._listener = listener
+        self.port = listener.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        """Stop accepting connections and reset the ones still open."""
+        self.running = False
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        with self._lock:
+            links = list(self._links)
+        for link in links:
+            link.reset()
+
+    def stats(self) -> Dict[str, int]:
+        """Get connection, drop and byte counters."""
+        with self._lock:
+            return dict(self.counters, open=len(self._links))
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def _forget(self, link: _Link):
+        with self._lock:
+            self._links.discard(link)
+
+    def _accept_loop(self):
+        """Accept connections until the proxy stops."""
+        listener = self._listener
+        while self.running:
+            try:
+                client, _ = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError as e:
+                print(f"Proxy could not reach {self.target[0]}:{self.target[1]}: {e}")
+                self._count('refused')
+                client.close()
+                continue
+            for sock in (client, upstream):
+                # Each fragment goes out in its own segment
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                index = self.counters['connections']
+                self.counters['connections'] += 1
+            rng = random.Random() if self.seed is None else random.Random(
+                self.seed * 1_000_003 + index)
+            link = _Link(self, client, upstream, rng)
+            with self._lock:
+                self._links.add(link)
+            link.start()
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of values, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_scenario(profile: FaultProfile, game: Optional[str] = None, games: int = 20,
+                 concurrency: int = 4, seed: int = 0,
+                 timeout: float = DEFAULT_SCENARIO_TIMEOUT) -> Dict[str, Any]:
+    """
+    Play bot games against a local server through a ChaosProxy.
+
+    Turn latency is measured by the server, from sending a player its turn
+    to receiving the move, so it covers the round trip through the proxy.
+    A session survives if its game is played to the end.
+
+    Args:
+        profile: Faults to inject
+        game: Registry key of the game, or None for the default game
+        games: Number of sessions to start; bots replace dropped games until
+            this many have started
+        concurrency: Games played at the same time
+        seed: Seed of the bots' moves and the proxy's faults
+        timeout: Seconds after which games still in progress are abandoned
+
+    Returns:
+        Dictionary with session counts, 'survival' (fraction of started
+        sessions that finished), turn latency percentiles in seconds and
+        the proxy's counters
+    """
+    from server import GameServer
+    from bots import BotPool, RandomStrategy
+    from game_registry import GameRegistry, DEFAULT_GAME
+    from events import GAME_STARTED, GAME_ENDED, MOVE_PLAYED, PLAYER_DISCONNECTED
+
+    game = game or DEFAULT_GAME
+    registry = GameRegistry.default()
+    game_logic = registry.get(game)
+    server = GameServer(port=0, registry=registry, default_game=game)
+    server.logging = False
+    events: List[Any] = []
+    server.events.subscribe('chaos', events.extend, flush_interval=0.05)
+    threading.Thread(target=server.start, daemon=True).start()
+    while server.server_socket is None or not server.running:
+        time.sleep(0.01)
+
+    proxy = ChaosProxy('localhost', server.server_socket.getsockname()[1], profile, seed=seed)
+    port = proxy.start()
+    players = game_logic.get_min_players()
+    pool = BotPool(lambda index: RandomStrategy(game_logic, seed + index), players * concurrency,
+                   port=port, game=game, min_players=players)
+    games_per_bot = -(-games // concurrency)
+
+    async def play() -> bool:
+        """Play until the games are done, returning False if the timeout passed first."""
+        task = asyncio.ensure_future(pool.run(games_per_bot))
+        deadline = time.monotonic() + timeout
+        while not task.done():
+            # Bots whose games were dropped play on, and the last may wait alone in a lobby
+            if (server.sessions_started >= games and not server.sessions) or \
+                    time.monotonic() >= deadline:
+                task.cancel()
+                break
+            await asyncio.wait((task,), timeout=SCENARIO_POLL_INTERVAL)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return time.monotonic() < deadline
+
+    started = time.perf_counter()
+    timed_out = not asyncio.run(play())
+    elapsed = time.perf_counter() - started
+    proxy.stop()
+    server.stop()
+    server.events.close()
+
+    counts = {event_type: 0 for event_type in (GAME_STARTED, GAME_ENDED, PLAYER_DISCONNECTED)}
+    latencies = []
+    for event in events:
+        if event.type == MOVE_PLAYED:
+            latencies.append(event.data['latency'])
+        elif event.type in counts:
+            counts[event.type] += 1
+    sessions = counts[GAME_STARTED]
+    return {
+        'sessions': sessions,
+        'finished': counts[GAME_ENDED],
+        'disconnects': counts[PLAYER_DISCONNECTED],
+        'survival': counts[GAME_ENDED] / sessions if sessions else 0.0,
+        'moves': len(latencies),
+        'turn_p50': _percentile(latencies, 0.50),
+        'turn_p95': _percentile(latencies, 0.95),
+        'turn_mean': statistics.fmean(latencies) if latencies else None,
+        'elapsed': elapsed,
+        'timed_out': timed_out,
+        'proxy': proxy.stats(),
+    }
+
+
+def run_scenarios(names: List[str], **options) -> Dict[str, Dict[str, Any]]:
+    """
+    Run several built-in scenarios, printing each result as it completes.
+
+    Args:
+        names: Keys of SCENARIOS
+        **options: Passed on to run_scenario
+
+    Returns:
+        Dictionary mapping scenario name to its run_scenario result
+    """
+    def ms(seconds: Optional[float]) -> str:
+        return '-' if seconds is None else f"{seconds * 1000:.1f}"
+
+    print(f"{'scenario':<12} {'sessions':>8} {'survival':>9} {'turn p50':>10} "
+          f"{'turn p95':>10} {'drops':>7} {'elapsed':>8}")
+    results = {}
+    for name in names:
+        result = results[name] = run_scenario(SCENARIOS[name], **options)
+        print(f"{name:<12} {result['sessions']:>8} {result['survival']:>9.1%} "
+              f"{ms(result['turn_p50']):>7} ms {ms(result['turn_p95']):>7} ms "
+              f"{result['proxy']['drops']:>7} {result['elapsed']:>7.2f}s"
+              f"{'  TIMED OUT' if result['timed_out'] else ''}")
+    return results
+
+
+def main():
+    """Run a fault-injecting proxy or the network scenarios from the command line."""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Test the server under bad network conditions')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    proxy_parser = commands.add_parser('proxy', help='Forward connections to a server with faults')
+    proxy_parser.add_argument('--target', required=True, metavar='HOST:PORT',
+                              help='Server to forward to')
+    proxy_parser.add_argument('--host', default='localhost', help='Address to listen on')
+    proxy_parser.add_argument('--port', type=int, default=8001, help='Port to listen on')
+    proxy_parser.add_argument('--latency', type=float, default=0.0, help='One-way delay in ms')
+    proxy_parser.add_argument('--jitter', type=float, default=0.0,
+                              help='Largest extra random delay in ms')
+    proxy_parser.add_argument('--bandwidth', type=int, default=None,
+                              help='Bytes per second in each direction')
+    proxy_parser.add_argument('--fragment', type=int, default=None, metavar='BYTES',
+                              help='Split writes into pieces of at most this size')
+    proxy_parser.add_argument('--drop-rate', type=float, default=0.0,
+                              help='Chance per chunk of resetting the connection')
+    proxy_parser.add_argument('--seed', type=int, default=None, help='Seed of the fault choices')
+
+    scenario_parser = commands.add_parser('scenarios', help='Play bot games through scenarios')
+    scenario_parser.add_argument('names', nargs='*',
+                                 help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    scenario_parser.add_argument('--game', default=None, help='Game to play')
+    scenario_parser.add_argument('--games', type=int, default=20, help='Games per scenario')
+    scenario_parser.add_argument('--concurrency', type=int, default=4,
+                                 help='Games played at the same time')
+    scenario_parser.add_argument('--seed', type=int, default=0, help='Seed of moves and faults')
+    scenario_parser.add_argument('--timeout', type=float, default=DEFAULT_SCENARIO_TIMEOUT,
+                                 help='Seconds before a scenario is abandoned')
+    scenario_parser.add_argument('--min-survival', type=float, default=None,
+                                 help='Fail if a scenario without drops survives less often')
+    scenario_parser.add_argument('--json', metavar='PATH', help='Write the results as JSON')
+
+    args = parser.parse_args()
+
+    if args.command == 'proxy':
+        host, _, port = args.target.rpartition(':')
+        profile = FaultProfile(args.latency / 1000, args.jitter / 1000, args.bandwidth,
+                               args.fragment, args.drop_rate)
+        proxy = ChaosProxy(host or 'localhost', int(port), profile, args.host, args.port,
+                           args.seed)
+        proxy.start()
+        print(f"Forwarding {args.host}:{proxy.port} to {args.target} with {profile}")
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            proxy.stop()
+            print(proxy.stats())
+        return 0
+
+    unknown = [name for name in args.names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+    results = run_scenarios(args.names or list(SCENARIOS), game=args.game, games=args.games,
+                            concurrency=args.concurrency, seed=args.seed, timeout=args.timeout)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results,
+                       'profiles': {name: SCENARIOS[name].to_dict() for name in results}},
+                      f, indent=2, sort_keys=True)
+    if args.min_survival is not None:
+        failed = [name for name, result in results.items()
+                  if not SCENARIOS[name].drop_rate and result['survival'] < args.min_survival]
+        if failed:
+            print(f"Survival below {args.min_survival:.0%}: {', '.join(failed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,30 +2,92 @@
 Game client that works with the protocol-based server.
 Handles all protocol messages and provides a user interface.
 """
-import socket
 import sys
-from typing import Optional
-from protocol import Protocol, MessageType
+from typing import Optional, TYPE_CHECKING
+from protocol import MessageType
+from game_interface import GameInterface
+from messages import Message, ConnectMessage, DisconnectMessage, MoveMessage
+from dispatch import MessageDispatcher
+from prediction import MovePredictor, can_predict
+from state_delta import apply_changes
+from transport import Transport, TCPTransport, UnixTransport
+
+if TYPE_CHECKING:
+    import ssl
 
 
 class GameClient:
     """Client for connecting to and playing games on the server."""
     
-    def __init__(self, host: str = 'localhost', port: int = 8000):
+    def __init__(self, host: str = 'localhost', port: int = 8000,
+                 game_logic: Optional[GameInterface] = None, compression: bool = False,
+                 game: Optional[str] = None, predict: bool = False,
+                 unix_path: Optional[str] = None, transport: Optional[Transport] = None,
+                 tls: Optional['ssl.SSLContext'] = None, name: Optional[str] = None,
+                 deltas: bool = False, local_game: bool = False,
+                 resume_token: Optional[str] = None):
         """
         Initialize the game client.
         
         Args:
             host: Server host address
             port: Server port number
+            game_logic: Optional GameInterface used to render the board locally.
+                When given, the server is asked to omit 'board_display'.
+            compression: Ask the server for compressed frames
+            game: Registry key of the game to play, or None for the server's default
+            predict: Apply own moves locally before the server confirms them.
+                Requires game_logic of a turn-based game.
+            unix_path: Connect to a Unix-domain socket path instead of host and port
+            transport: Already connected transport to use, e.g. from
+                GameServer.connect_local; overrides host, port and unix_path
+            tls: Client SSLContext (see tls.client_context) to connect over TLS.
+                Reconnects with the same context resume the previous session.
+            name: Player name to be rated under, or None to play unrated
+            deltas: Ask for state messages as changes to the previous state,
+                which keeps them small on large boards
+            local_game: Without game_logic, load it from GameRegistry.default()
+                for the game the server confirms in CONNECTED, to render the
+                board locally and predict moves
+            resume_token: Token the server gave this name on an earlier
+                connection, to return to a game suspended when it dropped
         """
         self.host = host
         self.port = port
-        self.socket = None
+        self.game_logic = game_logic
+        self.compression = compression
+        self.game = game
+        self.unix_path = unix_path
+        self.transport = transport
+        self.tls = tls
+        self.name = name
+        self.deltas = deltas
+        self.resume_token = resume_token
         self.player_id = None
         self.game_name = None
         self.running = False
         self.game_state = None
+        # Last state received from the server, without predicted moves
+        self.server_state = None
+        self.awaiting_move = False
+        self.local_game = local_game and game_logic is None
+        self.predict = predict and (self.local_game or can_predict(game_logic))
+        self.predictor = MovePredictor(game_logic) if self.predict and game_logic else None
+        self.predicting = False
+        
+        self._dispatcher = MessageDispatcher(self._on_unknown_message)
+        for msg_type, handler in (
+            (MessageType.CONNECTED, self._on_connected),
+            (MessageType.GAME_START, self._on_game_start),
+            (MessageType.YOUR_TURN, self._on_your_turn),
+            (MessageType.GAME_STATE, self._on_game_state),
+            (MessageType.MOVE_ACCEPTED, self._on_move_accepted),
+            (MessageType.MOVE_REJECTED, self._on_move_rejected),
+            (MessageType.GAME_END, self._on_game_end),
+            (MessageType.ERROR, self._on_error),
+            (MessageType.SERVER_MESSAGE, self._on_server_message),
+        ):
+            self._dispatcher.register(msg_type, handler)
     
     def connect(self) -> bool:
         """
@@ -35,27 +97,51 @@ class GameClient:
             True if connection successful, False otherwise
         """
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
+            if self.transport is None:
+                if self.unix_path:
+                    self.transport = UnixTransport.connect(self.unix_path)
+                elif self.tls is not None:
+                    from tls import TLSTransport
+                    self.transport = TLSTransport.connect(self.host, self.port, self.tls)
+                else:
+                    self.transport = TCPTransport.connect(self.host, self.port)
             self.running = True
-            print(f"Connected to server at {self.host}:{self.port}")
+            self.transport.send(ConnectMessage(options=self._requested_options()))
+            print(f"Connected to server at {self.unix_path or f'{self.host}:{self.port}'}")
             return True
         except Exception as e:
             print(f"Error connecting to server: {e}")
             return False
     
+    def _requested_options(self) -> dict:
+        """Options to negotiate with the server in the CONNECT message."""
+        return {
+            'board_display': self.game_logic is None and not self.local_game,
+            'compression': 'zlib' if self.compression else None,
+            'game': self.game,
+            'predict': self.predict,
+            'deltas': self.deltas,
+            'name': self.name,
+            'resume_token': self.resume_token
+        }
+    
+    def _show_board(self, message: Message):
+        """Print the board, rendering it locally if the server omitted it."""
+        board_display = message.board_display
+        if not board_display and self.game_logic and self.game_state:
+            board_display = self.game_logic.format_state_for_display(self.game_state)
+        if board_display:
+            print(board_display)
+    
     def disconnect(self):
         """Disconnect from the server."""
         self.running = False
-        if self.socket:
-            try:
-                Protocol.send_message(self.socket, MessageType.DISCONNECT)
-            except:
-                pass
+        if self.transport:
             try:
-                self.socket.close()
+                self.transport.send(DisconnectMessage())
             except:
                 pass
+            self.transport.close()
     
     def run(self):
         """Run the client main loop."""
@@ -65,7 +151,7 @@ class GameClient:
         try:
             # Main message loop
             while self.running:
-                message = Protocol.receive_message(self.socket)
+                message = self.transport.receive()
                 if message is None:
                     print("Connection lost")
                     break
@@ -79,107 +165,160 @@ class GameClient:
         finally:
             self.disconnect()
     
-    def _handle_message(self, message: dict):
+    def register_handler(self, msg_type, handler):
+        """
+        Register a handler for a message type, replacing any existing one.
+        
+        Args:
+            msg_type: A MessageType or the type string of a custom message
+            handler: Callable receiving the parsed message
+        """
+        self._dispatcher.register(msg_type, handler)
+    
+    def _handle_message(self, message: Message):
         """Handle incoming protocol messages."""
-        msg_type = Protocol.get_message_type(message)
-        data = message.get('data', {})
-        error = message.get('error')
+        if message.error:
+            print(f"Error: {message.error}")
         
-        if error:
-            print(f"Error: {error}")
+        self._dispatcher.dispatch(message)
+    
+    def _on_connected(self, message: Message):
+        self.player_id = message.player_id
+        self.game_name = message.game_name
+        options = message.options or {}
+        if options.get('compression'):
+            self.transport.enable_compression()
+        if self.local_game and self.game_logic is None:
+            self._load_game_logic(options.get('game'))
+        self.predicting = self.predictor is not None and bool(options.get('predict'))
+        if options.get('resume_token'):
+            self.resume_token = options['resume_token']
+            print(f"Resume token: {self.resume_token} (reconnect with --name {self.name} "
+                  f"--resume-token {self.resume_token} if you drop out)")
+        print(f"Connected! You are player {self.player_id + 1}")
+        print(f"Game: {self.game_name}")
+        print(f"Waiting for players... ({message.current_players}/{message.max_players})")
+    
+    def _load_game_logic(self, key: Optional[str]):
+        """Load the logic of the game the server confirmed, for local rendering and prediction."""
+        from game_registry import GameRegistry
+        try:
+            self.game_logic = GameRegistry.default().get(key)
+        except (KeyError, ImportError) as e:
+            print(f"Cannot load game '{key}' locally ({e}); boards will not be shown")
+            self.predict = False
+            return
+        if self.predict and can_predict(self.game_logic):
+            self.predictor = MovePredictor(self.game_logic)
+        else:
+            self.predict = False
+    
+    def _on_game_start(self, message: Message):
+        self.player_id = message.player_id
+        self.game_name = message.game_name
+        self.game_state = self.server_state = message.initial_state
+        help_text = message.help
         
-        if msg_type == MessageType.CONNECTED:
-            self.player_id = data.get('player_id')
-            self.game_name = data.get('game_name')
-            current_players = data.get('current_players', 0)
-            max_players = data.get('max_players', 0)
-            print(f"Connected! You are player {self.player_id + 1}")
-            print(f"Game: {self.game_name}")
-            print(f"Waiting for players... ({current_players}/{max_players})")
+        print(f"\n{'='*50}")
+        print(f"Game Started: {self.game_name}")
+        print(f"You are Player {self.player_id + 1}")
+        print(f"{'='*50}")
+        if help_text:
+            print(f"\n{help_text}\n")
+    
+    def _receive_state(self, message: Message) -> Optional[dict]:
+        """Get the server state a state message carries, or None if it has none."""
+        if message.game_state is not None:
+            self.server_state = message.game_state
+        elif message.changes is not None:
+            self.server_state = apply_changes(self.server_state, message.changes)
+        else:
+            return None
+        return self.server_state
+    
+    def _set_server_state(self, game_state: dict):
+        """Adopt a state from the server, replaying still unconfirmed moves."""
+        if self.predicting and self.predictor.pending:
+            game_state = self.predictor.rebase(game_state)
+        self.game_state = game_state
+    
+    def _on_your_turn(self, message: Message):
+        self._set_server_state(self._receive_state(message))
+        self.awaiting_move = True
+        self._show_board(message)
+        print("\n>>> It's YOUR turn! <<<")
         
-        elif msg_type == MessageType.GAME_START:
-            self.player_id = data.get('player_id')
-            self.game_name = data.get('game_name')
-            self.game_state = data.get('initial_state')
-            help_text = data.get('help', '')
-            
-            print(f"\n{'='*50}")
-            print(f"Game Started: {self.game_name}")
-            print(f"You are Player {self.player_id + 1}")
-            print(f"{'='*50}")
-            if help_text:
-                print(f"\n{help_text}\n")
+        # Get move from user
+        self._get_and_send_move()
+    
+    def _on_game_state(self, message: Message):
+        self._set_server_state(self._receive_state(message))
+        current_player = message.current_player
+        self._show_board(message)
+        if current_player is not None:
+            print(f"\nWaiting for Player {current_player + 1} to move...")
+    
+    def _on_move_accepted(self, message: Message):
+        if self.predicting:
+            self.predictor.confirm(message.seq)
+        game_state = self._receive_state(message)
+        if game_state is None:
+            # The move was predicted and is already on the board
+            return
+        self.game_state = game_state
+        self.awaiting_move = False
+        self._show_board(message)
+        print("Move accepted!")
+    
+    def _on_move_rejected(self, message: Message):
+        error_msg = message.error or "Invalid move"
+        if self.predicting:
+            previous_state = self.predictor.reject(message.seq)
+            if previous_state is not None:
+                self.game_state = previous_state
+                self.awaiting_move = True
+                print(self.game_logic.format_state_for_display(previous_state))
+        print(f"Move rejected: {error_msg}")
+        print("Please try again.")
         
-        elif msg_type == MessageType.YOUR_TURN:
-            self.game_state = data.get('game_state')
-            board_display = data.get('board_display', '')
-            
-            if board_display:
-                print(board_display)
-            print("\n>>> It's YOUR turn! <<<")
-            
-            # Get move from user
+        # If it was our turn, ask for another move
+        if self.awaiting_move:
             self._get_and_send_move()
+    
+    def _on_game_end(self, message: Message):
+        if self.predictor is not None:
+            self.predictor.clear()
+        won = message.won
+        draw = message.draw
+        result_message = message.message
         
-        elif msg_type == MessageType.GAME_STATE:
-            self.game_state = data.get('game_state')
-            board_display = data.get('board_display', '')
-            current_player = data.get('current_player')
-            
-            if board_display:
-                print(board_display)
-            print(f"\nWaiting for Player {current_player + 1} to move...")
-        
-        elif msg_type == MessageType.MOVE_ACCEPTED:
-            self.game_state = data.get('game_state')
-            board_display = data.get('board_display', '')
-            
-            if board_display:
-                print(board_display)
-            print("Move accepted!")
+        print(f"\n{'='*50}")
+        print(f"GAME OVER")
+        print(f"{'='*50}")
+        print(result_message)
         
-        elif msg_type == MessageType.MOVE_REJECTED:
-            error_msg = error or "Invalid move"
-            print(f"Move rejected: {error_msg}")
-            print("Please try again.")
-            
-            # If it was our turn, ask for another move
-            if self.game_state and self.game_state.get('current_player') == self.player_id:
-                self._get_and_send_move()
+        if draw:
+            print("It's a tie!")
+        elif won:
+            print("🎉 Congratulations! You won! 🎉")
+        else:
+            print("Better luck next time!")
+        print(f"{'='*50}\n")
         
-        elif msg_type == MessageType.GAME_END:
-            won = data.get('won', False)
-            draw = data.get('draw', False)
-            message = data.get('message', 'Game over')
-            
-            print(f"\n{'='*50}")
-            print(f"GAME OVER")
-            print(f"{'='*50}")
-            print(message)
-            
-            if draw:
-                print("It's a tie!")
-            elif won:
-                print("🎉 Congratulations! You won! 🎉")
-            else:
-                print("Better luck next time!")
-            print(f"{'='*50}\n")
-            
+        self.running = False
+    
+    def _on_error(self, message: Message):
+        error_msg = message.error or "Unknown error occurred"
+        print(f"Error: {error_msg}")
+        if "disconnected" in error_msg.lower() or "ended" in error_msg.lower():
             self.running = False
-        
-        elif msg_type == MessageType.ERROR:
-            error_msg = error or "Unknown error occurred"
-            print(f"Error: {error_msg}")
-            if "disconnected" in error_msg.lower() or "ended" in error_msg.lower():
-                self.running = False
-        
-        elif msg_type == MessageType.SERVER_MESSAGE:
-            server_msg = data.get('message', '')
-            if server_msg:
-                print(f"[SERVER] {server_msg}")
-        
-        else:
-            print(f"Unknown message type: {msg_type}")
+    
+    def _on_server_message(self, message: Message):
+        if message.message:
+            print(f"[SERVER] {message.message}")
+    
+    def _on_unknown_message(self, message: Message):
+        print(f"Unknown message type: {message.type}")
     
     def _get_and_send_move(self):
         """Get a move from the user and send it to the server."""
@@ -195,10 +334,21 @@ class GameClient:
                 if not move:
                     continue
                 
-                # Send move to server
-                Protocol.send_message(self.socket, MessageType.MOVE, {
-                    'move': move
-                })
+                if not self.predicting:
+                    self.transport.send(MoveMessage(move=move))
+                    break
+                
+                # Show the move right away; the server confirms or rejects it by seq
+                seq, predicted_state, error_msg = self.predictor.predict(
+                    self.game_state, self.player_id, move)
+                if predicted_state is None:
+                    print(f"Move rejected: {error_msg}")
+                    continue
+                self.transport.send(MoveMessage(move=move, seq=seq))
+                self.game_state = predicted_state
+                self.awaiting_move = False
+                print(self.game_logic.format_state_for_display(predicted_state))
+                print("Move played!")
                 break
                 
             except (EOFError, KeyboardInterrupt):
@@ -218,10 +368,46 @@ def main():
     parser = argparse.ArgumentParser(description='Connect to game server')
     parser.add_argument('--host', default='localhost', help='Server host address')
     parser.add_argument('--port', type=int, default=8000, help='Server port number')
+    parser.add_argument('--unix', metavar='PATH', default=None,
+                        help='Connect to a Unix-domain socket instead of TCP')
+    parser.add_argument('--tls', action='store_true', help='Connect over TLS')
+    parser.add_argument('--tls-ca', default=None,
+                        help='PEM file of CAs to trust, e.g. a self-signed server certificate')
+    parser.add_argument('--tls-insecure', action='store_true',
+                        help='Do not verify the server certificate')
+    parser.add_argument('--tls-ciphers', default=None, help='OpenSSL cipher string for TLS 1.2')
+    parser.add_argument('--compress', action='store_true',
+                        help='Ask the server to compress large frames')
+    parser.add_argument('--game', default=None, help='Game to play (server default if omitted)')
+    parser.add_argument('--local-render', action='store_true',
+                        help='Render the board locally instead of receiving it from the server')
+    parser.add_argument('--predict', action='store_true',
+                        help='Show own moves immediately instead of waiting for the server')
+    parser.add_argument('--name', default=None, help='Player name to be rated under')
+    parser.add_argument('--resume-token', default=None,
+                        help='Token printed when you connected under --name, to return to '
+                             'a game suspended after you dropped')
+    parser.add_argument('--deltas', action='store_true',
+                        help='Receive state changes instead of the whole state after each move')
     
     args = parser.parse_args()
     
-    client = GameClient(host=args.host, port=args.port)
+    # Without --game the server picks the game, so its logic is loaded once CONNECTED names it
+    game_logic = None
+    if (args.local_render or args.predict) and args.game:
+        from game_registry import GameRegistry
+        game_logic = GameRegistry.default().get(args.game)
+    
+    tls = None
+    if args.tls:
+        from tls import client_context
+        tls = client_context(args.tls_ca, verify=not args.tls_insecure, ciphers=args.tls_ciphers)
+    
+    client = GameClient(host=args.host, port=args.port, game_logic=game_logic,
+                        compression=args.compress, game=args.game, predict=args.predict,
+                        unix_path=args.unix, tls=tls, name=args.name, deltas=args.deltas,
+                        resume_token=args.resume_token,
+                        local_game=args.local_render or args.predict)
     client.run()
 
 
@@ -0,0 +1,59 @@
+"""
+Message dispatch for protocol messages.
+Routes parsed messages to registered handlers by their type code.
+"""
+from typing import Dict, Any, Callable, Optional, Union
+from protocol import MessageType, type_code
+from messages import Message
+
+
+Handler = Callable[[Message], Any]
+
+
+class MessageDispatcher:
+    """Table of message handlers keyed by wire type code."""
+
+    def __init__(self, default_handler: Optional[Handler] = None):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            default_handler: Handler for messages with no registered type
+        """
+        self._handlers: Dict[str, Handler] = {}
+        self.default_handler = default_handler
+
+    def register(self, msg_type: Union[MessageType, str], handler: Handler):
+        """
+        Register a handler for a message type.
+
+        Args:
+            msg_type: A MessageType or the type string of a custom message
+            handler: Callable receiving the parsed message
+        """
+        self._handlers[type_code(msg_type)] = handler
+
+    def unregister(self, msg_type: Union[MessageType, str]):
+        """Remove the handler for a message type, if any."""
+        self._handlers.pop(type_code(msg_type), None)
+
+    def has_handler(self, msg_type: Union[MessageType, str]) -> bool:
+        """Check whether a handler is registered for a message type."""
+        return type_code(msg_type) in self._handlers
+
+    def dispatch(self, message: Message) -> Any:
+        """
+        Call the handler registered for a message's type.
+
+        Args:
+            message: Parsed message
+
+        Returns:
+            Whatever the handler returns, or None if nothing handled it
+        """
+        handler = self._handlers.get(message.type)
+        if handler is None:
+            handler = self.default_handler
+            if handler is None:
+                return None
+        return handler(message)
@@ -0,0 +1,217 @@
+"""
+Event bus for session lifecycle events.
+Sessions publish events without waiting on anyone: every subscriber has a
+bounded ring buffer that is drained in batches by its own thread, and a
+subscriber that falls behind loses its oldest events instead of slowing
+the game down.
+"""
+import collections
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Event types published by game sessions
+GAME_STARTED = 'game_started'
+MOVE_PLAYED = 'move_played'
+ROUND_PLAYED = 'round_played'
+GAME_ENDED = 'game_ended'
+PLAYER_DISCONNECTED = 'player_disconnected'
+SESSION_STOPPED = 'session_stopped'
+SESSION_SUSPENDED = 'session_suspended'
+SESSION_RESUMED = 'session_resumed'
+SESSION_EXPIRED = 'session_expired'
+
+# Events a subscriber can fall behind by before the oldest are dropped
+DEFAULT_CAPACITY = 10000
+
+# Most events handed to a subscriber at once
+DEFAULT_BATCH_SIZE = 256
+
+# Longest an event waits in a buffer that has not filled a batch
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+
+class Event:
+    """Something that happened in a session."""
+
+    __slots__ = ('seq', 'type', 'time', 'session_id', 'data')
+
+    def __init__(self, seq: int, type: str, session_id: Optional[int], data: Dict[str, Any]):
+        self.seq = seq
+        self.type = type
+        self.time = time.time()
+        self.session_id = session_id
+        self.data = data
+
+    def to_dict(self) -> Dict[str, Any]:
+        event = {'seq': self.seq, 'type': self.type, 'time': self.time,
+                 'session': self.session_id}
+        event.update(self.data)
+        return event
+
+    def __repr__(self) -> str:
+        return f"Event({self.to_dict()!r})"
+
+
+class Subscription:
+    """A subscriber's buffer and the thread delivering it."""
+
+    def __init__(self, name: str, handler: Callable[[List[Event]], Any], capacity: int,
+                 batch_size: int, flush_interval: float, first_seq: int):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer: collections.deque = collections.deque(maxlen=capacity)
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.closed = False
+        self._last_seq = first_seq - 1
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._deliver_loop, name=f"events-{name}",
+                                        daemon=True)
+        self._thread.start()
+
+    def _offer(self, event: Event):
+        self.buffer.append(event)
+        if len(self.buffer) >= self.batch_size and not self._ready.is_set():
+            self._ready.set()
+
+    def _deliver_loop(self):
+        while True:
+            self._ready.wait(self.flush_interval)
+            self._ready.clear()
+            self._deliver()
+            if self.closed:
+                close = getattr(self.handler, 'close', None)
+                if close is not None:
+                    close()
+                return
+
+    def _deliver(self):
+        """Hand everything buffered to the handler, one batch at a time."""
+        buffer = self.buffer
+        while buffer:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(buffer.popleft())
+            except IndexError:
+                pass
+            # A full ring buffer overwrote the events between the gaps
+            self.dropped += batch[0].seq - self._last_seq - 1
+            self._last_seq = batch[-1].seq
+            try:
+                self.handler(batch)
+                self.delivered += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Error in event subscriber {self.name}: {e}")
+
+    def close(self):
+        """Deliver what is buffered, then stop the delivery thread."""
+        self.closed = True
+        self._ready.set()
+        self._thread.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': len(self.buffer),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+
+class EventBus:
+    """Fans published events out to subscribers without blocking the publisher."""
+
+    def __init__(self):
+        self.published = 0
+        self.subscriptions: Tuple[Subscription, ...] = ()
+        # Keeps sequence numbers in buffer order; held only to append
+        self._lock = threading.Lock()
+
+    def subscribe(self, name: str, handler: Callable[[List[Event]], Any],
+                  capacity: int = DEFAULT_CAPACITY, batch_size: int = DEFAULT_BATCH_SIZE,
+                  flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> Subscription:
+        """
+        Deliver events published from now on to a handler.
+
+        Args:
+            name: Subscriber name used in stats and errors
+            handler: Called from the subscription's thread with lists of events;
+                its close() method, if any, is called when the bus closes
+            capacity: Events buffered before the oldest are dropped
+            batch_size: Most events per handler call
+            flush_interval: Longest an event waits for its batch to fill
+
+        Returns:
+            The subscription, for unsubscribe()
+        """
+        with self._lock:
+            subscription = Subscription(name, handler, capacity, batch_size, flush_interval,
+                                        self.published + 1)
+            self.subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop delivering events to a subscriber, after delivering what it has buffered."""
+        with self._lock:
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not subscription)
+        subscription.close()
+
+    def publish(self, event_type: str, session_id: Optional[int] = None, **data):
+        """
+        Publish an event; never waits for subscribers.
+
+        Args:
+            event_type: One of the event type constants, or a custom type
+            session_id: Session the event belongs to
+            **data: JSON-serializable event fields
+        """
+        if not self.subscriptions:
+            return
+        with self._lock:
+            self.published += 1
+            event = Event(self.published, event_type, session_id, data)
+            for subscription in self.subscriptions:
+                subscription._offer(event)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get publish and per-subscriber delivery counters."""
+        return {
+            'published': self.published,
+            'subscribers': {s.name: s.stats() for s in self.subscriptions},
+        }
+
+    def close(self):
+        """Deliver buffered events and stop every subscriber."""
+        with self._lock:
+            subscriptions, self.subscriptions = self.subscriptions, ()
+        for subscription in subscriptions:
+            subscription.close()
+
+
+class NDJSONSink:
+    """Event handler appending events to a newline-delimited JSON file."""
+
+    def __init__(self, path: str):
+        """
+        Open the file for appending.
+
+        Args:
+            path: File to append to
+        """
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, batch: List[Event]):
+        self.file.write(''.join(json.dumps(event.to_dict()) + '\n' for event in batch))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
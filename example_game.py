@@ -2,8 +2,8 @@
 Example of how to create a new game logic implementation.
 This shows a simple Rock-Paper-Scissors game as an example.
 """
-from game_interface import GameInterface
-from typing import Dict, Any, Optional, Tuple
+from game_interface import GameInterface, TURN_SIMULTANEOUS
+from typing import Dict, Any, Optional, Tuple, List, Callable
 import random
 
 
@@ -12,6 +12,9 @@ class RockPaperScissorsGame(GameInterface):
     
     CHOICES = ['rock', 'paper', 'scissors']
     
+    # Seconds both players have to choose; a player who misses it loses the round
+    MOVE_DEADLINE = 60.0
+    
     def get_game_name(self) -> str:
         return 'Rock-Paper-Scissors'
     
@@ -31,14 +34,23 @@ class RockPaperScissorsGame(GameInterface):
             'player2_choice': None,
             'player1_score': 0,
             'player2_score': 0,
-            'current_player': 0,
             'players': num_players
         }
     
+    def get_turn_mode(self) -> str:
+        # Both players choose at once instead of alternating
+        return TURN_SIMULTANEOUS
+    
+    def get_players_to_move(self, game_state: Dict[str, Any]) -> List[int]:
+        return [0, 1]
+    
+    def get_move_deadline(self) -> Optional[float]:
+        return self.MOVE_DEADLINE
+    
     def validate_move(self, game_state: Dict[str, Any], player_id: int, 
                      move: Any) -> Tuple[bool, Optional[str]]:
-        if game_state['current_player'] != player_id:
-            return False, "It's not your turn"
+        if player_id not in (0, 1):
+            return False, "Unknown player"
         
         move_lower = str(move).lower().strip()
         if move_lower not in self.CHOICES:
@@ -64,25 +76,43 @@ class RockPaperScissorsGame(GameInterface):
         
         # If both players have chosen, determine winner and advance
         if (new_state['player1_choice'] and new_state['player2_choice']):
-            winner = self._determine_winner(
-                new_state['player1_choice'],
-                new_state['player2_choice']
-            )
-            if winner == 0:
-                new_state['player1_score'] += 1
-            elif winner == 1:
-                new_state['player2_score'] += 1
-            
-            # Reset for next round
-            new_state['round'] += 1
-            new_state['player1_choice'] = None
-            new_state['player2_choice'] = None
-        
-        # Switch player
-        new_state['current_player'] = (player_id + 1) % 2
+            self._finish_round(new_state)
         
         return new_state
     
+    def apply_moves(self, game_state: Dict[str, Any], 
+                    moves: Dict[int, Any]) -> Dict[str, Any]:
+        new_state = game_state.copy()
+        if 0 in moves:
+            new_state['player1_choice'] = str(moves[0]).lower().strip()
+        if 1 in moves:
+            new_state['player2_choice'] = str(moves[1]).lower().strip()
+        self._finish_round(new_state)
+        return new_state
+    
+    def _finish_round(self, state: Dict[str, Any]):
+        """Score the round in place; a player who did not choose loses it."""
+        choice1 = state['player1_choice']
+        choice2 = state['player2_choice']
+        if choice1 and choice2:
+            winner = self._determine_winner(choice1, choice2)
+        elif choice1:
+            winner = 0
+        elif choice2:
+            winner = 1
+        else:
+            winner = None
+        
+        if winner == 0:
+            state['player1_score'] += 1
+        elif winner == 1:
+            state['player2_score'] += 1
+        
+        # Reset for next round
+        state['round'] += 1
+        state['player1_choice'] = None
+        state['player2_choice'] = None
+    
     def _determine_winner(self, choice1: str, choice2: str) -> Optional[int]:
         """Determine winner: 0 = player1, 1 = player2, None = tie"""
         if choice1 == choice2:
@@ -127,23 +157,37 @@ class RockPaperScissorsGame(GameInterface):
                 }
         return None
     
+    def get_legal_moves(self, game_state: Dict[str, Any], 
+                        player_id: int) -> Optional[List[Any]]:
+        is_valid, _ = self.validate_move(game_state, player_id, self.CHOICES[0])
+        return list(self.CHOICES) if is_valid else []
+    
     def get_current_player(self, game_state: Dict[str, Any]) -> int:
-        return game_state['current_player']
+        # Only used when driving the game one move at a time
+        return 0 if game_state.get('player1_choice') is None else 1
     
     def get_game_state_for_player(self, game_state: Dict[str, Any], 
                                   player_id: int) -> Dict[str, Any]:
-        # Hide opponent's choice until both have chosen
         player_state = game_state.copy()
-        if player_id == 0:
-            if game_state.get('player2_choice') and not game_state.get('player1_choice'):
-                # Opponent has chosen but we haven't - hide their choice
-                player_state['player2_choice'] = '?'
-        else:
-            if game_state.get('player1_choice') and not game_state.get('player2_choice'):
-                # Opponent has chosen but we haven't - hide their choice
-                player_state['player1_choice'] = '?'
+        player_state['player1_choice'] = self._visible_choice(game_state, player_id, 0)
+        player_state['player2_choice'] = self._visible_choice(game_state, player_id, 1)
         return player_state
     
+    def get_private_fields(self) -> Dict[str, Callable[[Dict[str, Any], int], Any]]:
+        return {
+            'player1_choice': lambda game_state, player_id: self._visible_choice(game_state, player_id, 0),
+            'player2_choice': lambda game_state, player_id: self._visible_choice(game_state, player_id, 1),
+        }
+    
+    def _visible_choice(self, game_state: Dict[str, Any], player_id: int, owner: int) -> Optional[str]:
+        """Get the owner's choice as seen by player_id."""
+        choice = game_state.get('player1_choice' if owner == 0 else 'player2_choice')
+        other_choice = game_state.get('player2_choice' if owner == 0 else 'player1_choice')
+        if owner != player_id and choice and not other_choice:
+            # Opponent has chosen but we haven't - hide their choice
+            return '?'
+        return choice
+    
     def format_state_for_display(self, game_state: Dict[str, Any]) -> str:
         lines = [
             f"\nRound {game_state['round']}/3",
@@ -166,8 +210,6 @@ class RockPaperScissorsGame(GameInterface):
         return "Enter one of: rock, paper, or scissors"
 
 
-# To use this game, modify server.py:
-# from example_game import RockPaperScissorsGame
-# game = RockPaperScissorsGame()
-# server = GameServer(host='localhost', port=8000, game_logic=game)
+# This game is registered with the server as 'rockpaperscissors'.
+# Clients select it with: python client.py --game rockpaperscissors
 
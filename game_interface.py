@@ -1,9 +1,33 @@
 """
 Abstract interface for game logic implementations.
 Any game logic module should implement these methods.
+Game states are sent to clients as JSON, so they may only hold JSON
+values, and every dictionary in them must have str keys: an int key would
+arrive as a string over a socket but stay an int in process.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from messages import Message
+
+
+# Turn modes a game can declare with get_turn_mode
+TURN_SEQUENTIAL = 'sequential'      # One player moves at a time
+TURN_SIMULTANEOUS = 'simultaneous'  # Players move at once; the round ends when all have moved
+TURN_REALTIME = 'realtime'          # Moves are collected for a fixed tick, then applied
+
+
+class _Absent:
+    """Type of ABSENT."""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return 'ABSENT'
+
+
+# Previous value recorded by apply_move_reversibly for a key the move added
+ABSENT = _Absent()
 
 
 class GameInterface(ABC):
@@ -33,7 +57,8 @@ class GameInterface(ABC):
             num_players: Number of players in the game
             
         Returns:
-            Dictionary with initial game state
+            Dictionary with initial game state; JSON values only, with str
+            keys in every dictionary
         """
         pass
     
@@ -137,4 +162,164 @@ class GameInterface(ABC):
             Help string
         """
         pass
-
+    
+    def get_turn_mode(self) -> str:
+        """
+        Get how players take turns.
+        
+        Returns:
+            TURN_SEQUENTIAL (default), TURN_SIMULTANEOUS or TURN_REALTIME
+        """
+        return TURN_SEQUENTIAL
+    
+    def get_players_to_move(self, game_state: Dict[str, Any]) -> List[int]:
+        """
+        Get the players expected to move in the current simultaneous round.
+        
+        Args:
+            game_state: Current game state
+            
+        Returns:
+            List of player IDs; defaults to the current player only
+        """
+        return [self.get_current_player(game_state)]
+    
+    def get_move_deadline(self) -> Optional[float]:
+        """
+        Get the seconds players have to move in a simultaneous round.
+        
+        Returns:
+            Deadline in seconds, or None to wait for every player
+        """
+        return None
+    
+    def get_tick_interval(self) -> float:
+        """
+        Get the length of one tick of a real-time game.
+        
+        Returns:
+            Tick length in seconds
+        """
+        return 0.1
+    
+    def apply_moves(self, game_state: Dict[str, Any], 
+                    moves: Dict[int, Any]) -> Dict[str, Any]:
+        """
+        Apply a round of moves made at the same time.
+        Players missing from moves did not move before the deadline.
+        The default applies the moves one by one in player order.
+        
+        Args:
+            game_state: Game state at the start of the round
+            moves: Dictionary mapping player ID to the move it made
+            
+        Returns:
+            Updated game state dictionary
+        """
+        for player_id in sorted(moves):
+            game_state = self.apply_move(game_state, player_id, moves[player_id])
+        return game_state
+    
+    def get_legal_moves(self, game_state: Dict[str, Any], 
+                        player_id: int) -> Optional[List[Any]]:
+        """
+        Get the moves a player could legally make.
+        Override this so bots and tools can enumerate moves.
+        
+        Args:
+            game_state: Current game state
+            player_id: ID of the player to list moves for
+            
+        Returns:
+            List of valid moves, or None if the game does not support listing them
+        """
+        return None
+    
+    def get_private_fields(self) -> Optional[Dict[str, Callable[[Dict[str, Any], int], Any]]]:
+        """
+        Declare the state fields that differ between players.
+        Every field not listed is shared by all players, so the framework
+        builds it once per state and only computes the listed fields per
+        player. The result must agree with get_game_state_for_player.
+        
+        Returns:
+            Dictionary mapping a private field to a function called with
+            (game_state, player_id) that returns the value the player sees,
+            or None to build each view with get_game_state_for_player
+        """
+        return None
+    
+    def get_interested_players(self, game_state: Dict[str, Any],
+                               player_id: int) -> Optional[List[int]]:
+        """
+        Get the players a move matters to.
+        Override this in games with many players where most moves only
+        concern a few of them. Players left out are not sent the state
+        after the move; they catch up when it is their turn, when the game
+        ends or with a later move that concerns them.
+        
+        Args:
+            game_state: Game state after the move
+            player_id: ID of the player who moved
+            
+        Returns:
+            Player IDs to update, or None for every player (the default)
+        """
+        return None
+    
+    def get_message_handlers(self) -> Dict[str, Callable[[Dict[str, Any], int, 'Message'],
+                                                          Optional[Dict[str, Any]]]]:
+        """
+        Get handlers for game-specific message types.
+        Override this to accept custom messages from the player whose turn it is.
+        
+        Returns:
+            Dictionary mapping a custom type string to a handler called with
+            (game_state, player_id, message), where message is the received
+            Message object, a GenericMessage for custom types; read its
+            payload from message.data. A handler returns reply data, sent
+            back to the player with the same type, or None for no reply.
+        """
+        return {}
+    
+    def apply_move_reversibly(self, game_state: Dict[str, Any], player_id: int,
+                              move: Any) -> Optional[List[Tuple[Tuple[Any, ...], Any]]]:
+        """
+        Apply a move by changing the state in place, recording how to undo it.
+        Override this so move history and search can take moves back without
+        keeping a copy of every state. The result must agree with apply_move,
+        and a game that overrides this must support every move.
+        
+        Args:
+            game_state: Current game state, changed in place
+            player_id: ID of the player making the move (0-indexed)
+            move: The move to apply
+            
+        Returns:
+            List of (path, previous value) changes in the order they were
+            made, where path is the tuple of keys and indexes leading to the
+            changed value and previous value is ABSENT for added keys, or
+            None if the game does not support in-place moves (the default)
+        """
+        return None
+    
+    def get_unhashed_fields(self) -> Iterable[str]:
+        """
+        Declare the state fields that do not identify a position, such as
+        move counters or clocks, so position hashes and repetition
+        detection ignore them.
+        
+        Returns:
+            Top-level state field names; empty by default
+        """
+        return ()
+    
+    def get_repetition_limit(self) -> Optional[int]:
+        """
+        Get how many times a position may occur before the game is drawn.
+        
+        Returns:
+            Number of occurrences that draws the game, or None if repetition
+            does not end the game (the default)
+        """
+        return None
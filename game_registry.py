@@ -0,0 +1,261 @@
+"""
+Registry of available GameInterface implementations.
+Games are registered by 'module:Class' spec and only imported the first
+time a player asks for them, so startup cost does not grow with the
+number of installed games.
+"""
+import importlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import Dict, Any, Optional, List, Union, Callable
+from game_interface import GameInterface
+
+
+# Entry point group third-party packages register games under
+ENTRY_POINT_GROUP = 'sockconnect.games'
+
+# Games shipped with the server
+BUILTIN_GAMES = {
+    'tictactoe': 'tictactoe:TicTacToeGame',
+    'rockpaperscissors': 'example_game:RockPaperScissorsGame',
+    'gomoku': 'mnk_game:GomokuGame',
+    'gomokuparty': 'mnk_game:GomokuPartyGame',
+}
+
+DEFAULT_GAME = 'tictactoe'
+
+# Environment variable naming a file to cache entry point scans in, so
+# startup can skip importlib.metadata; unset, every startup scans
+ENTRY_POINT_CACHE_ENV = 'SOCKCONNECT_ENTRY_POINT_CACHE'
+
+
+def game_key(game_name: str) -> str:
+    """
+    Convert a display name to a registry key, e.g. 'Tic-Tac-Toe' -> 'tictactoe'.
+
+    Args:
+        game_name: Name returned by get_game_name
+
+    Returns:
+        Lowercase alphanumeric key
+    """
+    return re.sub(r'[^a-z0-9]', '', game_name.lower())
+
+
+def _path_fingerprint() -> List[Any]:
+    """Identify the interpreter and the state of the directories packages are found in."""
+    fingerprint: List[Any] = [sys.version]
+    for path in sys.path:
+        try:
+            fingerprint.append([path, os.stat(path or '.').st_mtime_ns])
+        except OSError:
+            fingerprint.append([path, None])
+    return fingerprint
+
+
+def _valid_entry_points(found: Any) -> bool:
+    """Whether a cached scan result is a list of [name, 'module:Class'] pairs."""
+    return isinstance(found, list) and all(
+        isinstance(pair, list) and len(pair) == 2 and all(isinstance(part, str) for part in pair)
+        for pair in found)
+
+
+def _entry_points(group: str, cache_path: Optional[str]) -> List[List[str]]:
+    """
+    Get the (name, value) pairs of an entry point group, from the cache if it is current.
+
+    Args:
+        group: Entry point group to scan
+        cache_path: Cache file, or None to always scan
+
+    Returns:
+        List of [name, 'module:Class'] pairs
+    """
+    fingerprint = _path_fingerprint()
+    cache: Dict[str, Any] = {}
+    if cache_path:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        if not isinstance(cache, dict) or cache.get('fingerprint') != fingerprint:
+            cache = {}
+        cached = cache.get('groups', {}).get(group)
+        if _valid_entry_points(cached):
+            return cached
+
+    from importlib.metadata import entry_points
+    found = [[entry_point.name, entry_point.value] for entry_point in entry_points(group=group)]
+    if cache_path:
+        cache = {'fingerprint': fingerprint, 'groups': {**cache.get('groups', {}), group: found}}
+        directory = os.path.dirname(os.path.abspath(cache_path))
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Written to a fresh file and renamed, so readers never see it half-written
+            fd, tmp_path = tempfile.mkstemp(prefix='.entrypoints.', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # Without a writable cache every startup scans
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    return found
+
+
+class GameRegistry:
+    """Maps game keys to lazily loaded GameInterface instances."""
+
+    def __init__(self):
+        self._specs: Dict[str, Union[str, Callable[[], GameInterface]]] = {}
+        self._games: Dict[str, GameInterface] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, spec: Union[str, Callable[[], GameInterface]]):
+        """
+        Register a game without loading it.
+
+        Args:
+            key: Registry key clients use to ask for the game
+            spec: 'module:Class' string, or a callable returning a GameInterface
+        """
+        with self._lock:
+            self._specs[key] = spec
+            self._games.pop(key, None)
+
+    def register_instance(self, game_logic: GameInterface, key: Optional[str] = None) -> str:
+        """
+        Register an already constructed game.
+
+        Args:
+            game_logic: GameInterface instance
+            key: Registry key; derived from the game name if omitted
+
+        Returns:
+            The key the game was registered under
+        """
+        key = key or game_key(game_logic.get_game_name())
+        with self._lock:
+            self._specs[key] = type(game_logic)
+            self._games[key] = game_logic
+        return key
+
+    def register_builtin_games(self):
+        """Register the games shipped with the server."""
+        for key, spec in BUILTIN_GAMES.items():
+            self.register(key, spec)
+
+    def discover_entry_points(self, group: str = ENTRY_POINT_GROUP,
+                              cache_path: Optional[str] = None):
+        """
+        Register games advertised by installed packages.
+
+        Entry point names become registry keys; nothing is imported. Scanning
+        installed distributions is the slowest part of startup, so the result
+        can be cached and reused until a directory on sys.path changes, which
+        installing or removing a package does.
+
+        Args:
+            group: Entry point group to scan
+            cache_path: File to cache the scan result in, or None to always
+                scan; only point it at a directory no other user can write to
+        """
+        for name, value in _entry_points(group, cache_path):
+            self.register(name, value)
+
+    def load_config(self, path: str):
+        """
+        Register games listed in a JSON config file.
+
+        The file holds {"games": {"<key>": "<module>:<Class>", ...}}.
+
+        Args:
+            path: Path to the config file
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        for key, spec in config.get('games', {}).items():
+            self.register(key, spec)
+
+    def keys(self) -> List[str]:
+        """Get the keys of all registered games."""
+        return sorted(self._specs)
+
+    def is_loaded(self, key: str) -> bool:
+        """Check whether a game has been imported and constructed."""
+        return key in self._games
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._specs
+
+    def get(self, key: str) -> GameInterface:
+        """
+        Get a game, importing and constructing it on first use.
+
+        Args:
+            key: Registry key of the game
+
+        Returns:
+            Shared GameInterface instance for the game
+
+        Raises:
+            KeyError: If no game is registered under key
+            ImportError: If the game's module or class cannot be loaded
+        """
+        game = self._games.get(key)
+        if game is not None:
+            return game
+
+        with self._lock:
+            game = self._games.get(key)
+            if game is None:
+                game = self._load(self._specs[key])
+                self._games[key] = game
+        return game
+
+    @staticmethod
+    def _load(spec: Union[str, Callable[[], GameInterface]]) -> GameInterface:
+        """Construct a game from its spec."""
+        if isinstance(spec, str):
+            module_name, _, attr = spec.partition(':')
+            try:
+                factory = getattr(importlib.import_module(module_name), attr)
+            except AttributeError:
+                raise ImportError(f"{module_name} has no attribute {attr}")
+        else:
+            factory = spec
+        game = factory()
+        if not isinstance(game, GameInterface):
+            raise ImportError(f"{spec} did not produce a GameInterface")
+        return game
+
+    @classmethod
+    def default(cls, config_path: Optional[str] = None) -> 'GameRegistry':
+        """
+        Build a registry with the built-in games, installed entry points and
+        an optional config file, in increasing order of precedence.
+
+        Entry point scans are cached in the file named by ENTRY_POINT_CACHE_ENV
+        if it is set.
+
+        Args:
+            config_path: Optional path to a JSON games config file
+
+        Returns:
+            New GameRegistry
+        """
+        registry = cls()
+        registry.register_builtin_games()
+        registry.discover_entry_points(cache_path=os.environ.get(ENTRY_POINT_CACHE_ENV) or None)
+        if config_path:
+            registry.load_config(config_path)
+        return registry
@@ -0,0 +1,340 @@
+"""
+Move history with position hashing, undo and repetition detection.
+A GameHistory applies moves while keeping a Zobrist-style hash of the
+position up to date, so positions can be told apart and counted in O(1)
+and moves taken back without comparing or copying whole states.
+"""
+import copy
+import hashlib
+from typing import Dict, Any, Optional, List, Tuple
+from game_interface import GameInterface, ABSENT
+
+
+# Key of the hash used to derive Zobrist keys; changing it changes every position hash
+ZOBRIST_SEED = b'sockconnect-zobrist-v1'
+
+# Number of derived keys kept before the table is cleared
+ZOBRIST_TABLE_LIMIT = 1 << 16
+
+# Derived keys by (path, type, value)
+_zobrist_table: Dict[Tuple[Any, ...], int] = {}
+
+
+def zobrist_key(path: Tuple[Any, ...], value: Any) -> int:
+    """
+    Get the 64-bit key of a value at a path in the game state.
+
+    Keys are derived from the path and value rather than drawn at random,
+    so hashes are the same in every process and can be stored in replays
+    or compared between bots.
+
+    Args:
+        path: Keys and indexes leading to the value
+        value: Scalar value
+
+    Returns:
+        Key in [0, 2**64)
+    """
+    entry = (path, type(value), value)
+    try:
+        return _zobrist_table[entry]
+    except KeyError:
+        pass
+    except TypeError:
+        # Unhashable leaf, such as a set; keyed by its repr
+        entry = (path, type(value), repr(value))
+        if entry in _zobrist_table:
+            return _zobrist_table[entry]
+    digest = hashlib.blake2b(repr(entry).encode('utf-8'), digest_size=8,
+                             key=ZOBRIST_SEED).digest()
+    if len(_zobrist_table) >= ZOBRIST_TABLE_LIMIT:
+        _zobrist_table.clear()
+    key = _zobrist_table[entry] = int.from_bytes(digest, 'little')
+    return key
+
+
+def value_hash(path: Tuple[Any, ...], value: Any) -> int:
+    """
+    Hash a value and everything nested in it.
+
+    The hash is the XOR of the keys of every scalar inside the value, so
+    changing one scalar changes the hash by two XORs. ABSENT hashes to 0.
+
+    Args:
+        path: Keys and indexes leading to the value
+        value: Value to hash
+
+    Returns:
+        64-bit hash
+    """
+    if isinstance(value, dict):
+        result = 0
+        for key, item in value.items():
+            result ^= value_hash(path + (key,), item)
+        return result
+    if isinstance(value, (list, tuple)):
+        result = 0
+        for index, item in enumerate(value):
+            result ^= value_hash(path + (index,), item)
+        return result
+    if value is ABSENT:
+        return 0
+    return zobrist_key(path, value)
+
+
+def position_hash(game_logic: GameInterface, game_state: Dict[str, Any]) -> int:
+    """
+    Hash a position, ignoring the fields the game declares unhashed.
+
+    Args:
+        game_logic: GameInterface implementation of the game
+        game_state: Game state to hash
+
+    Returns:
+        64-bit position hash
+    """
+    unhashed = set(game_logic.get_unhashed_fields())
+    result = 0
+    for key, value in game_state.items():
+        if key not in unhashed:
+            result ^= value_hash((key,), value)
+    return result
+
+
+def _get_path(game_state: Dict[str, Any], path: Tuple[Any, ...]) -> Any:
+    """Get the value at a path, or ABSENT if a dict along it lacks the key."""
+    value = game_state
+    for key in path:
+        if isinstance(value, dict) and key not in value:
+            return ABSENT
+        value = value[key]
+    return value
+
+
+def _set_path(game_state: Dict[str, Any], path: Tuple[Any, ...], value: Any):
+    """Set the value at a path, deleting the key if value is ABSENT."""
+    container = game_state
+    for key in path[:-1]:
+        container = container[key]
+    if value is ABSENT:
+        del container[path[-1]]
+    else:
+        container[path[-1]] = value
+
+
+class MoveRecord:
+    """One move or round in a GameHistory, with what is needed to take it back."""
+
+    __slots__ = ('player_id', 'move', 'position_hash', 'changes', 'previous_state')
+
+    def __init__(self, player_id: Optional[int], move: Any, position_hash: int,
+                 changes: Optional[List[Tuple[Tuple[Any, ...], Any]]] = None,
+                 previous_state: Optional[Dict[str, Any]] = None):
+        """
+        Initialize a move record.
+
+        Args:
+            player_id: ID of the player who moved, or None for a round
+            move: The move, or a dict of player ID to move for a round
+            position_hash: Hash of the position before the move
+            changes: In-place changes from apply_move_reversibly, undone in reverse
+            previous_state: State before the move, kept when the move was not in place
+        """
+        self.player_id = player_id
+        self.move = move
+        self.position_hash = position_hash
+        self.changes = changes
+        self.previous_state = previous_state
+
+
+class GameHistory:
+    """The moves played from a starting position, with hashing and undo."""
+
+    def __init__(self, game_logic: GameInterface, game_state: Dict[str, Any],
+                 in_place: bool = True, max_undo: Optional[int] = None):
+        """
+        Initialize the history at a starting position.
+
+        Args:
+            game_logic: GameInterface implementation of the game
+            game_state: Starting position
+            in_place: Apply moves with apply_move_reversibly where the game
+                supports it. The history then works on its own copy of the
+                state and changes it in place; otherwise every state is a new
+                object from apply_move, so states handed out stay valid.
+            max_undo: Number of most recent moves that can be undone, or None
+                for all. Older records drop what undo needs, so a history
+                kept only for hashing and repetition does not hold every state.
+        """
+        self.game_logic = game_logic
+        self.in_place = in_place
+        self.max_undo = max_undo
+        self.state = copy.deepcopy(game_state) if in_place else game_state
+        self.hash = position_hash(game_logic, game_state)
+        self.records: List[MoveRecord] = []
+        self._unhashed = set(game_logic.get_unhashed_fields())
+        # Number of times each position hash occurs in the history
+        self._counts: Dict[int, int] = {self.hash: 1}
+
+    def __len__(self) -> int:
+        """Number of moves and rounds played."""
+        return len(self.records)
+
+    def moves(self) -> List[Tuple[Optional[int], Any]]:
+        """Get the (player_id, move) pairs played, in order."""
+        return [(record.player_id, record.move) for record in self.records]
+
+    def _rehash(self, previous: Dict[Tuple[Any, ...], Any]) -> int:
+        """Update the hash for the values at the paths in previous, which held those values."""
+        result = self.hash
+        state = self.state
+        for path, value in previous.items():
+            if path[0] not in self._unhashed:
+                result ^= value_hash(path, value) ^ value_hash(path, _get_path(state, path))
+        return result
+
+    def _push(self, record: MoveRecord, new_hash: int) -> Dict[str, Any]:
+        """Add a record and count the position it leads to."""
+        records = self.records
+        records.append(record)
+        if self.max_undo is not None and len(records) > self.max_undo:
+            expired = records[-self.max_undo - 1]
+            expired.changes = None
+            expired.previous_state = None
+        self.hash = new_hash
+        self._counts[new_hash] = self._counts.get(new_hash, 0) + 1
+        return self.state
+
+    def _replace_state(self, record: MoveRecord, new_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Move to a state built by apply_move or apply_moves, rehashing the changed fields."""
+        old_state = self.state
+        previous = {}
+        for key in old_state.keys() | new_state.keys():
+            old_value = old_state.get(key, ABSENT)
+            if old_value is not new_state.get(key, ABSENT):
+                previous[(key,)] = old_value
+        self.state = new_state
+        return self._push(record, self._rehash(previous))
+
+    def play(self, player_id: int, move: Any) -> Dict[str, Any]:
+        """
+        Apply a move and record it.
+
+        Args:
+            player_id: ID of the player making the move
+            move: The move, already validated
+
+        Returns:
+            The new game state
+        """
+        record = MoveRecord(player_id, move, self.hash)
+        if self.in_place:
+            changes = self.game_logic.apply_move_reversibly(self.state, player_id, move)
+            if changes is not None:
+                record.changes = changes
+                # A path changed twice in one move is rehashed from its first value
+                previous = {}
+                for path, value in changes:
+                    previous.setdefault(tuple(path), value)
+                return self._push(record, self._rehash(previous))
+        record.previous_state = self.state
+        return self._replace_state(
+            record, self.game_logic.apply_move(self.state, player_id, move))
+
+    def play_round(self, moves: Dict[int, Any]) -> Dict[str, Any]:
+        """
+        Apply a round of simultaneous moves and record it as one entry.
+
+        Args:
+            moves: Dictionary mapping player ID to the move it made
+
+        Returns:
+            The new game state
+        """
+        record = MoveRecord(None, dict(moves), self.hash, previous_state=self.state)
+        return self._replace_state(record, self.game_logic.apply_moves(self.state, moves))
+
+    def undo(self) -> MoveRecord:
+        """
+        Take back the last move or round.
+
+        Returns:
+            Record of the move taken back
+
+        Raises:
+            IndexError: If no moves have been played, or the last one is
+                older than max_undo moves
+        """
+        if not self.records:
+            raise IndexError("No moves to undo")
+        record = self.records[-1]
+        if record.changes is None and record.previous_state is None:
+            raise IndexError(f"Only the last {self.max_undo} moves can be undone")
+        self.records.pop()
+        count = self._counts[self.hash] - 1
+        if count:
+            self._counts[self.hash] = count
+        else:
+            del self._counts[self.hash]
+        if record.changes is not None:
+            for path, value in reversed(record.changes):
+                _set_path(self.state, tuple(path), value)
+        else:
+            self.state = record.previous_state
+        self.hash = record.position_hash
+        return record
+
+    def takeback(self, player_id: int) -> List[MoveRecord]:
+        """
+        Take back moves up to and including the last one made by a player,
+        so it is that player's turn again.
+
+        Args:
+            player_id: ID of the player taking back their move
+
+        Returns:
+            Records of the moves taken back, most recent first
+
+        Raises:
+            ValueError: If the player has no move to take back
+            IndexError: If the player's last move is older than max_undo moves
+        """
+        for index in range(len(self.records) - 1, -1, -1):
+            if self.records[index].player_id == player_id:
+                break
+        else:
+            raise ValueError(f"Player {player_id + 1} has no move to take back")
+        if self.max_undo is not None and len(self.records) - index > self.max_undo:
+            raise IndexError(f"Only the last {self.max_undo} moves can be undone")
+        return [self.undo() for _ in range(len(self.records) - index)]
+
+    def repetitions(self, position: Optional[int] = None) -> int:
+        """
+        Count how many times a position occurs in the history.
+
+        Args:
+            position: Position hash; defaults to the current position
+
+        Returns:
+            Number of occurrences, including the current one
+        """
+        return self._counts.get(self.hash if position is None else position, 0)
+
+    def check_game_over(self) -> Optional[Dict[str, Any]]:
+        """
+        Check if the game is over, including by repetition for games with a
+        repetition limit.
+
+        Returns:
+            None if the game is not over, otherwise a result as returned by
+            check_game_over
+        """
+        limit = self.game_logic.get_repetition_limit()
+        if limit is not None and self._counts[self.hash] >= limit:
+            return {
+                'over': True,
+                'winner': None,
+                'draw': True,
+                'message': f"Draw by repetition: the position occurred {limit} times",
+            }
+        return self.game_logic.check_game_over(self.state)
@@ -0,0 +1,326 @@
+"""
+Typed protocol messages.
+Each MessageType has a declarative schema; message classes with __slots__
+and their validators are compiled from those schemas at import time.
+"""
+import json
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Dict, Any, Optional, Tuple, Type, Union
+
+
+class MessageType(Enum):
+    """Message types for protocol communication."""
+    # Connection messages
+    CONNECT = "CONNECT"
+    CONNECTED = "CONNECTED"
+    DISCONNECT = "DISCONNECT"
+
+    # Game messages
+    GAME_START = "GAME_START"
+    GAME_STATE = "GAME_STATE"
+    GAME_END = "GAME_END"
+
+    # Turn messages
+    YOUR_TURN = "YOUR_TURN"
+    MOVE = "MOVE"
+    MOVE_ACCEPTED = "MOVE_ACCEPTED"
+    MOVE_REJECTED = "MOVE_REJECTED"
+
+    # Error messages
+    ERROR = "ERROR"
+
+    # Server control
+    SERVER_MESSAGE = "SERVER_MESSAGE"
+
+
+class MessageValidationError(ValueError):
+    """Raised when a message does not match its schema."""
+    pass
+
+
+class Field:
+    """Schema entry for one key of a message's 'data' object."""
+
+    __slots__ = ('types', 'required', 'nullable')
+
+    def __init__(self, types: Union[type, Tuple[type, ...]] = object,
+                 required: bool = True, nullable: bool = False):
+        """
+        Declare a message field.
+
+        Args:
+            types: Accepted JSON value type(s)
+            required: Whether the key must be present
+            nullable: Whether a required field may be null
+        """
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.required = required
+        self.nullable = nullable or not required
+
+
+# Schema of the 'data' object for each message type
+MESSAGE_SCHEMAS: Dict[MessageType, Dict[str, Field]] = {
+    MessageType.CONNECT: {
+        'options': Field(dict, required=False),
+    },
+    MessageType.CONNECTED: {
+        'player_id': Field(int),
+        'game_name': Field(str),
+        'min_players': Field(int),
+        'max_players': Field(int),
+        'current_players': Field(int),
+        'options': Field(dict, required=False),
+    },
+    MessageType.DISCONNECT: {},
+    MessageType.GAME_START: {
+        'player_id': Field(int),
+        'game_name': Field(str),
+        'initial_state': Field(dict),
+        'help': Field(str, required=False),
+    },
+    MessageType.GAME_STATE: {
+        # Clients that negotiated deltas get changes to their last state instead
+        'game_state': Field(dict, required=False),
+        'changes': Field(list, required=False),
+        'board_display': Field(str, required=False),
+        'current_player': Field(int, required=False),
+    },
+    MessageType.GAME_END: {
+        'winner': Field(int, nullable=True),
+        'draw': Field(bool),
+        'won': Field(bool),
+        'message': Field(str),
+    },
+    MessageType.YOUR_TURN: {
+        'game_state': Field(dict, required=False),
+        'changes': Field(list, required=False),
+        'board_display': Field(str, required=False),
+    },
+    MessageType.MOVE: {
+        'move': Field((str, int, float, list, dict)),
+        'seq': Field(int, required=False),
+    },
+    MessageType.MOVE_ACCEPTED: {
+        # Omitted for clients that predicted the move locally
+        'game_state': Field(dict, required=False),
+        'changes': Field(list, required=False),
+        'board_display': Field(str, required=False),
+        'seq': Field(int, required=False),
+    },
+    MessageType.MOVE_REJECTED: {
+        'seq': Field(int, required=False),
+    },
+    MessageType.ERROR: {},
+    MessageType.SERVER_MESSAGE: {
+        'message': Field(str),
+    },
+}
+
+
+class Message(ABC):
+    """Base class of all protocol messages."""
+
+    __slots__ = ('error',)
+
+    # Wire type code and MessageType; set on each generated class
+    type: str = ''
+    message_type: Optional[MessageType] = None
+    fields: Tuple[str, ...] = ()
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The message's 'data' object as a dictionary."""
+        return self.to_dict().get('data', {})
+
+    @abstractmethod
+    def to_dict(self) -> Dict[str, Any]:
+        """Build the wire dictionary for this message."""
+        pass
+
+    def encode(self) -> str:
+        """Encode the message as a JSON string."""
+        return json.dumps(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Message) and self.to_dict() == other.to_dict()
+
+
+class GenericMessage(Message):
+    """A message whose type has no registered schema, e.g. a game plugin's."""
+
+    __slots__ = ('type', 'data')
+
+    def __init__(self, type: str, data: Optional[Dict[str, Any]] = None,
+                 error: Optional[str] = None):
+        self.type = type
+        self.data = data
+        self.error = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        message = {'type': self.type}
+        if self.data is not None:
+            message['data'] = self.data
+        if self.error is not None:
+            message['error'] = self.error
+        return message
+
+
+def _compile_message_class(class_name: str, code: str, message_type: Optional[MessageType],
+                           schema: Dict[str, Field]) -> Type[Message]:
+    """
+    Generate a Message subclass with __slots__, an __init__, a to_dict
+    encoder and a _from_data validator specialised for one schema.
+    """
+    names = tuple(schema)
+    namespace: Dict[str, Any] = {'MessageValidationError': MessageValidationError, '_MISSING': object()}
+
+    init_args = ''.join(f", {name}=None" for name in names)
+    init = [f"def __init__(self{init_args}, error=None):"]
+    init += [f"    self.{name} = {name}" for name in names]
+    init.append("    self.error = error")
+
+    encode = ["def to_dict(self):", f"    message = {{'type': {code!r}}}"]
+    if names:
+        encode.append("    data = {}")
+        for name, field in schema.items():
+            if field.required:
+                encode.append(f"    data[{name!r}] = self.{name}")
+            else:
+                encode.append(f"    if self.{name} is not None: data[{name!r}] = self.{name}")
+        encode.append("    if data: message['data'] = data")
+    encode += ["    if self.error is not None: message['error'] = self.error",
+               "    return message"]
+
+    decode = ["def _from_data(cls, data, error):",
+              "    if data is None: data = {}",
+              "    elif type(data) is not dict: raise MessageValidationError('data must be an object')",
+              "    if error is not None and type(error) is not str:",
+              "        raise MessageValidationError('error must be a string')"]
+    for index, (name, field) in enumerate(schema.items()):
+        types_name = f"_types_{index}"
+        namespace[types_name] = field.types
+        decode.append(f"    {name} = data.get({name!r}, _MISSING)")
+        decode.append(f"    if {name} is _MISSING:")
+        if field.required:
+            decode.append(f"        raise MessageValidationError('missing field {name}')")
+        else:
+            decode.append(f"        {name} = None")
+        decode.append(f"    elif {name} is None:")
+        if field.nullable:
+            decode.append("        pass")
+        else:
+            decode.append(f"        raise MessageValidationError('field {name} must not be null')")
+        decode.append(f"    elif not isinstance({name}, {types_name}):")
+        decode.append(f"        raise MessageValidationError('field {name} has the wrong type')")
+    decode.append(f"    return cls({''.join(f'{name}, ' for name in names)}error=error)")
+
+    exec(compile('\n'.join(init + encode + decode), '<message schema>', 'exec'), namespace)
+    return type(class_name, (Message,), {
+        '__slots__': names,
+        '__init__': namespace['__init__'],
+        'to_dict': namespace['to_dict'],
+        '_from_data': classmethod(namespace['_from_data']),
+        'type': code,
+        'message_type': message_type,
+        'fields': names,
+    })
+
+
+def _class_name(code: str) -> str:
+    return ''.join(part.capitalize() for part in code.split('_')) + 'Message'
+
+
+# Message class for every wire type code with a schema
+MESSAGE_CLASSES: Dict[str, Type[Message]] = {
+    msg_type.value: _compile_message_class(_class_name(msg_type.value), msg_type.value,
+                                           msg_type, schema)
+    for msg_type, schema in MESSAGE_SCHEMAS.items()
+}
+
+ConnectMessage = MESSAGE_CLASSES['CONNECT']
+ConnectedMessage = MESSAGE_CLASSES['CONNECTED']
+DisconnectMessage = MESSAGE_CLASSES['DISCONNECT']
+GameStartMessage = MESSAGE_CLASSES['GAME_START']
+GameStateMessage = MESSAGE_CLASSES['GAME_STATE']
+GameEndMessage = MESSAGE_CLASSES['GAME_END']
+YourTurnMessage = MESSAGE_CLASSES['YOUR_TURN']
+MoveMessage = MESSAGE_CLASSES['MOVE']
+MoveAcceptedMessage = MESSAGE_CLASSES['MOVE_ACCEPTED']
+MoveRejectedMessage = MESSAGE_CLASSES['MOVE_REJECTED']
+ErrorMessage = MESSAGE_CLASSES['ERROR']
+ServerMessage = MESSAGE_CLASSES['SERVER_MESSAGE']
+
+
+def register_message_schema(code: str, schema: Dict[str, Field]) -> Type[Message]:
+    """
+    Compile and register a message class for a custom message type.
+
+    Args:
+        code: Wire type string of the custom message
+        schema: Mapping of data keys to Field declarations
+
+    Returns:
+        The generated Message subclass
+    """
+    message_class = _compile_message_class(_class_name(code), code, None, schema)
+    MESSAGE_CLASSES[code] = message_class
+    return message_class
+
+
+def build_message(msg_type: Union[MessageType, str], data: Optional[Dict[str, Any]] = None,
+                  error: Optional[str] = None) -> Message:
+    """
+    Build a message object from a type and a data dictionary.
+
+    Args:
+        msg_type: A MessageType or the type string of a custom message
+        data: Optional data dictionary
+        error: Optional error message
+
+    Returns:
+        Typed message, or a GenericMessage for types without a schema
+
+    Raises:
+        MessageValidationError: If data does not match the type's schema
+    """
+    code = msg_type.value if isinstance(msg_type, MessageType) else msg_type
+    message_class = MESSAGE_CLASSES.get(code)
+    if message_class is None:
+        return GenericMessage(code, data, error)
+    return message_class._from_data(data, error)
+
+
+def decode_message(message: str) -> Message:
+    """
+    Decode and validate a JSON-encoded message.
+
+    Args:
+        message: JSON-encoded message string
+
+    Returns:
+        Typed message. Malformed input decodes to an ErrorMessage
+        describing the problem, so it never reaches message handlers.
+    """
+    try:
+        message_dict = json.loads(message)
+    except json.JSONDecodeError:
+        return ErrorMessage(error="Invalid message format")
+    if type(message_dict) is not dict or type(message_dict.get('type')) is not str:
+        return ErrorMessage(error="Invalid message format")
+
+    code = message_dict['type']
+    message_class = MESSAGE_CLASSES.get(code)
+    if message_class is None:
+        data = message_dict.get('data')
+        error = message_dict.get('error')
+        if (data is not None and type(data) is not dict) or (error is not None and type(error) is not str):
+            return ErrorMessage(error="Invalid message format")
+        return GenericMessage(code, data, error)
+    try:
+        return message_class._from_data(message_dict.get('data'), message_dict.get('error'))
+    except MessageValidationError as e:
+        return ErrorMessage(error=f"Invalid {code} message: {e}")
@@ -0,0 +1,364 @@
+"""
+m,n,k-game logic: players take turns placing stones on an m x n board and
+the first to get k in a row wins. Tic-Tac-Toe is the 3,3,3-game and Gomoku
+the 19,19,5-game.
+Wins are detected incrementally from the last move, so checking costs O(k)
+whatever the board size.
+"""
+from game_interface import GameInterface
+from typing import Dict, Any, Optional, Tuple, List
+
+
+# Marks an empty cell
+EMPTY = '.'
+
+# Stone of each player, by player ID
+SYMBOLS = 'XOABCDEFGHIJKLMNPQRSTUVWYZ' + 'abcdefghijklmnpqrstuvwyz'
+
+# Row and column steps of the four line directions: across, down and both diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class MNKGame(GameInterface):
+    """m,n,k-game for two or more players."""
+
+    def __init__(self, rows: int = 15, cols: int = 15, k: int = 5,
+                 min_players: int = 2, max_players: int = 2, name: Optional[str] = None):
+        """
+        Initialize the game.
+
+        Args:
+            rows: Number of board rows (m)
+            cols: Number of board columns (n)
+            k: Stones in a row needed to win
+            min_players: Players needed to start a game
+            max_players: Most players a game takes
+            name: Game name; defaults to 'm,n,k-game'
+        """
+        if not 1 <= k <= max(rows, cols):
+            raise ValueError("k must fit on the board")
+        if not 2 <= min_players <= max_players <= len(SYMBOLS):
+            raise ValueError(f"Player counts must be between 2 and {len(SYMBOLS)}")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.min_players = min_players
+        self.max_players = max_players
+        self.name = name or f"{rows},{cols},{k}-game"
+        self.symbols = SYMBOLS[:max_players]
+
+    def get_game_name(self) -> str:
+        """Return the name of the game."""
+        return self.name
+
+    def get_min_players(self) -> int:
+        """Return the minimum number of players required."""
+        return self.min_players
+
+    def get_max_players(self) -> int:
+        """Return the maximum number of players allowed."""
+        return self.max_players
+
+    def initialize_game(self, num_players: int) -> Dict[str, Any]:
+        """
+        Initialize a new game instance.
+
+        Args:
+            num_players: Number of players in the game
+
+        Returns:
+            Dictionary with initial game state
+        """
+        if not self.min_players <= num_players <= self.max_players:
+            raise ValueError(f"{self.name} takes {self.min_players} to "
+                             f"{self.max_players} players")
+
+        return {
+            'board': [EMPTY] * (self.rows * self.cols),
+            'current_player': 0,
+            'move_count': 0,
+            'last_move': None,
+            'winner': None,
+            'players': num_players
+        }
+
+    def _parse_move(self, move: Any) -> Optional[int]:
+        """Convert a 'row,col' move (1-based) to a cell index, or None if malformed."""
+        try:
+            row, col = (int(part) for part in str(move).replace(',', ' ').split())
+        except ValueError:
+            return None
+        if not (1 <= row <= self.rows and 1 <= col <= self.cols):
+            return None
+        return (row - 1) * self.cols + (col - 1)
+
+    def validate_move(self, game_state: Dict[str, Any], player_id: int,
+                     move: Any) -> Tuple[bool, Optional[str]]:
+        """
+        Validate a move from a player.
+
+        Args:
+            game_state: Current game state
+            player_id: ID of the player making the move (0-indexed)
+            move: The move to validate, as 'row,col'
+
+        Returns:
+            Tuple of (is_valid, error_message)
+        """
+        if game_state['current_player'] != player_id:
+            return False, "It's not your turn"
+        if game_state['winner'] is not None:
+            return False, "The game is over"
+
+        cell = self._parse_move(move)
+        if cell is None:
+            return False, (f"Move must be 'row,col' with row 1-{self.rows} "
+                           f"and column 1-{self.cols}")
+        if game_state['board'][cell] != EMPTY:
+            return False, f"Position {move} is already taken"
+
+        return True, None
+
+    def _wins(self, board: List[str], cell: int, symbol: str) -> bool:
+        """Check whether the stone at cell completes k in a row, looking only at its lines."""
+        rows, cols, k = self.rows, self.cols, self.k
+        row, col = divmod(cell, cols)
+        for row_step, col_step in DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * row_step, col + sign * col_step
+                while count < k and 0 <= r < rows and 0 <= c < cols and \
+                        board[r * cols + c] == symbol:
+                    count += 1
+                    r += sign * row_step
+                    c += sign * col_step
+            if count >= k:
+                return True
+        return False
+
+    def apply_move(self, game_state: Dict[str, Any], player_id: int,
+                   move: Any) -> Dict[str, Any]:
+        """
+        Apply a move to the game state.
+
+        Args:
+            game_state: Current game state
+            player_id: ID of the player making the move (0-indexed)
+            move: The move to apply
+
+        Returns:
+            Updated game state dictionary
+        """
+        new_state = game_state.copy()
+        board = new_state['board'] = game_state['board'].copy()
+        self._place(new_state, board, player_id, self._parse_move(move))
+        return new_state
+
+    def apply_move_reversibly(self, game_state: Dict[str, Any], player_id: int,
+                              move: Any) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """
+        Apply a move in place, recording the cell and fields it changes.
+
+        Args:
+            game_state: Current game state, changed in place
+            player_id: ID of the player making the move (0-indexed)
+            move: The move to apply
+
+        Returns:
+            List of (path, previous value) changes
+        """
+        board = game_state['board']
+        cell = self._parse_move(move)
+        changes = [(('board', cell), board[cell])]
+        changes += [((field,), game_state[field])
+                    for field in ('move_count', 'current_player', 'last_move', 'winner')]
+        self._place(game_state, board, player_id, cell)
+        return changes
+
+    def _place(self, game_state: Dict[str, Any], board: List[str], player_id: int, cell: int):
+        """Put a player's stone on a cell of game_state, whose board is board."""
+        symbol = self.symbols[player_id]
+        board[cell] = symbol
+        game_state['move_count'] += 1
+        game_state['last_move'] = cell
+        game_state['current_player'] = (player_id + 1) % game_state['players']
+        if self._wins(board, cell, symbol):
+            game_state['winner'] = player_id
+
+    def check_game_over(self, game_state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Check if the game is over and determine the result.
+
+        The winner is recorded when the winning move is applied, so this
+        does not look at the board.
+
+        Args:
+            game_state: Current game state
+
+        Returns:
+            None if game is not over, otherwise a dictionary with game result
+        """
+        winner_id = game_state['winner']
+        if winner_id is not None:
+            return {
+                'over': True,
+                'winner': winner_id,
+                'draw': False,
+                'message': f"Player {winner_id + 1} ({self.symbols[winner_id]}) wins!"
+            }
+
+        if game_state['move_count'] >= self.rows * self.cols:
+            return {
+                'over': True,
+                'winner': None,
+                'draw': True,
+                'message': "The game is a draw!"
+            }
+
+        return None
+
+    def get_legal_moves(self, game_state: Dict[str, Any],
+                        player_id: int) -> Optional[List[Any]]:
+        """
+        Get the moves a player could legally make.
+
+        Args:
+            game_state: Current game state
+            player_id: ID of the player to list moves for
+
+        Returns:
+            List of empty cells as 'row,col' strings
+        """
+        if game_state['current_player'] != player_id or game_state['winner'] is not None:
+            return []
+        cols = self.cols
+        return [f"{cell // cols + 1},{cell % cols + 1}"
+                for cell, value in enumerate(game_state['board']) if value == EMPTY]
+
+    def get_current_player(self, game_state: Dict[str, Any]) -> int:
+        """
+        Get the ID of the player whose turn it is.
+
+        Args:
+            game_state: Current game state
+
+        Returns:
+            Player ID (0-indexed)
+        """
+        return game_state['current_player']
+
+    def get_game_state_for_player(self, game_state: Dict[str, Any],
+                                  player_id: int) -> Dict[str, Any]:
+        """
+        Get the game state visible to a specific player.
+        All players see the whole board.
+
+        Args:
+            game_state: Full game state
+            player_id: ID of the player requesting state
+
+        Returns:
+            Game state dictionary for the player
+        """
+        return game_state.copy()
+
+    def get_private_fields(self) -> Dict[str, Any]:
+        """
+        The board is public, so all players share one view.
+
+        Returns:
+            Empty dictionary
+        """
+        return {}
+
+    def get_unhashed_fields(self) -> Tuple[str, ...]:
+        """
+        The move counter and last move do not change which position it is.
+
+        Returns:
+            Names of the fields left out of position hashes
+        """
+        return ('move_count', 'last_move')
+
+    def get_interested_players(self, game_state: Dict[str, Any],
+                               player_id: int) -> Optional[List[int]]:
+        """
+        Get the players a move matters to.
+
+        With more than two players, a move only concerns the players with
+        a stone on one of its lines within k cells, since only they can
+        have a line extended or blocked by it; the others catch up when
+        their turn comes. Finding them looks at O(k) cells.
+
+        Args:
+            game_state: Game state after the move
+            player_id: ID of the player who moved
+
+        Returns:
+            Player IDs to update, or None for every player
+        """
+        cell = game_state['last_move']
+        if game_state['players'] <= 2 or cell is None:
+            return None
+        rows, cols, board = self.rows, self.cols, game_state['board']
+        row, col = divmod(cell, cols)
+        symbols = set()
+        for row_step, col_step in DIRECTIONS:
+            for sign in (1, -1):
+                r, c = row, col
+                for _ in range(self.k - 1):
+                    r += sign * row_step
+                    c += sign * col_step
+                    if not (0 <= r < rows and 0 <= c < cols):
+                        break
+                    symbols.add(board[r * cols + c])
+        return [index for index, symbol in enumerate(self.symbols[:game_state['players']])
+                if symbol in symbols]
+
+    def format_state_for_display(self, game_state: Dict[str, Any]) -> str:
+        """
+        Format the game state as a string for display.
+
+        Args:
+            game_state: Current game state
+
+        Returns:
+            Formatted string representation
+        """
+        board, cols = game_state['board'], self.cols
+        width = len(str(max(self.rows, cols)))
+        header = ' ' * (width + 1) + ' '.join(str(col + 1).rjust(width) for col in range(cols))
+        lines = ['', header]
+        for row in range(self.rows):
+            cells = board[row * cols:(row + 1) * cols]
+            lines.append(f"{str(row + 1).rjust(width)} " +
+                         ' '.join(cell.rjust(width) for cell in cells))
+        return '\n'.join(lines)
+
+    def get_move_help(self) -> str:
+        """
+        Get help text explaining how to make moves.
+
+        Returns:
+            Help string
+        """
+        return (
+            f"Enter 'row,col' to place a stone, e.g. '{(self.rows + 1) // 2},"
+            f"{(self.cols + 1) // 2}' for the centre.\n"
+            f"Rows run 1-{self.rows} and columns 1-{self.cols}; "
+            f"{self.k} in a row in any direction wins."
+        )
+
+
+class GomokuGame(MNKGame):
+    """Gomoku: five in a row on a 19x19 board, for two players."""
+
+    def __init__(self):
+        super().__init__(19, 19, 5, name='Gomoku')
+
+
+class GomokuPartyGame(MNKGame):
+    """Five in a row on a 32x32 board for up to 24 players."""
+
+    def __init__(self):
+        super().__init__(32, 32, 5, min_players=3, max_players=24, name='Gomoku Party')
@@ -0,0 +1,122 @@
+"""
+Optimistic client-side move prediction.
+The client applies its own moves with the game's GameInterface as soon as
+they are sent, keeps the state from before each unconfirmed move, and rolls
+back when the server rejects one by sequence number.
+"""
+from typing import Dict, Any, Optional, List, Tuple
+from game_interface import GameInterface, TURN_SEQUENTIAL
+
+
+def can_predict(game_logic: Optional[GameInterface]) -> bool:
+    """
+    Check whether moves of a game can be predicted on the client.
+
+    Only turn-based games qualify: in simultaneous and real-time games the
+    outcome of a move depends on moves the client has not seen yet.
+
+    Args:
+        game_logic: GameInterface of the game being played, if known
+
+    Returns:
+        True if the client may apply its own moves locally
+    """
+    return game_logic is not None and game_logic.get_turn_mode() == TURN_SEQUENTIAL
+
+
+class MovePredictor:
+    """Tracks moves applied locally that the server has not confirmed yet."""
+
+    __slots__ = ('game_logic', 'last_seq', '_pending')
+
+    def __init__(self, game_logic: GameInterface):
+        """
+        Initialize the predictor.
+
+        Args:
+            game_logic: GameInterface used to validate and apply moves locally
+        """
+        self.game_logic = game_logic
+        self.last_seq = 0
+        # (seq, player_id, move, state before the move), oldest first
+        self._pending: List[Tuple[int, int, Any, Dict[str, Any]]] = []
+
+    @property
+    def pending(self) -> int:
+        """Number of moves awaiting confirmation."""
+        return len(self._pending)
+
+    def next_seq(self) -> int:
+        """Allocate the sequence number of the next outgoing move."""
+        self.last_seq += 1
+        return self.last_seq
+
+    def predict(self, game_state: Dict[str, Any], player_id: int,
+                move: Any) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Validate and apply a move locally.
+
+        Args:
+            game_state: Current game state as seen by the client
+            player_id: ID of the player making the move
+            move: The move to apply
+
+        Returns:
+            Tuple of (seq, predicted_state, error_message). predicted_state is
+            None if the move is invalid, in which case it should not be sent.
+        """
+        is_valid, error_msg = self.game_logic.validate_move(game_state, player_id, move)
+        if not is_valid:
+            return 0, None, error_msg or "Invalid move"
+        seq = self.next_seq()
+        self._pending.append((seq, player_id, move, game_state))
+        return seq, self.game_logic.apply_move(game_state, player_id, move), None
+
+    def confirm(self, seq: Optional[int]):
+        """Forget moves up to and including seq; the server has accepted them."""
+        if seq is None:
+            return
+        while self._pending and self._pending[0][0] <= seq:
+            self._pending.pop(0)
+
+    def reject(self, seq: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Roll back a rejected move and every move predicted after it.
+
+        Args:
+            seq: Sequence number echoed in MOVE_REJECTED
+
+        Returns:
+            State to restore, or None if seq is not a pending move
+        """
+        for index, (pending_seq, _, _, previous_state) in enumerate(self._pending):
+            if pending_seq == seq:
+                del self._pending[index:]
+                return previous_state
+        return None
+
+    def rebase(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Re-apply pending moves on top of an authoritative state from the server.
+
+        Moves that are no longer valid on the new state are dropped, along
+        with every move predicted after them.
+
+        Args:
+            game_state: State received from the server
+
+        Returns:
+            State the client should display
+        """
+        pending, self._pending = self._pending, []
+        for seq, player_id, move, _ in pending:
+            is_valid, _ = self.game_logic.validate_move(game_state, player_id, move)
+            if not is_valid:
+                break
+            self._pending.append((seq, player_id, move, game_state))
+            game_state = self.game_logic.apply_move(game_state, player_id, move)
+        return game_state
+
+    def clear(self):
+        """Drop all pending moves, e.g. when the game ends."""
+        self._pending.clear()
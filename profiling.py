@@ -0,0 +1,348 @@
+"""
+Opt-in profiling of game sessions.
+A Profiler samples a fraction of sessions, adjustable at runtime. Sampled
+sessions time their GameInterface calls, message encoding and socket I/O in
+nested spans and are written out as collapsed stacks or Chrome trace events.
+Sessions that are not sampled run without any instrumentation.
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
+from protocol import Protocol
+from messages import Message
+from transport import Transport, StreamTransport
+
+
+# Output formats a Profiler can write per session
+FORMAT_COLLAPSED = 'collapsed'  # "frame;frame;frame microseconds" lines, for flame graphs
+FORMAT_CHROME = 'chrome'        # Chrome trace-event JSON, for chrome://tracing or Perfetto
+TRACE_FORMATS = (FORMAT_COLLAPSED, FORMAT_CHROME)
+
+# Trace events kept per session; spans beyond it still count in the stacks
+MAX_TRACE_EVENTS = 100000
+
+# Shared no-op span for sessions that are not sampled
+_NULL_SPAN = nullcontext()
+
+
+class _NullProfile:
+    """Profile of a session that is not sampled; spans cost nothing."""
+
+    enabled = False
+
+    def span(self, name: str):
+        return _NULL_SPAN
+
+
+NULL_PROFILE = _NullProfile()
+
+
+class _Span:
+    """One timed region; spans nest through the profile's stack."""
+
+    __slots__ = ('profile', 'name', 'path', 'start', 'child_time')
+
+    def __init__(self, profile: 'SessionProfile', name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profile._stack
+        self.path = f"{stack[-1].path if stack else self.profile.root};{self.name}"
+        self.child_time = 0.0
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        profile = self.profile
+        stack = profile._stack
+        stack.pop()
+        if stack:
+            stack[-1].child_time += duration
+        profile._record(self.path, self.name, self.start, duration, duration - self.child_time)
+        return False
+
+
+class SessionProfile:
+    """Spans recorded for one sampled session."""
+
+    enabled = True
+
+    def __init__(self, session_id: int, root: str = 'session'):
+        """
+        Start profiling a session.
+
+        Args:
+            session_id: ID of the profiled session
+            root: Name of the outermost frame of every stack
+        """
+        self.session_id = session_id
+        self.root = root
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        # Self time in seconds per collapsed stack
+        self.stacks: Dict[str, float] = {}
+        self.events: List[Dict[str, Any]] = []
+        self._stack: List[_Span] = []
+        self._thread_id = threading.get_ident()
+
+    def span(self, name: str) -> _Span:
+        """
+        Time a region of code.
+
+        Args:
+            name: Frame name, e.g. 'game.apply_move'
+
+        Returns:
+            Context manager recording the span on exit
+        """
+        return _Span(self, name)
+
+    def _record(self, path: str, name: str, start: float, duration: float, self_time: float):
+        self.stacks[path] = self.stacks.get(path, 0.0) + self_time
+        if len(self.events) < MAX_TRACE_EVENTS:
+            self.events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self.started) * 1e6,
+                'dur': duration * 1e6,
+                'pid': self.session_id,
+                'tid': self._thread_id,
+            })
+
+    def finish(self):
+        """Stop the session clock and charge untracked time to the root frame."""
+        if self.finished is not None:
+            return
+        self.finished = time.perf_counter()
+        total = self.finished - self.started
+        self.stacks[self.root] = self.stacks.get(self.root, 0.0) + total - sum(self.stacks.values())
+        self.events.insert(0, {'name': self.root, 'ph': 'X', 'ts': 0.0, 'dur': total * 1e6,
+                               'pid': self.session_id, 'tid': self._thread_id})
+
+    def collapsed(self) -> str:
+        """Render the stacks in collapsed format with microsecond counts."""
+        return format_collapsed(self.stacks)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Render the spans as a Chrome trace-event document."""
+        return {'traceEvents': self.events, 'displayTimeUnit': 'ms'}
+
+
+def format_collapsed(stacks: Dict[str, float]) -> str:
+    """
+    Render self times per stack as collapsed-stack lines.
+
+    Args:
+        stacks: Dictionary mapping 'frame;frame' paths to seconds
+
+    Returns:
+        One "path microseconds" line per stack, as flamegraph.pl expects
+    """
+    return ''.join(f"{path} {round(seconds * 1e6)}\n"
+                   for path, seconds in sorted(stacks.items()) if seconds > 0)
+
+
+class ProfiledGame:
+    """Wraps a GameInterface so every public method call is a 'game.<method>' span."""
+
+    def __init__(self, game_logic, profile: SessionProfile):
+        self._game = game_logic
+        self._profile = profile
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._game, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        span_name = f"game.{name}"
+        profile = self._profile
+
+        def timed(*args, **kwargs):
+            with profile.span(span_name):
+                return attr(*args, **kwargs)
+
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, timed)
+        return timed
+
+
+class ProfiledTransport(Transport):
+    """
+    Wraps a transport so sends and receives are recorded as spans.
+
+    Stream transports are split into 'protocol.encode', 'socket.send'
+    (framing, compression and the write), 'socket.wait' (until the frame
+    header arrives), 'socket.recv' and 'protocol.decode'. The wrapper
+    compares equal to the wrapped transport, so per-connection tables such
+    as the server's client options keep working.
+    """
+
+    def __init__(self, transport: Transport, profile: SessionProfile):
+        self.transport = transport
+        self.profile = profile
+        self.selectable = transport.selectable
+        self._sock = transport.sock if isinstance(transport, StreamTransport) else None
+
+    def send(self, message: Message) -> bool:
+        span = self.profile.span
+        if self._sock is None:
+            with span('transport.send'):
+                return self.transport.send(message)
+        try:
+            with span('protocol.encode'):
+                encoded = message.encode()
+            with span('socket.send'), self.transport.send_lock:
+                Protocol._send_encoded(self._sock, encoded)
+            return True
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return False
+
+    def receive(self) -> Optional[Message]:
+        span = self.profile.span
+        if self._sock is None:
+            with span('transport.wait'):
+                return self.transport.receive()
+        sock = self._sock
+        try:
+            with span('socket.wait'):
+                length_bytes = Protocol._recv_exact(sock, 4)
+            if length_bytes is None:
+                return None
+            header = int.from_bytes(length_bytes, byteorder='big')
+            with span('socket.recv'):
+                body = Protocol._recv_exact(sock, Protocol.body_length(header))
+            if body is None:
+                return None
+            with span('protocol.decode'):
+                return Protocol.decode_frame(sock, header, body)
+        except Exception as e:
+            print(f"Error receiving message: {e}")
+            return None
+
+    def pending(self) -> bool:
+        return self.transport.pending()
+
+    def close(self):
+        self.transport.close()
+
+    def shutdown(self):
+        self.transport.shutdown()
+
+    def enable_compression(self, *args, **kwargs):
+        self.transport.enable_compression(*args, **kwargs)
+
+    def fileno(self) -> int:
+        return self.transport.fileno()
+
+    @property
+    def _waiters(self):
+        # wait_readable registers its wake-up events on the wrapped queue
+        return self.transport._waiters
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ProfiledTransport):
+            other = other.transport
+        return self.transport == other
+
+    def __hash__(self) -> int:
+        return hash(self.transport)
+
+
+class Profiler:
+    """Decides which sessions to profile and collects their traces."""
+
+    def __init__(self, sample_rate: float = 0.0, output_dir: Optional[str] = None,
+                 trace_format: str = FORMAT_COLLAPSED, seed: Optional[int] = None):
+        """
+        Initialize the profiler.
+
+        Args:
+            sample_rate: Fraction of sessions to profile, from 0.0 (off) to 1.0
+            output_dir: Directory per-session traces are written to, or None
+            trace_format: FORMAT_COLLAPSED or FORMAT_CHROME
+            seed: Seed for reproducible sampling
+        """
+        self.output_dir = output_dir
+        self.trace_format = trace_format
+        self.sample_rate = 0.0
+        self.set_sample_rate(sample_rate)
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"trace_format must be one of {', '.join(TRACE_FORMATS)}")
+        self.sessions_profiled = 0
+        self._random = random.Random(seed)
+        self._stacks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set_sample_rate(self, sample_rate: float):
+        """Change the fraction of new sessions that are profiled; takes effect immediately."""
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0.0 and 1.0")
+        self.sample_rate = sample_rate
+
+    def start_session(self, session_id: int):
+        """
+        Decide whether to profile a new session.
+
+        Args:
+            session_id: ID of the session
+
+        Returns:
+            A SessionProfile, or NULL_PROFILE if the session is not sampled
+        """
+        if self.sample_rate <= 0.0 or self._random.random() >= self.sample_rate:
+            return NULL_PROFILE
+        return SessionProfile(session_id)
+
+    def finish_session(self, profile) -> Optional[str]:
+        """
+        Merge a finished session into the aggregate and write its trace.
+
+        Args:
+            profile: Profile returned by start_session
+
+        Returns:
+            Path of the written trace file, or None
+        """
+        if not profile.enabled:
+            return None
+        profile.finish()
+        with self._lock:
+            self.sessions_profiled += 1
+            for path, seconds in profile.stacks.items():
+                self._stacks[path] = self._stacks.get(path, 0.0) + seconds
+
+        if not self.output_dir:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.trace_format == FORMAT_CHROME:
+            path = os.path.join(self.output_dir, f"session-{profile.session_id}.trace.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(profile.chrome_trace(), f)
+        else:
+            path = os.path.join(self.output_dir, f"session-{profile.session_id}.collapsed")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profile.collapsed())
+        return path
+
+    def collapsed(self) -> str:
+        """Collapsed stacks aggregated over every profiled session."""
+        with self._lock:
+            return format_collapsed(self._stacks)
+
+    def write_collapsed(self, path: str):
+        """Write the aggregated collapsed stacks to a file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+
+    def reset(self):
+        """Discard the aggregated stacks."""
+        with self._lock:
+            self._stacks.clear()
+            self.sessions_profiled = 0
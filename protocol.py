@@ -3,46 +3,94 @@ Protocol module for server-client communication.
 Defines message types and serialization/deserialization.
 """
 import json
-from enum import Enum
-from typing import Dict, Any, Optional
+import sys
+import threading
+import weakref
+import zlib
+from typing import Dict, Any, Optional, Union
+from messages import MessageType, Message, ErrorMessage, decode_message
 
 
-class MessageType(Enum):
-    """Message types for protocol communication."""
-    # Connection messages
-    CONNECT = "CONNECT"
-    CONNECTED = "CONNECTED"
-    DISCONNECT = "DISCONNECT"
+# Length headers with this bit set carry a compressed message body
+COMPRESSED_FLAG = 0x80000000
+
+# Compression methods a connection may negotiate in its CONNECT options
+COMPRESSION_METHODS = ('zlib',)
+
+# Message bodies smaller than this are always sent uncompressed
+DEFAULT_COMPRESSION_THRESHOLD = 256
+
+# Largest frame body accepted, before and after decompression; bigger frames close the connection
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+# Preset deflate dictionary built from the substrings every state frame
+# repeats, so even the first compressed frame on a connection is small.
+# The most common substrings go last, where they are cheapest to reference.
+_ZLIB_DICTIONARY = (
+    b'"help": "Enter "initial_state": "game_name": "Tic-Tac-Toe" '
+    b'"player1_choice": null, "player2_choice": null, "player1_score": '
+    b'"player2_score": "round": "winner": "draw": false, "won": '
+    b'"message": "error": "MOVE_ACCEPTED" "MOVE_REJECTED" "YOUR_TURN" '
+    b'"move_count": "players": 2}, "current_player": '
+    b'"board": ["#", "#", "#", "#", "#", "#", "#", "#", "#"], '
+    b'"board_display": "\\n-------------\\n| 1 | 2 | 3 | \\n-------------\\n| '
+    b'{"type": "GAME_STATE", "data": {"game_state": {'
+)
+
+# Bytes every Z_SYNC_FLUSH block ends with; stripped on the wire
+_SYNC_FLUSH_TAIL = b'\x00\x00\xff\xff'
+
+
+class _FrameCompressor:
+    """Streaming deflate context shared by all frames of one connection."""
     
-    # Game messages
-    GAME_START = "GAME_START"
-    GAME_STATE = "GAME_STATE"
-    GAME_END = "GAME_END"
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self._compressor = zlib.compressobj(wbits=-15, zdict=_ZLIB_DICTIONARY)
+        self._decompressor = zlib.decompressobj(wbits=-15, zdict=_ZLIB_DICTIONARY)
+        self._send_lock = threading.Lock()
     
-    # Turn messages
-    YOUR_TURN = "YOUR_TURN"
-    MOVE = "MOVE"
-    MOVE_ACCEPTED = "MOVE_ACCEPTED"
-    MOVE_REJECTED = "MOVE_REJECTED"
+    def compress(self, body: bytes) -> bytes:
+        data = self._compressor.compress(body) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-len(_SYNC_FLUSH_TAIL)]
     
-    # Error messages
-    ERROR = "ERROR"
+    def decompress(self, body: bytes) -> bytes:
+        data = self._decompressor.decompress(body + _SYNC_FLUSH_TAIL, MAX_FRAME_SIZE)
+        if self._decompressor.unconsumed_tail:
+            raise ValueError(f"Compressed frame inflates past {MAX_FRAME_SIZE} bytes")
+        return data
+
+
+# Compression state per connection, dropped when the socket is collected
+_compressors: "weakref.WeakKeyDictionary[Any, _FrameCompressor]" = weakref.WeakKeyDictionary()
+
+
+def type_code(msg_type: Union[MessageType, str]) -> str:
+    """
+    Get the interned wire code for a message type.
     
-    # Server control
-    SERVER_MESSAGE = "SERVER_MESSAGE"
+    Args:
+        msg_type: A MessageType or the type string of a custom message
+        
+    Returns:
+        Interned type string as it appears in the 'type' field
+    """
+    if isinstance(msg_type, MessageType):
+        return msg_type.value
+    return sys.intern(msg_type)
 
 
 class Protocol:
     """Handles message serialization and deserialization."""
     
     @staticmethod
-    def create_message(msg_type: MessageType, data: Optional[Dict[str, Any]] = None, 
+    def create_message(msg_type: Union[MessageType, str], data: Optional[Dict[str, Any]] = None, 
                       error: Optional[str] = None) -> str:
         """
         Create a protocol message.
         
         Args:
-            msg_type: Type of message
+            msg_type: Type of message, or the type string of a custom message
             data: Optional data dictionary
             error: Optional error message
             
@@ -50,7 +98,7 @@ class Protocol:
             JSON-encoded message string
         """
         message = {
-            "type": msg_type.value,
+            "type": type_code(msg_type),
         }
         
         if data is not None:
@@ -61,7 +109,7 @@ class Protocol:
         return json.dumps(message)
     
     @staticmethod
-    def parse_message(message: str) -> Dict[str, Any]:
+    def parse_message(message: str) -> Message:
         """
         Parse a protocol message.
         
@@ -69,29 +117,87 @@ class Protocol:
             message: JSON-encoded message string
             
         Returns:
-            Parsed message dictionary
+            Typed message object; malformed or invalid messages are
+            returned as an ERROR message describing the problem
         """
-        try:
-            return json.loads(message)
-        except json.JSONDecodeError:
-            return {
-                "type": MessageType.ERROR.value,
-                "error": "Invalid message format"
-            }
+        return decode_message(message)
     
     @staticmethod
-    def get_message_type(message_dict: Dict[str, Any]) -> Optional[MessageType]:
+    def get_message_type(message: Message) -> Optional[MessageType]:
         """Extract message type from parsed message."""
-        msg_type_str = message_dict.get("type")
-        if msg_type_str:
-            try:
-                return MessageType(msg_type_str)
-            except ValueError:
+        return message.message_type
+    
+    @staticmethod
+    def enable_compression(socket, threshold: int = DEFAULT_COMPRESSION_THRESHOLD):
+        """
+        Compress frames sent and received on a socket from now on.
+        
+        Both ends must enable compression at the same point in the stream,
+        which the CONNECT/CONNECTED handshake guarantees.
+        
+        Args:
+            socket: Socket object the compression context belongs to
+            threshold: Minimum body size in bytes worth compressing
+        """
+        _compressors[socket] = _FrameCompressor(threshold)
+    
+    @staticmethod
+    def encode_frame(socket, message: str) -> bytes:
+        """
+        Encode a message as a length-prefixed frame for a socket.
+        
+        With compression enabled this advances the connection's stream
+        context, so every encoded frame must actually be sent.
+        
+        Args:
+            socket: Socket the frame will be sent through
+            message: JSON-encoded message string
+            
+        Returns:
+            Frame bytes (header and body)
+        """
+        message_bytes = message.encode('utf-8')
+        compressor = _compressors.get(socket)
+        if compressor is not None and len(message_bytes) >= compressor.threshold:
+            message_bytes = compressor.compress(message_bytes)
+            return (len(message_bytes) | COMPRESSED_FLAG).to_bytes(4, byteorder='big') + message_bytes
+        return len(message_bytes).to_bytes(4, byteorder='big') + message_bytes
+    
+    @staticmethod
+    def body_length(header: int) -> int:
+        """
+        Get the body length a frame header announces.
+        
+        Args:
+            header: Value of the 4-byte length header
+            
+        Returns:
+            Body length in bytes
+            
+        Raises:
+            ValueError: If the body is larger than MAX_FRAME_SIZE
+        """
+        length = header & ~COMPRESSED_FLAG
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+        return length
+    
+    @staticmethod
+    def _recv_exact(socket, length: int) -> Optional[bytes]:
+        """Receive exactly length bytes, or None if the connection closed."""
+        # Joined once at the end, so a frame arriving in many pieces is not copied per piece
+        chunks = []
+        remaining = length
+        while remaining:
+            chunk = socket.recv(remaining)
+            if not chunk:
                 return None
-        return None
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
     
     @staticmethod
-    def send_message(socket, msg_type: MessageType, data: Optional[Dict[str, Any]] = None,
+    def send_message(socket, msg_type: Union[MessageType, str], data: Optional[Dict[str, Any]] = None,
                     error: Optional[str] = None) -> bool:
         """
         Send a protocol message through a socket.
@@ -106,19 +212,44 @@ class Protocol:
             True if successful, False otherwise
         """
         try:
-            message = Protocol.create_message(msg_type, data, error)
-            # Send message length first, then message
-            message_bytes = message.encode('utf-8')
-            length = len(message_bytes)
-            socket.sendall(length.to_bytes(4, byteorder='big'))
-            socket.sendall(message_bytes)
+            Protocol._send_encoded(socket, Protocol.create_message(msg_type, data, error))
             return True
         except Exception as e:
             print(f"Error sending message: {e}")
             return False
     
     @staticmethod
-    def receive_message(socket) -> Optional[Dict[str, Any]]:
+    def send(socket, message: Message) -> bool:
+        """
+        Send a typed message object through a socket.
+        
+        Args:
+            socket: Socket object to send through
+            message: Message to send
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            Protocol._send_encoded(socket, message.encode())
+            return True
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return False
+    
+    @staticmethod
+    def _send_encoded(socket, message: str):
+        """Frame and send an already JSON-encoded message."""
+        compressor = _compressors.get(socket)
+        if compressor is None:
+            socket.sendall(Protocol.encode_frame(socket, message))
+        else:
+            # The stream context must see frames in the order they are sent
+            with compressor._send_lock:
+                socket.sendall(Protocol.encode_frame(socket, message))
+    
+    @staticmethod
+    def receive_message(socket) -> Optional[Message]:
         """
         Receive a protocol message from a socket.
         
@@ -126,25 +257,91 @@ class Protocol:
             socket: Socket object to receive from
             
         Returns:
-            Parsed message dictionary or None if error
+            Parsed message object or None if error
         """
         try:
             # Receive message length first
-            length_bytes = socket.recv(4)
-            if len(length_bytes) < 4:
+            length_bytes = Protocol._recv_exact(socket, 4)
+            if length_bytes is None:
                 return None
-            length = int.from_bytes(length_bytes, byteorder='big')
+            header = int.from_bytes(length_bytes, byteorder='big')
             
             # Receive the actual message
-            message_bytes = b''
-            while len(message_bytes) < length:
-                chunk = socket.recv(length - len(message_bytes))
-                if not chunk:
-                    return None
-                message_bytes += chunk
+            message_bytes = Protocol._recv_exact(socket, Protocol.body_length(header))
+            if message_bytes is None:
+                return None
+            
+            return Protocol.decode_frame(socket, header, message_bytes)
+        except Exception as e:
+            print(f"Error receiving message: {e}")
+            return None
+    
+    @staticmethod
+    def decode_frame(socket, header: int, body: bytes) -> Message:
+        """
+        Decode a frame body received on a socket.
+        
+        Args:
+            socket: Socket (or other connection key) the frame arrived on
+            header: Value of the 4-byte length header
+            body: Frame body bytes
+            
+        Returns:
+            Parsed message object
+            
+        Raises:
+            ValueError: If a compressed body inflates past MAX_FRAME_SIZE; the
+                connection's stream context is then unusable, so it must close
+        """
+        if header & COMPRESSED_FLAG:
+            compressor = _compressors.get(socket)
+            if compressor is None:
+                return ErrorMessage(error="Compressed frame on an uncompressed connection")
+            body = compressor.decompress(body)
+        return Protocol.parse_message(body.decode('utf-8'))
+    
+    @staticmethod
+    async def send_async(writer, message: Message) -> bool:
+        """
+        Send a typed message through an asyncio StreamWriter.
+        
+        The writer is the connection key for compression, as the socket is
+        for the blocking functions.
+        
+        Args:
+            writer: asyncio StreamWriter to send through
+            message: Message to send
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            writer.write(Protocol.encode_frame(writer, message.encode()))
+            await writer.drain()
+            return True
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return False
+    
+    @staticmethod
+    async def receive_async(reader, writer) -> Optional[Message]:
+        """
+        Receive a protocol message from an asyncio StreamReader.
+        
+        Args:
+            reader: asyncio StreamReader to receive from
+            writer: StreamWriter of the same connection, used as its key
             
-            message = message_bytes.decode('utf-8')
-            return Protocol.parse_message(message)
+        Returns:
+            Parsed message object or None if the connection closed
+        """
+        try:
+            header = int.from_bytes(await reader.readexactly(4), byteorder='big')
+            body = await reader.readexactly(Protocol.body_length(header))
+            return Protocol.decode_frame(writer, header, body)
+        except EOFError:
+            # asyncio.IncompleteReadError; asyncio itself is only imported by async clients
+            return None
         except Exception as e:
             print(f"Error receiving message: {e}")
             return None
@@ -0,0 +1,421 @@
+"""
+Player ratings and leaderboards.
+Finished games update Elo ratings per game in memory, where leaderboards
+are kept as sorted indexes for fast rank and top-N queries. A background
+thread writes the changes to a SQLite database in WAL mode in batches, so
+game sessions never wait for the disk.
+
+Players are rated under the name they send in CONNECT, and nothing checks
+who sends it: anyone can play under another player's name and move their
+rating. Resume tokens only protect suspended games, not names. Treat the
+leaderboard as informal unless the server runs where every client is trusted.
+"""
+import bisect
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Rating of a player's first game
+DEFAULT_RATING = 1500.0
+
+# Largest rating change a single two-player game can cause
+DEFAULT_K_FACTOR = 32.0
+
+# Longest a finished game waits before its result is written
+FLUSH_INTERVAL = 0.5
+
+# Most results written in one transaction
+MAX_BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    game TEXT NOT NULL,
+    name TEXT NOT NULL,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    PRIMARY KEY (game, name)
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    finished REAL NOT NULL,
+    players TEXT NOT NULL,
+    winner INTEGER,
+    draw INTEGER NOT NULL
+);
+"""
+
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    """
+    Probability that a player beats an opponent under the Elo model.
+
+    Args:
+        rating: Rating of the player
+        opponent_rating: Rating of the opponent
+
+    Returns:
+        Expected score between 0 and 1
+    """
+    return 1.0 / (1.0 + 10.0 ** ((opponent_rating - rating) / 400.0))
+
+
+def elo_update(ratings: List[float], winner: Optional[int], draw: bool,
+               k_factor: float = DEFAULT_K_FACTOR) -> List[float]:
+    """
+    Compute new ratings after a game.
+
+    Games with more than two players are scored as one match per pair of
+    players: the winner beats everyone, the other players draw among
+    themselves, and K is divided by the number of opponents.
+
+    Args:
+        ratings: Ratings before the game, indexed by player ID
+        winner: Player ID of the winner, or None
+        draw: Whether the game was a draw
+
+    Returns:
+        Ratings after the game, indexed by player ID
+    """
+    count = len(ratings)
+    k = k_factor / max(1, count - 1)
+    new_ratings = list(ratings)
+    for i in range(count):
+        for j in range(count):
+            if i == j:
+                continue
+            if draw or winner not in (i, j):
+                score = 0.5
+            else:
+                score = 1.0 if winner == i else 0.0
+            new_ratings[i] += k * (score - expected_score(ratings[i], ratings[j]))
+    return new_ratings
+
+
+class PlayerRating:
+    """Rating and record of one player in one game."""
+
+    __slots__ = ('name', 'rating', 'games', 'wins', 'losses', 'draws')
+
+    def __init__(self, name: str, rating: float = DEFAULT_RATING, games: int = 0,
+                 wins: int = 0, losses: int = 0, draws: int = 0):
+        self.name = name
+        self.rating = rating
+        self.games = games
+        self.wins = wins
+        self.losses = losses
+        self.draws = draws
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'rating': round(self.rating, 1),
+            'games': self.games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'draws': self.draws,
+        }
+
+
+class Leaderboard:
+    """
+    Players of one game, sorted by rating.
+
+    Ranks are found by binary search on a sorted list of (-rating, name)
+    keys; rating changes move one key, which is a single memmove.
+    Leaderboards are not thread-safe; RatingService serializes access.
+    """
+
+    def __init__(self):
+        self._players: Dict[str, PlayerRating] = {}
+        self._index: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def get(self, name: str) -> Optional[PlayerRating]:
+        """Get a player's rating, or None if they have not played."""
+        return self._players.get(name)
+
+    def set(self, player: PlayerRating, rating: float):
+        """
+        Add a player or change their rating.
+
+        Args:
+            player: Player to place; added if not on the leaderboard yet
+            rating: New rating
+        """
+        if self._players.get(player.name) is player:
+            del self._index[bisect.bisect_left(self._index, (-player.rating, player.name))]
+        else:
+            self._players[player.name] = player
+        player.rating = rating
+        bisect.insort(self._index, (-rating, player.name))
+
+    def rank(self, name: str) -> Optional[int]:
+        """
+        Get a player's rank.
+
+        Args:
+            name: Player name
+
+        Returns:
+            1 for the highest rated player, or None if they have not played
+        """
+        player = self._players.get(name)
+        if player is None:
+            return None
+        return bisect.bisect_left(self._index, (-player.rating, name)) + 1
+
+    def top(self, count: int = 10, offset: int = 0) -> List[PlayerRating]:
+        """
+        Get the highest rated players.
+
+        Args:
+            count: Number of players
+            offset: Number of players to skip, for paging
+
+        Returns:
+            Players in rank order
+        """
+        return [self._players[name] for _, name in self._index[offset:offset + count]]
+
+    def nearby(self, name: str, count: int = 10) -> List[PlayerRating]:
+        """
+        Get the players ranked closest to a player, e.g. to pick opponents.
+
+        Args:
+            name: Player name
+            count: Number of players on each side
+
+        Returns:
+            Players in rank order, including the player
+        """
+        rank = self.rank(name)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - count)
+        return self.top(rank + count - start, start)
+
+
+class RatingStore:
+    """SQLite database of ratings and game results."""
+
+    def __init__(self, path: str):
+        """
+        Open or create the database.
+
+        Args:
+            path: Database file path
+        """
+        self.path = path
+        # Only the writer thread uses the connection after loading
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # WAL keeps the database consistent without syncing every commit
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+    def load(self) -> Iterator[Tuple[str, PlayerRating]]:
+        """Yield (game, player rating) for every rated player."""
+        rows = self.connection.execute(
+            'SELECT game, name, rating, games, wins, losses, draws FROM ratings')
+        for game, *fields in rows:
+            yield game, PlayerRating(*fields)
+
+    def write(self, players: List[Tuple], results: List[Tuple]):
+        """
+        Write a batch of changes in one transaction.
+
+        Args:
+            players: (game, name, rating, games, wins, losses, draws) rows
+            results: (game, finished, players JSON, winner, draw) rows
+        """
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO ratings (game, name, rating, games, wins, losses, draws) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (game, name) DO UPDATE SET rating = excluded.rating, '
+                'games = excluded.games, wins = excluded.wins, '
+                'losses = excluded.losses, draws = excluded.draws', players)
+            self.connection.executemany(
+                'INSERT INTO results (game, finished, players, winner, draw) '
+                'VALUES (?, ?, ?, ?, ?)', results)
+
+    def close(self):
+        self.connection.close()
+
+
+class RatingService:
+    """Rates finished games and serves leaderboards, persisting in the background."""
+
+    def __init__(self, path: Optional[str] = None, k_factor: float = DEFAULT_K_FACTOR,
+                 flush_interval: float = FLUSH_INTERVAL):
+        """
+        Initialize the service, loading existing ratings.
+
+        Args:
+            path: SQLite database file, or None to keep ratings in memory only
+            k_factor: Elo K factor
+            flush_interval: Longest a result waits before it is written
+        """
+        self.k_factor = k_factor
+        self.flush_interval = flush_interval
+        self.leaderboards: Dict[str, Leaderboard] = {}
+        self.games_rated = 0
+        self._lock = threading.Lock()
+        self.store = RatingStore(path) if path else None
+        self._writes: "queue.Queue[Any]" = queue.Queue()
+        self._writer = None
+        if self.store is not None:
+            for game, player in self.store.load():
+                self.leaderboard(game).set(player, player.rating)
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def leaderboard(self, game: str) -> Leaderboard:
+        """Get the leaderboard of a game, creating it if needed."""
+        board = self.leaderboards.get(game)
+        if board is None:
+            board = self.leaderboards.setdefault(game, Leaderboard())
+        return board
+
+    def record_result(self, game: str, names: List[Optional[str]], winner: Optional[int],
+                      draw: bool) -> Dict[str, float]:
+        """
+        Rate a finished game.
+
+        Games are only rated when every player has a distinct name; the
+        result is stored either way.
+
+        Args:
+            game: Registry key of the game
+            names: Player names by player ID; None for anonymous players
+            winner: Player ID of the winner, or None
+            draw: Whether the game was a draw
+
+        Returns:
+            Rating change per player name; empty if the game was not rated
+        """
+        rated = len(names) > 1 and None not in names and len(set(names)) == len(names)
+        changes: Dict[str, float] = {}
+        rows = []
+        if rated:
+            with self._lock:
+                board = self.leaderboard(game)
+                players = [board.get(name) or PlayerRating(name) for name in names]
+                new_ratings = elo_update([player.rating for player in players], winner, draw,
+                                         self.k_factor)
+                for idx, (player, rating) in enumerate(zip(players, new_ratings)):
+                    changes[player.name] = rating - player.rating
+                    player.games += 1
+                    if draw:
+                        player.draws += 1
+                    elif winner == idx:
+                        player.wins += 1
+                    else:
+                        player.losses += 1
+                    board.set(player, rating)
+                    rows.append((game, player.name, player.rating, player.games,
+                                 player.wins, player.losses, player.draws))
+                self.games_rated += 1
+        if self.store is not None:
+            self._writes.put((rows, (game, time.time(), json.dumps(names), winner, int(draw))))
+        return changes
+
+    def rank(self, game: str, name: str) -> Optional[int]:
+        """Get a player's rank in a game, or None if unrated."""
+        with self._lock:
+            return self.leaderboard(game).rank(name)
+
+    def top(self, game: str, count: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get the leaderboard of a game.
+
+        Args:
+            game: Registry key of the game
+            count: Number of players
+            offset: Number of players to skip
+
+        Returns:
+            Player dictionaries with their rank, in rank order
+        """
+        with self._lock:
+            players = self.leaderboard(game).top(count, offset)
+            return [dict(player.to_dict(), rank=offset + index + 1)
+                    for index, player in enumerate(players)]
+
+    def player(self, game: str, name: str) -> Optional[Dict[str, Any]]:
+        """Get a player's rating, record and rank in a game, or None if unrated."""
+        with self._lock:
+            board = self.leaderboard(game)
+            player = board.get(name)
+            if player is None:
+                return None
+            return dict(player.to_dict(), rank=board.rank(name))
+
+    @property
+    def pending_writes(self) -> int:
+        """Number of results not yet written to the database."""
+        return self._writes.qsize()
+
+    def flush(self):
+        """Block until every recorded result has been written."""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        self._writes.put(done)
+        done.wait()
+
+    def close(self):
+        """Write outstanding results and close the database."""
+        if self._writer is None:
+            return
+        self._writes.put(None)
+        self._writer.join()
+        self._writer = None
+        self.store.close()
+
+    def _write_loop(self):
+        """Write queued results in batches until closed."""
+        while True:
+            item = self._writes.get()
+            # Collect whatever else arrives within the flush interval
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while (isinstance(batch[-1], tuple) and len(batch) < MAX_BATCH_SIZE):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._writes.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # A player's latest row supersedes earlier ones in the batch
+            players: Dict[Tuple[str, str], Tuple] = {}
+            results = []
+            for entry in batch:
+                if isinstance(entry, tuple):
+                    rows, result = entry
+                    for row in rows:
+                        players[row[:2]] = row
+                    results.append(result)
+            if results:
+                try:
+                    self.store.write(list(players.values()), results)
+                except sqlite3.Error as e:
+                    print(f"Error writing ratings: {e}")
+
+            marker = batch[-1]
+            if isinstance(marker, threading.Event):
+                marker.set()
+            elif marker is None:
+                return
@@ -0,0 +1,416 @@
+"""
+Game replay recording and replay engine.
+Sessions can record their initial state and moves to a compact replay file,
+which the ReplayEngine re-executes through any GameInterface without sockets.
+"""
+import gzip
+import json
+import os
+import time
+from typing import Dict, Any, Optional, List, Tuple, Callable, TYPE_CHECKING
+from game_interface import GameInterface
+from history import GameHistory
+
+if TYPE_CHECKING:
+    from game_registry import GameRegistry
+
+
+REPLAY_FORMAT_VERSION = 2
+
+# Older versions still loaded; version 1 replays do not record the game's registry key
+READABLE_REPLAY_VERSIONS = (1, 2)
+
+# File extension of replay files written by ReplayRecorder
+REPLAY_EXTENSION = '.replay.gz'
+
+# Number of moves between state snapshots kept for seeking
+DEFAULT_SNAPSHOT_INTERVAL = 32
+
+
+class ReplayError(Exception):
+    """Raised when a replay cannot be loaded or re-executed."""
+    pass
+
+
+class Replay:
+    """A recorded game: initial state, moves in order and the result."""
+
+    def __init__(self, game_name: str, num_players: int, initial_state: Dict[str, Any],
+                 moves: Optional[List[Tuple[int, Any]]] = None,
+                 result: Optional[Dict[str, Any]] = None, started_at: Optional[float] = None,
+                 game_key: Optional[str] = None):
+        """
+        Initialize a replay.
+
+        Args:
+            game_name: Name of the game that was played
+            num_players: Number of players in the game
+            initial_state: Game state returned by initialize_game
+            moves: List of (player_id, move) tuples in the order applied. A round
+                of simultaneous moves is stored as (None, [[player_id, move], ...]).
+            result: Result from check_game_over, or None if the game was aborted
+            started_at: Unix timestamp of the game start
+            game_key: Registry key of the game, used to find its logic when
+                replaying; None in replays from before it was recorded
+        """
+        self.game_name = game_name
+        self.game_key = game_key
+        self.num_players = num_players
+        self.initial_state = initial_state
+        self.moves = moves if moves is not None else []
+        self.result = result
+        self.started_at = started_at if started_at is not None else time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the replay to its serialized dictionary form."""
+        return {
+            'version': REPLAY_FORMAT_VERSION,
+            'game': self.game_name,
+            'game_key': self.game_key,
+            'players': self.num_players,
+            'started_at': self.started_at,
+            'initial_state': self.initial_state,
+            'moves': self.moves,
+            'result': self.result,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Replay':
+        """Create a replay from its serialized dictionary form."""
+        if data.get('version') not in READABLE_REPLAY_VERSIONS:
+            raise ReplayError(f"Unsupported replay version: {data.get('version')}")
+        return cls(
+            game_name=data['game'],
+            num_players=data['players'],
+            initial_state=data['initial_state'],
+            moves=[(player_id, move) for player_id, move in data['moves']],
+            result=data.get('result'),
+            started_at=data.get('started_at'),
+            game_key=data.get('game_key'),
+        )
+
+
+def save_replay(replay: Replay, path: str):
+    """
+    Write a replay to a gzip-compressed JSON file.
+
+    Args:
+        replay: Replay to write
+        path: Destination file path
+    """
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(replay.to_dict(), f, separators=(',', ':'))
+
+
+def load_replay(path: str) -> Replay:
+    """
+    Read a replay written by save_replay.
+
+    Args:
+        path: Replay file path
+
+    Returns:
+        The loaded replay
+    """
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return Replay.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ReplayError(f"Could not load replay {path}: {e}")
+
+
+class ReplayRecorder:
+    """Records one session's moves and writes the replay when it ends."""
+
+    def __init__(self, directory: str):
+        """
+        Initialize the recorder.
+
+        Args:
+            directory: Directory replay files are written to
+        """
+        self.directory = directory
+        self.replay: Optional[Replay] = None
+        self.path: Optional[str] = None
+
+    def start(self, game_name: str, num_players: int, initial_state: Dict[str, Any],
+              game_key: Optional[str] = None):
+        """Begin recording a game from its initial state."""
+        self.replay = Replay(game_name, num_players, initial_state, game_key=game_key)
+
+    def record_move(self, player_id: int, move: Any):
+        """Record a move that was validated and applied."""
+        self.replay.moves.append((player_id, move))
+
+    def record_round(self, moves: Dict[int, Any]):
+        """Record a round of simultaneous moves applied with apply_moves."""
+        self.replay.moves.append((None, [[player_id, move] for player_id, move in sorted(moves.items())]))
+
+    def finish(self, result: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Store the result and write the replay file.
+
+        Args:
+            result: Result from check_game_over, or None if the game was aborted
+
+        Returns:
+            Path of the written replay file, or None if nothing was recorded
+        """
+        if self.replay is None or self.path is not None:
+            return self.path
+        self.replay.result = result
+        import uuid
+        os.makedirs(self.directory, exist_ok=True)
+        name = time.strftime('%Y%m%d-%H%M%S', time.gmtime(self.replay.started_at))
+        self.path = os.path.join(self.directory, f"{name}-{uuid.uuid4().hex[:12]}{REPLAY_EXTENSION}")
+        save_replay(self.replay, self.path)
+        return self.path
+
+
+class ReplayEngine:
+    """Re-executes a replay through a GameInterface, with snapshot seeking."""
+
+    def __init__(self, game_logic: GameInterface, replay: Replay,
+                 snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL):
+        """
+        Initialize the replay engine.
+
+        Args:
+            game_logic: GameInterface implementation to replay through
+            replay: Replay to execute
+            snapshot_interval: Number of moves between kept state snapshots
+        """
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be at least 1")
+        self.game_logic = game_logic
+        self.replay = replay
+        self.snapshot_interval = snapshot_interval
+        self._snapshots: List[Dict[str, Any]] = [replay.initial_state]
+
+    def _validate(self, game_state: Dict[str, Any], index: int):
+        """Check that the move (or round of moves) at index is valid in game_state."""
+        player_id, move = self.replay.moves[index]
+        if player_id is None:
+            for round_player, round_move in move:
+                is_valid, error_msg = self.game_logic.validate_move(
+                    game_state, round_player, round_move)
+                if not is_valid:
+                    raise ReplayError(f"Round {index + 1} move {round_move!r} by player "
+                                      f"{round_player + 1} is invalid: {error_msg}")
+            return
+        is_valid, error_msg = self.game_logic.validate_move(game_state, player_id, move)
+        if not is_valid:
+            raise ReplayError(f"Move {index + 1} ({move!r} by player {player_id + 1}) "
+                              f"is invalid: {error_msg}")
+
+    def _apply(self, game_state: Dict[str, Any], index: int, validate: bool) -> Dict[str, Any]:
+        """Apply the move (or round of moves) at index to game_state."""
+        if validate:
+            self._validate(game_state, index)
+        player_id, move = self.replay.moves[index]
+        if player_id is None:
+            moves = {round_player: round_move for round_player, round_move in move}
+            return self.game_logic.apply_moves(game_state, moves)
+        return self.game_logic.apply_move(game_state, player_id, move)
+
+    def history(self, validate: bool = False) -> GameHistory:
+        """
+        Replay every move into a GameHistory, for position hashes,
+        repetition counts and stepping back through the game with undo.
+
+        Args:
+            validate: Validate each move before applying it
+
+        Returns:
+            GameHistory positioned after the last move
+        """
+        history = GameHistory(self.game_logic, self.replay.initial_state, in_place=False)
+        for index, (player_id, move) in enumerate(self.replay.moves):
+            if validate:
+                self._validate(history.state, index)
+            if player_id is None:
+                history.play_round({round_player: round_move for round_player, round_move in move})
+            else:
+                history.play(player_id, move)
+        return history
+
+    def seek(self, move_number: int, validate: bool = False) -> Dict[str, Any]:
+        """
+        Get the game state after a number of moves.
+
+        Starts from the nearest earlier snapshot, so seeking costs at most
+        snapshot_interval moves once the game has been replayed.
+
+        Args:
+            move_number: Number of moves to apply (0 is the initial state)
+            validate: Validate each move before applying it
+
+        Returns:
+            Game state after move_number moves
+        """
+        if move_number < 0 or move_number > len(self.replay.moves):
+            raise IndexError(f"move_number must be between 0 and {len(self.replay.moves)}")
+
+        snapshot_index = min(move_number // self.snapshot_interval, len(self._snapshots) - 1)
+        game_state = self._snapshots[snapshot_index]
+        for index in range(snapshot_index * self.snapshot_interval, move_number):
+            game_state = self._apply(game_state, index, validate)
+            if (index + 1) % self.snapshot_interval == 0 and \
+                    (index + 1) // self.snapshot_interval == len(self._snapshots):
+                self._snapshots.append(game_state)
+        return game_state
+
+    def run(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Replay every move, validating each one.
+
+        Returns:
+            Tuple of (final_state, result from check_game_over)
+        """
+        if self.game_logic.get_repetition_limit() is not None:
+            # Draws by repetition depend on every earlier position
+            history = self.history(validate=True)
+            return history.state, history.check_game_over()
+        final_state = self.seek(len(self.replay.moves), validate=True)
+        return final_state, self.game_logic.check_game_over(final_state)
+
+    def verify(self) -> bool:
+        """Check that replaying the moves reproduces the recorded result."""
+        try:
+            _, result = self.run()
+        except ReplayError:
+            return False
+        return result == self.replay.result
+
+
+# Registries this process resolves replayed games with, by games config path
+_registries: Dict[Optional[str], 'GameRegistry'] = {}
+
+
+def resolve_game(replay: Replay, game_factory: Optional[Callable[[], GameInterface]] = None,
+                 config_path: Optional[str] = None) -> GameInterface:
+    """
+    Find the logic of the game a replay was recorded with.
+
+    Replays that record a registry key known to GameRegistry.default() use
+    that game; older replays and unknown keys fall back to game_factory, or
+    without one to the key derived from the recorded game name.
+
+    Args:
+        replay: Loaded replay
+        game_factory: Callable returning a GameInterface, used as the fallback
+        config_path: Optional games config file registering extra games
+
+    Returns:
+        GameInterface to replay through
+
+    Raises:
+        ReplayError: If the game cannot be found, or the registered game now
+            has a different name than the one recorded, e.g. other settings
+    """
+    from game_registry import GameRegistry, game_key
+    registry = _registries.get(config_path)
+    if registry is None:
+        registry = _registries[config_path] = GameRegistry.default(config_path)
+    key = replay.game_key
+    if key not in registry and game_factory is None:
+        key = game_key(replay.game_name)
+    if key in registry:
+        game_logic = registry.get(key)
+        if game_logic.get_game_name() != replay.game_name:
+            raise ReplayError(f"Game {key!r} is now {game_logic.get_game_name()!r}, "
+                              f"but the replay was recorded with {replay.game_name!r}")
+        return game_logic
+    if game_factory is None:
+        raise ReplayError(f"No registered game for replay of {replay.game_name!r} "
+                          f"(key {replay.game_key!r})")
+    return game_factory()
+
+
+def _replay_file(args: Tuple[str, Optional[Callable[[], GameInterface]], Optional[str], int]
+                 ) -> Dict[str, Any]:
+    """Replay one file in a worker process."""
+    path, game_factory, config_path, snapshot_interval = args
+    try:
+        replay = load_replay(path)
+        engine = ReplayEngine(resolve_game(replay, game_factory, config_path), replay,
+                              snapshot_interval)
+        _, result = engine.run()
+        return {
+            'path': path,
+            'moves': len(replay.moves),
+            'result': result,
+            'matches': result == replay.result,
+            'error': None,
+        }
+    except Exception as e:
+        return {'path': path, 'moves': 0, 'result': None, 'matches': False, 'error': str(e)}
+
+
+def batch_replay(paths: List[str], game_factory: Optional[Callable[[], GameInterface]] = None,
+                 processes: Optional[int] = None, chunksize: int = 64,
+                 snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+                 config_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Replay many files across a process pool.
+
+    Each file is replayed through the game it recorded (see resolve_game).
+
+    Args:
+        paths: Replay file paths
+        game_factory: Picklable callable returning a GameInterface, e.g. the
+            class, for replays that do not record a registered game
+        processes: Number of worker processes (defaults to the CPU count)
+        chunksize: Number of files handed to a worker at a time
+        snapshot_interval: Number of moves between kept state snapshots
+        config_path: Optional games config file registering extra games
+
+    Returns:
+        One dictionary per path, in order, with 'path', 'moves', 'result',
+        'matches' (replayed result equals the recorded one) and 'error'
+    """
+    from multiprocessing import Pool
+    work = [(path, game_factory, config_path, snapshot_interval) for path in paths]
+    with Pool(processes) as pool:
+        return pool.map(_replay_file, work, chunksize=chunksize)
+
+
+def main():
+    """Verify replay files from the command line."""
+    import argparse
+    import glob
+    import importlib
+
+    parser = argparse.ArgumentParser(description='Replay recorded games')
+    parser.add_argument('paths', nargs='+', help='Replay files or directories')
+    parser.add_argument('--game', default=None,
+                        help='GameInterface class as module:Class for replays that do not '
+                             'record a registered game')
+    parser.add_argument('--games-config', default=None, help='JSON file registering extra games')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes')
+
+    args = parser.parse_args()
+
+    game_class = None
+    if args.game:
+        module_name, class_name = args.game.split(':')
+        game_class = getattr(importlib.import_module(module_name), class_name)
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, f"*{REPLAY_EXTENSION}"))))
+        else:
+            paths.append(path)
+
+    results = batch_replay(paths, game_class, processes=args.processes,
+                           config_path=args.games_config)
+    mismatches = [r for r in results if not r['matches']]
+    for r in mismatches:
+        print(f"{r['path']}: {r['error'] or 'result differs from recording'}")
+    print(f"Replayed {len(results)} games, {len(mismatches)} mismatched")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
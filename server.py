@@ -2,37 +2,147 @@
 Game server that works with any game logic implementing GameInterface.
 Uses the protocol module for structured communication.
 """
+import itertools
+import os
+import secrets
 import socket
 import threading
+import time
 import sys
-from typing import List, Tuple, Optional, Dict
-from protocol import Protocol, MessageType
+from typing import List, Tuple, Optional, Dict, Any, TYPE_CHECKING
+from protocol import Protocol, MessageType, COMPRESSION_METHODS
+from messages import ConnectedMessage, ErrorMessage, ServerMessage
 from game_interface import GameInterface
+from game_registry import GameRegistry, DEFAULT_GAME
+from session import GameSession
+from session_store import (SessionTable, SessionSnapshot, DEFAULT_MEMORY_BUDGET,
+                           DEFAULT_IDLE_TTL, DEFAULT_EXPIRE_AFTER)
+from transport import (Transport, TCPTransport, UnixTransport, QueueTransport,
+                       listen_unix, wait_readable)
+from profiling import Profiler, TRACE_FORMATS, FORMAT_COLLAPSED
+from events import EventBus, NDJSONSink
+
+if TYPE_CHECKING:
+    import ssl
+    from ratings import RatingService
+
+# Optional subsystems (TLS, ratings, analytics, the admin API) are imported
+# when they are enabled, so embedding the server or forking workers from it
+# does not pay for them
+
+# Seconds to wait for a client's CONNECT handshake before using defaults
+HANDSHAKE_TIMEOUT = 2.0
+
+# Seconds between checks for finished sessions while draining
+DRAIN_POLL_INTERVAL = 0.5
+
+# Sent to players that connect or wait in a lobby while the server drains
+DRAINING_MESSAGE = "The server is restarting. Please reconnect shortly."
+
+# Options a client may negotiate in its CONNECT message
+DEFAULT_CLIENT_OPTIONS = {
+    # Include the server-rendered board in state messages
+    'board_display': True,
+    # Frame compression method, or None for uncompressed frames
+    'compression': None,
+    # Registry key of the game to play, or None for the server's default
+    'game': None,
+    # Client applies its own moves locally, so MOVE_ACCEPTED carries no state
+    'predict': False,
+    # State messages carry the changes since the client's last state
+    'deltas': False,
+    # Player name games are rated under, or None to play unrated
+    'name': None,
+    # Secret a named player presents to return to a suspended session; the
+    # server issues one in CONNECTED when it keeps sessions
+    'resume_token': None,
+}
+
+# Events the analytics export may fall behind by before dropping any
+ANALYTICS_BUFFER_CAPACITY = 100000
+
+# Longest accepted player name
+MAX_NAME_LENGTH = 32
+
+# Random bytes in each resume token
+RESUME_TOKEN_BYTES = 16
 
 
 class GameServer:
-    """Server that manages game sessions with multiple players."""
+    """Server that matches players into game sessions for any registered game."""
     
     def __init__(self, host: str = 'localhost', port: int = 8000, 
-                 game_logic: GameInterface = None):
+                 game_logic: GameInterface = None, allow_compression: bool = True,
+                 replay_dir: Optional[str] = None, registry: Optional[GameRegistry] = None,
+                 default_game: Optional[str] = None, unix_path: Optional[str] = None,
+                 tls_context: Optional['ssl.SSLContext'] = None,
+                 profiler: Optional[Profiler] = None,
+                 ratings: Optional['RatingService'] = None,
+                 events: Optional[EventBus] = None,
+                 session_table: Optional[SessionTable] = None):
         """
         Initialize the game server.
         
         Args:
             host: Host address to bind to
             port: Port number to listen on
-            game_logic: GameInterface implementation to use
+            game_logic: GameInterface instance to register and use as the default game
+            allow_compression: Accept clients asking for compressed frames
+            replay_dir: Directory to record session replays to, or None
+            registry: Registry of available games; GameRegistry.default() if omitted
+            default_game: Key of the game for clients that do not ask for one
+            unix_path: Listen on this Unix-domain socket path instead of host and port
+            tls_context: Server SSLContext (see tls.server_context) to require TLS
+                on TCP connections
+            profiler: Profiler sampling sessions to trace; profiling is off if omitted
+            ratings: Service rating finished games between named players, or None
+            events: Bus sessions publish lifecycle events to; a new one if omitted
+            session_table: Table keeping the sessions of named players who
+                dropped, so they can reconnect and resume; games end on a
+                disconnect if omitted
         """
-        if game_logic is None:
-            from game_logic import TicTacToeGame
-            game_logic = TicTacToeGame()
+        if unix_path and tls_context is not None:
+            raise ValueError("TLS is only supported on TCP listeners")
+        self.registry = registry if registry is not None else GameRegistry.default()
+        if game_logic is not None:
+            key = self.registry.register_instance(game_logic)
+            default_game = default_game or key
         
         self.host = host
         self.port = port
-        self.game_logic = game_logic
+        self.unix_path = unix_path
+        self.tls_context = tls_context
+        self.default_game = default_game or DEFAULT_GAME
         self.server_socket = None
         self.running = False
         self.logging = True
+        self.allow_compression = allow_compression
+        self.replay_dir = replay_dir
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.ratings = ratings
+        self.events = events if events is not None else EventBus()
+        self.session_table = session_table
+        self.client_options: Dict[Transport, Dict[str, Any]] = {}
+        
+        # Players waiting for a game, per game key
+        self.lobbies: Dict[str, List[Tuple[Transport, str]]] = {}
+        self._lobby_lock = threading.Lock()
+        
+        # Sessions currently being played, by session ID
+        self.sessions: Dict[int, GameSession] = {}
+        # Suspended sessions keep their IDs, so new ones start after theirs
+        self._session_ids = itertools.count(
+            (session_table.last_session_id if session_table else 0) + 1)
+        
+        # Draining servers accept no players and stop once their sessions end
+        self.draining = False
+        self._drain_deadline: Optional[float] = None
+        
+        # Counters for the admin API
+        self.started_at: Optional[float] = None
+        self.connections_accepted = 0
+        self.sessions_started = 0
+        self.sessions_finished = 0
         
     def log(self, message: str):
         """Log a message if logging is enabled."""
@@ -41,24 +151,26 @@ class GameServer:
     
     def start(self):
         """Start the server and wait for connections."""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        
         try:
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            if self.unix_path:
+                self.server_socket = listen_unix(self.unix_path)
+                self.log(f"Server started on unix:{self.unix_path}")
+            else:
+                self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self.server_socket.bind((self.host, self.port))
+                self.server_socket.listen(128)
+                self.log(f"Server started on {self.host}:{self.port}")
             self.running = True
-            self.log(f"Server started on {self.host}:{self.port}")
+            self.started_at = time.time()
+            self.log(f"Games: {', '.join(self.registry.keys())} (default: {self.default_game})")
             self.log(f"Waiting for players to connect...")
-            self.log(f"Game: {self.game_logic.get_game_name()}")
-            self.log(f"Players required: {self.game_logic.get_min_players()}-{self.game_logic.get_max_players()}")
             
-            # Start server control thread
-            control_thread = threading.Thread(target=self._handle_server_commands, daemon=True)
-            control_thread.start()
-            
-            # Wait for players and start game
-            self._wait_for_players_and_start_game()
+            # Accept players and start games as lobbies fill up
+            self._accept_connections()
+            if self.draining:
+                self._close_listener()
+                self._wait_for_sessions()
             
         except Exception as e:
             self.log(f"Error starting server: {e}")
@@ -69,254 +181,420 @@ class GameServer:
     def stop(self):
         """Stop the server and close connections."""
         self.running = False
+        self._close_listener()
+        with self._lobby_lock:
+            waiting = [player for lobby in self.lobbies.values() for player in lobby]
+            self.lobbies.clear()
+        for connection, _ in waiting:
+            connection.close()
+        self.log("Server stopped")
+    
+    def _close_listener(self):
+        """Stop listening, so new connections are refused."""
         if self.server_socket:
             try:
                 self.server_socket.close()
             except:
                 pass
-        self.log("Server stopped")
-    
-    def _handle_server_commands(self):
-        """Handle server control commands in a separate thread."""
-        while self.running:
-            try:
-                cmd = input()
-                if cmd.lower() == 'exit':
-                    self.log("Shutting down server...")
-                    self.running = False
-                    if self.server_socket:
-                        self.server_socket.close()
-                    break
-            except (EOFError, KeyboardInterrupt):
-                break
+            if self.unix_path and os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            self.server_socket = None
     
-    def _wait_for_players_and_start_game(self):
-        """Wait for required number of players and start a game session."""
-        min_players = self.game_logic.get_min_players()
-        max_players = self.game_logic.get_max_players()
+    def drain(self, timeout: Optional[float] = None):
+        """
+        Stop accepting players and shut down once the running sessions end.
         
-        players: List[Tuple[socket.socket, str]] = []
+        Players waiting in a lobby are told to reconnect later and dropped;
+        games in progress are played to the end.
+        
+        Args:
+            timeout: Seconds to wait for sessions before stopping them anyway,
+                or None to wait as long as they take
+        """
+        with self._lobby_lock:
+            if self.draining:
+                return
+            self.draining = True
+            self._drain_deadline = None if timeout is None else time.monotonic() + timeout
+            waiting = [player for lobby in self.lobbies.values() for player in lobby]
+            self.lobbies.clear()
+        self.log(f"Draining: waiting for {len(self.sessions)} sessions to finish")
+        for connection, _ in waiting:
+            self.client_options.pop(connection, None)
+            connection.send(ErrorMessage(error=DRAINING_MESSAGE))
+            connection.close()
+    
+    def _wait_for_sessions(self):
+        """Wait for the running sessions to end while draining."""
+        while self.running and self.sessions:
+            if self._drain_deadline is not None and time.monotonic() >= self._drain_deadline:
+                self._drain_deadline = None
+                for session in list(self.sessions.values()):
+                    session.stop("The server is restarting. This game has been stopped.")
+            time.sleep(DRAIN_POLL_INTERVAL)
+        self.log("Drained all sessions")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Collect live server statistics.
         
-        self.log(f"Waiting for {min_players} to {max_players} players...")
+        Returns:
+            Dictionary of counters, lobby sizes and settings
+        """
+        with self._lobby_lock:
+            lobbies = {key: len(lobby) for key, lobby in self.lobbies.items() if lobby}
+        return {
+            'running': self.running,
+            'draining': self.draining,
+            'uptime': time.time() - self.started_at if self.started_at else 0.0,
+            'connections_accepted': self.connections_accepted,
+            'clients': len(self.client_options),
+            'lobbies': lobbies,
+            'sessions_active': len(self.sessions),
+            'sessions_started': self.sessions_started,
+            'sessions_finished': self.sessions_finished,
+            'sessions_memory': sum(session.memory_usage()['total']
+                                   for session in list(self.sessions.values())),
+            'suspended_sessions': self.session_table.stats() if self.session_table else None,
+            'logging': self.logging,
+            'profile_rate': self.profiler.sample_rate,
+            'sessions_profiled': self.profiler.sessions_profiled,
+            'games_rated': self.ratings.games_rated if self.ratings else 0,
+            'ratings_pending': self.ratings.pending_writes if self.ratings else 0,
+            'events': self.events.stats(),
+        }
+    
+    def broadcast(self, text: str, session_ids: Optional[List[int]] = None) -> int:
+        """
+        Send a SERVER_MESSAGE to connected players.
         
-        # Accept players
-        while len(players) < max_players and self.running:
+        Args:
+            text: Message to show to the players
+            session_ids: Only message the players of these sessions; every
+                player, including those waiting in lobbies, if None
+            
+        Returns:
+            Number of players the message was sent to
+        """
+        sent = 0
+        if session_ids is None:
+            message = ServerMessage(message=text)
+            with self._lobby_lock:
+                for lobby in self.lobbies.values():
+                    sent += sum(1 for connection, _ in lobby if connection.send(message))
+        for session in list(self.sessions.values()):
+            if session_ids is None or session.session_id in session_ids:
+                sent += session.notify(text)
+        return sent
+    
+    def _accept_connections(self):
+        """Accept connections until the server stops or starts draining."""
+        self.server_socket.settimeout(1.0)  # Check for shutdown every second
+        while self.running and not self.draining:
             try:
-                self.server_socket.settimeout(1.0)  # Check for shutdown every second
                 client_socket, address = self.server_socket.accept()
-                self.log(f"Player {len(players) + 1} connected from {address}")
-                
-                # Send connection confirmation
-                Protocol.send_message(client_socket, MessageType.CONNECTED, {
-                    'player_id': len(players),
-                    'game_name': self.game_logic.get_game_name(),
-                    'min_players': min_players,
-                    'max_players': max_players,
-                    'current_players': len(players) + 1
-                })
-                
-                players.append((client_socket, address))
-                
-                # Start game when we have minimum players
-                if len(players) >= min_players:
-                    self.log(f"Starting game with {len(players)} players")
-                    self._run_game_session(players)
-                    break
-                    
             except socket.timeout:
                 continue
             except Exception as e:
-                self.log(f"Error accepting connection: {e}")
+                if self.running:
+                    self.log(f"Error accepting connection: {e}")
                 break
+            
+            # Handshakes may wait for slow clients, so keep them off the accept loop
+            threading.Thread(target=self._handle_accepted,
+                             args=(client_socket, address or self.unix_path),
+                             daemon=True).start()
     
-    def _run_game_session(self, players: List[Tuple[socket.socket, str]]):
-        """Run a game session with the connected players."""
-        try:
-            # Initialize game
-            game_state = self.game_logic.initialize_game(len(players))
+    def _handle_accepted(self, client_socket: socket.socket, address: str):
+        """Wrap an accepted socket in its transport and negotiate with the client."""
+        if self.tls_context is not None:
+            from tls import TLSTransport
+            try:
+                connection = TLSTransport.accept(client_socket, self.tls_context, HANDSHAKE_TIMEOUT)
+            except OSError as e:  # Including ssl.SSLError
+                self.log(f"TLS handshake with {address} failed: {e}")
+                client_socket.close()
+                return
+        elif self.unix_path:
+            connection = UnixTransport(client_socket)
+        else:
+            connection = TCPTransport(client_socket)
+        self._handle_new_connection(connection, address)
+    
+    def connect_local(self, serialize: bool = False) -> QueueTransport:
+        """
+        Connect an in-process player, such as a bot, without a socket.
+        
+        The player joins a lobby like any other client after sending CONNECT
+        through the returned transport.
+        
+        Args:
+            serialize: Pass messages as JSON strings instead of objects
             
-            # Send game start message to all players
-            for idx, (client_socket, _) in enumerate(players):
-                player_state = self.game_logic.get_game_state_for_player(game_state, idx)
-                Protocol.send_message(client_socket, MessageType.GAME_START, {
-                    'player_id': idx,
-                    'game_name': self.game_logic.get_game_name(),
-                    'initial_state': player_state,
-                    'help': self.game_logic.get_move_help()
-                })
+        Returns:
+            Client end of the in-process connection
+        """
+        server_end, client_end = QueueTransport.pair(serialize)
+        threading.Thread(target=self._handle_new_connection,
+                         args=(server_end, 'local'), daemon=True).start()
+        return client_end
+    
+    def _handle_new_connection(self, connection: Transport, address: str):
+        """Negotiate options with a new client and put it in its game's lobby."""
+        self.connections_accepted += 1
+        options = self._perform_handshake(connection)
+        key = options['game']
+        
+        try:
+            game_logic = self.registry.get(key)
+        except KeyError:
+            connection.send(ErrorMessage(
+                error=f"Unknown game '{key}'. Available: {', '.join(self.registry.keys())}"))
+            connection.close()
+            return
+        except Exception as e:
+            self.log(f"Could not load game '{key}': {e}")
+            connection.send(ErrorMessage(error=f"Game '{key}' is unavailable"))
+            connection.close()
+            return
+        
+        self.client_options[connection] = options
+        min_players = game_logic.get_min_players()
+        max_players = game_logic.get_max_players()
+        
+        with self._lobby_lock:
+            if self.draining:
+                self.client_options.pop(connection, None)
+                connection.send(ErrorMessage(error=DRAINING_MESSAGE))
+                connection.close()
+                return
+            if self.session_table and options['name']:
+                try:
+                    rejoined = self.session_table.rejoin(key, options['name'],
+                                                         options['resume_token'],
+                                                         connection, address)
+                except PermissionError:
+                    self.log(f"Refused {address}: wrong resume token for {options['name']}")
+                    self.client_options.pop(connection, None)
+                    connection.send(ErrorMessage(
+                        error=f"'{options['name']}' has a suspended game; reconnect with "
+                              f"its resume token to return to it"))
+                    connection.close()
+                    return
+                if rejoined is not None:
+                    self._resume_player(connection, address, game_logic, options, *rejoined)
+                    return
+                options['resume_token'] = secrets.token_urlsafe(RESUME_TOKEN_BYTES)
+            else:
+                options['resume_token'] = None
+            lobby = self.lobbies.setdefault(key, [])
+            player_id = len(lobby)
+            self.log(f"Player {player_id + 1} connected from {address} for {key}")
             
-            self.log("Game started!")
-            self.log(self.game_logic.format_state_for_display(game_state))
+            # Send connection confirmation
+            connection.send(ConnectedMessage(
+                player_id=player_id,
+                game_name=game_logic.get_game_name(),
+                min_players=min_players,
+                max_players=max_players,
+                current_players=player_id + 1,
+                options=options
+            ))
+            if options['compression']:
+                connection.enable_compression()
             
-            # Game loop
-            while self.running:
-                # Check if game is over
-                game_result = self.game_logic.check_game_over(game_state)
-                if game_result:
-                    self._handle_game_end(players, game_result)
-                    break
-                
-                # Get current player
-                current_player_id = self.game_logic.get_current_player(game_state)
-                current_player_socket, _ = players[current_player_id]
-                
-                # Notify current player it's their turn
-                player_state = self.game_logic.get_game_state_for_player(
-                    game_state, current_player_id
-                )
-                Protocol.send_message(current_player_socket, MessageType.YOUR_TURN, {
-                    'game_state': player_state,
-                    'board_display': self.game_logic.format_state_for_display(game_state)
-                })
-                
-                # Notify other players
-                for idx, (client_socket, _) in enumerate(players):
-                    if idx != current_player_id:
-                        player_state = self.game_logic.get_game_state_for_player(
-                            game_state, idx
-                        )
-                        Protocol.send_message(client_socket, MessageType.GAME_STATE, {
-                            'game_state': player_state,
-                            'board_display': self.game_logic.format_state_for_display(game_state),
-                            'current_player': current_player_id
-                        })
-                
-                # Wait for move from current player
-                move_received = False
-                while not move_received and self.running:
-                    message = Protocol.receive_message(current_player_socket)
-                    if message is None:
-                        self.log(f"Player {current_player_id + 1} disconnected")
-                        self._handle_player_disconnect(players, current_player_id)
-                        return
-                    
-                    msg_type = Protocol.get_message_type(message)
-                    
-                    if msg_type == MessageType.MOVE:
-                        move = message.get('data', {}).get('move')
-                        if move is None:
-                            Protocol.send_message(current_player_socket, 
-                                                MessageType.MOVE_REJECTED,
-                                                error="No move provided")
-                            continue
-                        
-                        # Validate move
-                        is_valid, error_msg = self.game_logic.validate_move(
-                            game_state, current_player_id, move
-                        )
-                        
-                        if is_valid:
-                            # Apply move
-                            game_state = self.game_logic.apply_move(
-                                game_state, current_player_id, move
-                            )
-                            
-                            self.log(f"Player {current_player_id + 1} played: {move}")
-                            self.log(self.game_logic.format_state_for_display(game_state))
-                            
-                            # Send acceptance to player
-                            player_state = self.game_logic.get_game_state_for_player(
-                                game_state, current_player_id
-                            )
-                            Protocol.send_message(current_player_socket, 
-                                                MessageType.MOVE_ACCEPTED, {
-                                'game_state': player_state,
-                                'board_display': self.game_logic.format_state_for_display(game_state)
-                            })
-                            
-                            # Update all players with new state
-                            for idx, (client_socket, _) in enumerate(players):
-                                if idx != current_player_id:
-                                    player_state = self.game_logic.get_game_state_for_player(
-                                        game_state, idx
-                                    )
-                                    Protocol.send_message(client_socket, 
-                                                        MessageType.GAME_STATE, {
-                                        'game_state': player_state,
-                                        'board_display': self.game_logic.format_state_for_display(game_state)
-                                    })
-                            
-                            move_received = True
-                        else:
-                            # Send rejection
-                            Protocol.send_message(current_player_socket, 
-                                                MessageType.MOVE_REJECTED,
-                                                error=error_msg or "Invalid move")
-                    
-                    elif msg_type == MessageType.DISCONNECT:
-                        self.log(f"Player {current_player_id + 1} disconnected")
-                        self._handle_player_disconnect(players, current_player_id)
-                        return
-                    
-                    else:
-                        Protocol.send_message(current_player_socket, 
-                                            MessageType.ERROR,
-                                            error="Unexpected message type")
+            lobby.append((connection, address))
             
-        except Exception as e:
-            self.log(f"Error in game session: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            # Close all connections
-            for client_socket, _ in players:
-                try:
-                    client_socket.close()
-                except:
-                    pass
+            # Start game when we have minimum players
+            if len(lobby) < min_players:
+                return
+            players = lobby
+            self.lobbies[key] = []
+        
+        self.log(f"Starting {key} with {len(players)} players")
+        threading.Thread(target=self._run_game_session, args=(game_logic, players, key),
+                         daemon=True).start()
     
-    def _handle_game_end(self, players: List[Tuple[socket.socket, str]], 
-                        game_result: Dict):
-        """Handle game end and notify all players."""
-        self.log(game_result['message'])
+    def _resume_player(self, connection: Transport, address: str, game_logic: GameInterface,
+                       options: Dict[str, Any], snapshot: SessionSnapshot, player_id: int,
+                       players: Optional[List[Tuple[Transport, str]]]):
+        """Confirm a returning player's connection and resume their session once all are back."""
+        self.log(f"Player {player_id + 1} returned from {address} "
+                 f"to session {snapshot.session_id}")
+        connection.send(ConnectedMessage(
+            player_id=player_id,
+            game_name=game_logic.get_game_name(),
+            min_players=game_logic.get_min_players(),
+            max_players=game_logic.get_max_players(),
+            current_players=len(snapshot.returned),
+            options=options
+        ))
+        if options['compression']:
+            connection.enable_compression()
+        if players is None:
+            return
+        self.log(f"Resuming session {snapshot.session_id}")
+        threading.Thread(target=self._run_game_session,
+                         args=(game_logic, players, snapshot.game_key, snapshot),
+                         daemon=True).start()
+    
+    def _perform_handshake(self, connection: Transport) -> Dict[str, Any]:
+        """
+        Read the client's CONNECT message and negotiate connection options.
         
-        for idx, (client_socket, _) in enumerate(players):
-            result_data = {
-                'winner': game_result.get('winner'),
-                'draw': game_result.get('draw', False),
-                'message': game_result['message']
-            }
-            
-            if game_result.get('draw'):
-                result_data['won'] = False
-            else:
-                result_data['won'] = (game_result.get('winner') == idx)
+        Clients that do not send CONNECT within HANDSHAKE_TIMEOUT get the
+        default options.
+        
+        Args:
+            connection: Newly accepted client connection
             
-            Protocol.send_message(client_socket, MessageType.GAME_END, result_data)
-    
-    def _handle_player_disconnect(self, players: List[Tuple[socket.socket, str]], 
-                                 disconnected_player_id: int):
-        """Handle a player disconnecting."""
-        # Notify remaining players
-        for idx, (client_socket, _) in enumerate(players):
-            if idx != disconnected_player_id:
-                try:
-                    Protocol.send_message(client_socket, MessageType.ERROR,
-                                        error=f"Player {disconnected_player_id + 1} disconnected. Game ended.")
-                except:
-                    pass
+        Returns:
+            Dictionary of negotiated options
+        """
+        options = dict(DEFAULT_CLIENT_OPTIONS)
+        options['game'] = self.default_game
+        if not wait_readable([connection], HANDSHAKE_TIMEOUT):
+            return options
         
-        # Close all connections
-        for client_socket, _ in players:
-            try:
-                client_socket.close()
-            except:
-                pass
+        message = connection.receive()
+        if message is None or Protocol.get_message_type(message) != MessageType.CONNECT:
+            return options
+        
+        requested = message.options or {}
+        if 'board_display' in requested:
+            options['board_display'] = bool(requested['board_display'])
+        if self.allow_compression and requested.get('compression') in COMPRESSION_METHODS:
+            options['compression'] = requested['compression']
+        if 'predict' in requested:
+            options['predict'] = bool(requested['predict'])
+        if 'deltas' in requested:
+            options['deltas'] = bool(requested['deltas'])
+        if isinstance(requested.get('game'), str):
+            options['game'] = requested['game']
+        if isinstance(requested.get('name'), str):
+            options['name'] = requested['name'].strip()[:MAX_NAME_LENGTH] or None
+        if isinstance(requested.get('resume_token'), str):
+            options['resume_token'] = requested['resume_token']
+        return options
+    
+    def get_client_option(self, connection: Transport, key: str) -> Any:
+        """Get an option negotiated by a client, or its default."""
+        return self.client_options.get(connection, DEFAULT_CLIENT_OPTIONS)[key]
+    
+    def _run_game_session(self, game_logic: GameInterface,
+                          players: List[Tuple[Transport, str]], game_key: Optional[str] = None,
+                          snapshot: Optional[SessionSnapshot] = None):
+        """Run a game session with the connected players, or resume a suspended one."""
+        session_id = snapshot.session_id if snapshot else next(self._session_ids)
+        session = GameSession(self, game_logic, players, session_id, game_key, snapshot)
+        self.sessions[session.session_id] = session
+        self.sessions_started += 1
+        try:
+            session.run()
+        finally:
+            self.sessions.pop(session.session_id, None)
+            self.sessions_finished += 1
 
 
 def main():
     """Main entry point for the server."""
-    # You can change the game logic here
-    from game_logic import TicTacToeGame
-    game = TicTacToeGame()
+    import argparse
+    from admin import (AdminServer, ADMIN_TOKEN_ENV, DEFAULT_ADMIN_HOST, DEFAULT_ADMIN_PORT,
+                       DEFAULT_ADMIN_TOKEN_PATH, load_admin_token)
+    
+    parser = argparse.ArgumentParser(description='Run the game server')
+    parser.add_argument('--host', default='localhost', help='Host address to bind to')
+    parser.add_argument('--port', type=int, default=8000, help='Port number to listen on')
+    parser.add_argument('--unix', metavar='PATH', default=None,
+                        help='Listen on a Unix-domain socket instead of TCP')
+    parser.add_argument('--game', default=DEFAULT_GAME,
+                        help='Game for clients that do not ask for one')
+    parser.add_argument('--games-config', default=None,
+                        help='JSON file registering extra games as {"games": {key: "module:Class"}}')
+    parser.add_argument('--replay-dir', default=None, help='Directory to record replays to')
+    parser.add_argument('--tls-cert', default=None, help='PEM certificate chain; enables TLS')
+    parser.add_argument('--tls-key', default=None, help='PEM private key, if not in the certificate file')
+    parser.add_argument('--tls-ciphers', default=None, help='OpenSSL cipher string for TLS 1.2')
+    parser.add_argument('--profile-rate', type=float, default=0.0,
+                        help='Fraction of sessions to profile, from 0 to 1')
+    parser.add_argument('--profile-dir', default='profiles',
+                        help='Directory profiled sessions are written to')
+    parser.add_argument('--profile-format', choices=TRACE_FORMATS, default=FORMAT_COLLAPSED,
+                        help='Trace format: collapsed stacks or Chrome trace events')
+    parser.add_argument('--ratings-db', default=None,
+                        help='SQLite database to keep player ratings in; enables ratings. '
+                             'Names are not authenticated, so anyone can play under any '
+                             'name and change its rating')
+    parser.add_argument('--events-file', default=None,
+                        help='Append session events to this newline-delimited JSON file')
+    parser.add_argument('--analytics-dir', default=None,
+                        help='Export completed games and moves as column files to this directory')
+    parser.add_argument('--session-dir', default=None,
+                        help='Let named players resume games they dropped out of, keeping '
+                             'snapshots of suspended games in this directory')
+    parser.add_argument('--session-memory', type=float,
+                        default=DEFAULT_MEMORY_BUDGET / (1024 * 1024),
+                        help='Megabytes of suspended games kept in memory before going to disk')
+    parser.add_argument('--session-idle-ttl', type=float, default=DEFAULT_IDLE_TTL,
+                        help='Seconds a suspended game stays in memory before going to disk')
+    parser.add_argument('--session-expiry', type=float, default=DEFAULT_EXPIRE_AFTER,
+                        help='Seconds before a suspended game nobody returned to is discarded')
+    parser.add_argument('--admin-host', default=DEFAULT_ADMIN_HOST,
+                        help='Address of the admin API (keep it on loopback)')
+    parser.add_argument('--admin-port', type=int, default=DEFAULT_ADMIN_PORT,
+                        help='Port of the admin API')
+    parser.add_argument('--admin-token-file', default=DEFAULT_ADMIN_TOKEN_PATH,
+                        help=f'File holding the admin API token, created if missing '
+                             f'({ADMIN_TOKEN_ENV} overrides it)')
+    parser.add_argument('--no-admin', action='store_true', help='Do not start the admin API')
+    
+    args = parser.parse_args()
+    
+    tls_context = None
+    if args.tls_cert:
+        from tls import server_context
+        tls_context = server_context(args.tls_cert, args.tls_key, args.tls_ciphers)
     
-    server = GameServer(host='localhost', port=8000, game_logic=game)
+    registry = GameRegistry.default(args.games_config)
+    ratings = None
+    if args.ratings_db:
+        from ratings import RatingService
+        ratings = RatingService(args.ratings_db)
+    events = EventBus()
+    session_table = None
+    if args.session_dir:
+        session_table = SessionTable(args.session_dir, int(args.session_memory * 1024 * 1024),
+                                     args.session_idle_ttl, args.session_expiry, events=events)
+    server = GameServer(host=args.host, port=args.port, registry=registry,
+                        default_game=args.game, replay_dir=args.replay_dir, unix_path=args.unix,
+                        tls_context=tls_context,
+                        profiler=Profiler(args.profile_rate, args.profile_dir, args.profile_format),
+                        ratings=ratings, events=events, session_table=session_table)
+    if args.events_file:
+        server.events.subscribe('events-file', NDJSONSink(args.events_file))
+    if args.analytics_dir:
+        from analytics import AnalyticsWriter
+        server.events.subscribe('analytics', AnalyticsWriter(args.analytics_dir),
+                                capacity=ANALYTICS_BUFFER_CAPACITY)
+    admin = None
+    if not args.no_admin:
+        admin = AdminServer(server, args.admin_host, args.admin_port,
+                            load_admin_token(args.admin_token_file, create=True))
+        admin.start()
     try:
         server.start()
     except KeyboardInterrupt:
         server.log("\nServer interrupted by user")
         server.stop()
         sys.exit(0)
+    finally:
+        if admin:
+            admin.stop()
+        if server.session_table:
+            server.session_table.close()
+        server.events.close()
+        if server.ratings:
+            server.ratings.close()
 
 
 if __name__ == "__main__":
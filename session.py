@@ -0,0 +1,618 @@
+"""
+Game session management for the server.
+A GameSession runs one game between connected players until it ends.
+"""
+import time
+from typing import List, Tuple, Dict, Any, Optional, Type, TYPE_CHECKING
+from protocol import MessageType
+from game_interface import GameInterface, TURN_SEQUENTIAL, TURN_REALTIME
+from messages import (Message, GameStartMessage, GameStateMessage, GameEndMessage,
+                      YourTurnMessage, MoveAcceptedMessage, MoveRejectedMessage,
+                      ErrorMessage, GenericMessage, ServerMessage)
+from dispatch import MessageDispatcher
+from state_cache import RenderCache, ViewCache
+from replay import Replay, ReplayRecorder
+from history import GameHistory
+from transport import Transport, wait_readable
+from events import (GAME_STARTED, MOVE_PLAYED, ROUND_PLAYED, GAME_ENDED, PLAYER_DISCONNECTED,
+                    SESSION_STOPPED, SESSION_SUSPENDED, SESSION_RESUMED)
+from profiling import ProfiledGame, ProfiledTransport
+from session_store import SessionSnapshot, estimate_size
+
+if TYPE_CHECKING:
+    from server import GameServer
+
+
+# Results returned by message handlers while waiting for a move
+KEEP_WAITING = 0
+TURN_COMPLETE = 1
+SESSION_ENDED = 2
+
+
+class GameSession:
+    """A single game played by a fixed set of connected players."""
+
+    def __init__(self, server: 'GameServer', game_logic: GameInterface,
+                 players: List[Tuple[Transport, str]], session_id: int = 0,
+                 game_key: Optional[str] = None, snapshot: Optional[SessionSnapshot] = None):
+        """
+        Initialize the game session.
+
+        Args:
+            server: Server hosting this session
+            game_logic: GameInterface implementation of the game being played
+            players: List of (transport, address) tuples, indexed by player ID
+            session_id: Server-assigned ID used in logs
+            game_key: Registry key of the game, used to rate the result
+            snapshot: State of a suspended session to resume instead of
+                starting a new game
+        """
+        self.server = server
+        self.game_logic = game_logic
+        self.players = players
+        self.session_id = session_id
+        self.game_name = game_logic.get_game_name()
+        self.game_key = game_key or self.game_name
+        self.snapshot = snapshot
+        self.started = snapshot.started if snapshot else time.time()
+        self.stopped = False
+        self.suspended = False
+        self.moves_played = snapshot.moves_played if snapshot else 0
+        # Unwrapped transports, for messages sent from other threads
+        self.connections = [connection for connection, _ in players]
+
+        # Sampled sessions time game calls and messaging; others run uninstrumented
+        self.profile = server.profiler.start_session(session_id)
+        if self.profile.enabled:
+            self.game_logic = ProfiledGame(game_logic, self.profile)
+            self.players = [(ProfiledTransport(connection, self.profile), address)
+                            for connection, address in players]
+        self.game_state: Dict[str, Any] = {}
+        self.render_cache = RenderCache(self.game_logic)
+        self.view_cache = ViewCache(self.game_logic)
+        self.current_player_id = 0
+        self.recorder = ReplayRecorder(server.replay_dir) if server.replay_dir else None
+        # Position hashes for games drawn by repetition; a resumed game
+        # counts repetitions from the position it resumed at
+        self.history: Optional[GameHistory] = None
+        # Last state sent to each player, which its next delta is computed against
+        self._sent_views: Dict[int, Dict[str, Any]] = {}
+        # Players the last move concerns, or None for all of them
+        self._interested: Optional[set] = None
+
+        # Moves collected in the current simultaneous or real-time round
+        self._round_players = set()
+        self._round_moves: Dict[int, Any] = {}
+        # Seconds each player took to move in the current round
+        self._round_latencies: Dict[int, float] = {}
+
+        # When the current turn or round started, for move latencies
+        self._turn_started = 0.0
+        self._round_single_move = True
+
+        self.dispatcher = self._build_dispatcher(self._on_move)
+        self.round_dispatcher = self._build_dispatcher(self._on_round_move)
+
+    def _build_dispatcher(self, on_move) -> MessageDispatcher:
+        """Create the dispatcher used while waiting for moves."""
+        dispatcher = MessageDispatcher(self._on_unexpected_message)
+        dispatcher.register(MessageType.MOVE, on_move)
+        dispatcher.register(MessageType.DISCONNECT, self._on_disconnect)
+        dispatcher.register(MessageType.ERROR, self._on_invalid_message)
+        for msg_type, handler in self.game_logic.get_message_handlers().items():
+            dispatcher.register(msg_type, self._make_game_handler(msg_type, handler))
+        return dispatcher
+
+    def _set_state(self, game_state: Dict[str, Any]):
+        """Replace the game state and drop everything cached for the old one."""
+        self.game_state = game_state
+        self.render_cache.invalidate()
+        self.view_cache.invalidate()
+
+    def log(self, message: str):
+        """Log a message through the server."""
+        self.server.log(f"[session {self.session_id}] {message}")
+
+    @property
+    def active(self) -> bool:
+        """Whether the session should keep playing."""
+        return self.server.running and not self.stopped
+
+    def info(self) -> Dict[str, Any]:
+        """Summarize the session for the admin API."""
+        return {
+            'id': self.session_id,
+            'game': self.game_key,
+            'players': [str(address) for _, address in self.players],
+            'started': self.started,
+            'current_player': self.current_player_id,
+            'moves': self.moves_played,
+            'memory': self.memory_usage()['total'],
+            'profiled': self.profile.enabled,
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Estimate the memory held by the session's state.
+
+        Values shared between the parts, such as views that reuse the
+        state's lists, are counted once, in the first part holding them.
+        Socket buffers and the game logic, which sessions share, are not
+        counted.
+
+        Returns:
+            Bytes per part ('state', 'caches', 'history', 'rounds') and the 'total'
+        """
+        seen = set()
+        replay = self.recorder.replay if self.recorder else None
+        usage = {
+            'state': estimate_size(self.game_state, seen=seen),
+            'caches': estimate_size(*self.render_cache.cached(), *self.view_cache.cached(),
+                                    self._sent_views, seen=seen),
+            'history': estimate_size(replay.initial_state, replay.moves, seen=seen)
+            if replay else 0,
+            'rounds': estimate_size(self._round_moves, self._round_latencies,
+                                    self._round_players, seen=seen),
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def notify(self, text: str) -> int:
+        """
+        Send a SERVER_MESSAGE to every player; safe to call from any thread.
+
+        Args:
+            text: Message to show to the players
+
+        Returns:
+            Number of players the message was sent to
+        """
+        message = ServerMessage(message=text)
+        return sum(1 for connection in self.connections if connection.send(message))
+
+    def stop(self, reason: str):
+        """
+        End the session from another thread, telling the players why.
+
+        Args:
+            reason: Message sent to the players before they are disconnected
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        self.log(f"Stopping session: {reason}")
+        self.server.events.publish(SESSION_STOPPED, self.session_id, reason=reason)
+        self.notify(reason)
+        for connection in self.connections:
+            connection.shutdown()
+
+    def run(self):
+        """Run the game session with the connected players."""
+        players = self.players
+        try:
+            if self.snapshot:
+                self._set_state(self.snapshot.game_state)
+                if self.recorder and self.snapshot.replay:
+                    self.recorder.replay = Replay.from_dict(self.snapshot.replay)
+            else:
+                self._set_state(self.game_logic.initialize_game(len(players)))
+            if self.game_logic.get_repetition_limit() is not None:
+                self.history = GameHistory(self.game_logic, self.game_state,
+                                           in_place=False, max_undo=0)
+            if self.recorder and self.recorder.replay is None:
+                # A game resumed without its earlier moves is recorded from here on
+                self.recorder.start(self.game_logic.get_game_name(), len(players), self.game_state,
+                                    self.game_key)
+
+            # Send game start message to all players
+            for idx, (connection, _) in enumerate(players):
+                player_state = self.view_cache.get_view(self.game_state, idx)
+                connection.send(GameStartMessage(
+                    player_id=idx,
+                    game_name=self.game_logic.get_game_name(),
+                    initial_state=player_state,
+                    help=self.game_logic.get_move_help()
+                ))
+                self._sent_views[idx] = player_state
+
+            if self.snapshot:
+                self.log("Game resumed!")
+                self.server.events.publish(SESSION_RESUMED, self.session_id, game=self.game_key,
+                                           players=self._player_names(), moves=self.moves_played)
+                self.snapshot = None
+            else:
+                self.log("Game started!")
+                self.server.events.publish(GAME_STARTED, self.session_id, game=self.game_key,
+                                           players=self._player_names())
+            if self.server.logging:
+                self.log(self.render_cache.get_display(self.game_state))
+
+            # Game loop
+            if self.game_logic.get_turn_mode() == TURN_SEQUENTIAL:
+                self._play_sequential()
+            else:
+                self._play_rounds()
+
+        except Exception as e:
+            self.log(f"Error in game session: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            if self.recorder and not self.suspended:
+                # Aborted games are recorded without a result
+                self.recorder.finish(None)
+
+            # Close all connections
+            for connection, _ in players:
+                self.server.client_options.pop(connection, None)
+                try:
+                    connection.close()
+                except:
+                    pass
+
+            trace_path = self.server.profiler.finish_session(self.profile)
+            if trace_path:
+                self.log(f"Profile written to {trace_path}")
+
+    def _play_sequential(self):
+        """Play a game where one player moves at a time."""
+        while self.active:
+            # Check if game is over
+            game_result = self._check_game_over()
+            if game_result:
+                self._send_final_state()
+                self._handle_game_end(game_result)
+                return
+
+            # Get current player
+            self.current_player_id = self.game_logic.get_current_player(self.game_state)
+            current_connection, _ = self.players[self.current_player_id]
+
+            # Notify current player it's their turn
+            player_state = self.view_cache.get_view(self.game_state, self.current_player_id)
+            current_connection.send(
+                self._state_message(YourTurnMessage, self.current_player_id, player_state))
+            self._turn_started = time.monotonic()
+
+            # Notify the other players the last move concerns
+            interested = self._interested
+            for idx, (connection, _) in enumerate(self.players):
+                if idx != self.current_player_id and (interested is None or idx in interested):
+                    player_state = self.view_cache.get_view(self.game_state, idx)
+                    message = self._state_message(GameStateMessage, idx, player_state)
+                    message.current_player = self.current_player_id
+                    connection.send(message)
+
+            # Wait for move from current player
+            outcome = KEEP_WAITING
+            while outcome == KEEP_WAITING and self.active:
+                message = current_connection.receive()
+                if message is None:
+                    self._handle_player_disconnect(self.current_player_id)
+                    return
+
+                with self.profile.span(message.type):
+                    outcome = self.dispatcher.dispatch(message)
+
+            if outcome == SESSION_ENDED:
+                return
+
+    def _play_rounds(self):
+        """
+        Play a simultaneous or real-time game in rounds.
+
+        Every player to move gets YOUR_TURN at once, and moves are collected
+        from all of them concurrently. A simultaneous round ends when all
+        have moved or the game's deadline passes; a real-time round always
+        lasts one tick. The collected moves are then applied as a batch.
+        """
+        realtime = self.game_logic.get_turn_mode() == TURN_REALTIME
+        connections = [connection for connection, _ in self.players]
+
+        while self.active:
+            # Check if game is over
+            game_result = self._check_game_over()
+            if game_result:
+                self._send_final_state()
+                self._handle_game_end(game_result)
+                return
+
+            if realtime:
+                self._round_players = set(range(len(self.players)))
+                timeout = self.game_logic.get_tick_interval()
+            else:
+                self._round_players = set(self.game_logic.get_players_to_move(self.game_state))
+                timeout = self.game_logic.get_move_deadline()
+            self._round_single_move = not realtime
+            self._round_moves = {}
+            self._round_latencies = {}
+            self._turn_started = time.monotonic()
+            deadline = None if timeout is None else self._turn_started + timeout
+
+            # Notify every player at once
+            for idx, connection in enumerate(connections):
+                player_state = self.view_cache.get_view(self.game_state, idx)
+                message_class = YourTurnMessage if idx in self._round_players else GameStateMessage
+                connection.send(self._state_message(message_class, idx, player_state))
+
+            # Collect moves until everyone has moved or time is up
+            while self.active:
+                if not realtime and len(self._round_moves) == len(self._round_players):
+                    break
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                readable = wait_readable(connections, remaining)
+                for connection in readable:
+                    self.current_player_id = connections.index(connection)
+                    message = connection.receive()
+                    if message is None:
+                        self._handle_player_disconnect(self.current_player_id)
+                        return
+                    with self.profile.span(message.type):
+                        outcome = self.round_dispatcher.dispatch(message)
+                    if outcome == SESSION_ENDED:
+                        return
+            if not self.active:
+                return
+
+            # Apply the round as one batch
+            moves = self._round_moves
+            if self.history is not None:
+                self._set_state(self.history.play_round(moves))
+            else:
+                self._set_state(self.game_logic.apply_moves(self.game_state, moves))
+            self.moves_played += len(moves)
+            if self.recorder:
+                self.recorder.record_round(moves)
+            self.server.events.publish(ROUND_PLAYED, self.session_id, moves=moves,
+                                       latencies=self._round_latencies)
+
+            if moves or not realtime:
+                self.log("Round played: " + ', '.join(
+                    f"Player {player_id + 1}: {move}" for player_id, move in sorted(moves.items())))
+                if self.server.logging:
+                    self.log(self.render_cache.get_display(self.game_state))
+
+            if not realtime:
+                # Real-time players get the new state with their next tick
+                for idx, connection in enumerate(connections):
+                    player_state = self.view_cache.get_view(self.game_state, idx)
+                    connection.send(self._state_message(GameStateMessage, idx, player_state))
+
+    def _check_game_over(self) -> Optional[Dict[str, Any]]:
+        """Check the game over conditions, including repetition when the game has a limit."""
+        if self.history is not None:
+            return self.history.check_game_over()
+        return self.game_logic.check_game_over(self.game_state)
+
+    def _state_message(self, message_class: Type[Message], player_id: int,
+                       player_state: Dict[str, Any]) -> Message:
+        """
+        Build a state message for a player, honouring the client's options.
+
+        A client that negotiated deltas gets the changes since the last
+        state it was sent; the message is assumed to be sent.
+        """
+        connection = self.players[player_id][0]
+        board_display = None
+        if self.server.get_client_option(connection, 'board_display'):
+            board_display = self.render_cache.get_display(self.game_state)
+        base = self._sent_views.get(player_id)
+        self._sent_views[player_id] = player_state
+        if base is not None and self.server.get_client_option(connection, 'deltas'):
+            return message_class(changes=self.view_cache.get_changes(base, player_state),
+                                 board_display=board_display)
+        return message_class(game_state=player_state, board_display=board_display)
+
+    def _send_final_state(self):
+        """Send the final state to every player that has not been sent it yet."""
+        for idx, (connection, _) in enumerate(self.players):
+            player_state = self.view_cache.get_view(self.game_state, idx)
+            if self._sent_views.get(idx) is not player_state:
+                connection.send(self._state_message(GameStateMessage, idx, player_state))
+
+    def _on_move(self, message: Message) -> int:
+        """Validate and apply a MOVE from the current player."""
+        current_player_id = self.current_player_id
+        current_connection, _ = self.players[current_player_id]
+        move = message.move
+
+        # Validate move
+        is_valid, error_msg = self.game_logic.validate_move(
+            self.game_state, current_player_id, move
+        )
+
+        if not is_valid:
+            # Send rejection
+            current_connection.send(
+                MoveRejectedMessage(error=error_msg or "Invalid move", seq=message.seq))
+            return KEEP_WAITING
+
+        # Apply move
+        if self.history is not None:
+            self._set_state(self.history.play(current_player_id, move))
+        else:
+            self._set_state(self.game_logic.apply_move(
+                self.game_state, current_player_id, move
+            ))
+        self.moves_played += 1
+        if self.recorder:
+            self.recorder.record_move(current_player_id, move)
+
+        self.log(f"Player {current_player_id + 1} played: {move}")
+        self.server.events.publish(MOVE_PLAYED, self.session_id, player=current_player_id,
+                                   move=move, latency=time.monotonic() - self._turn_started)
+        if self.server.logging:
+            self.log(self.render_cache.get_display(self.game_state))
+
+        # Send acceptance to player; a predicting client already has the new state
+        if self.server.get_client_option(current_connection, 'predict'):
+            current_connection.send(MoveAcceptedMessage(seq=message.seq))
+        else:
+            player_state = self.view_cache.get_view(self.game_state, current_player_id)
+            accepted = self._state_message(MoveAcceptedMessage, current_player_id, player_state)
+            accepted.seq = message.seq
+            current_connection.send(accepted)
+
+        # The other players are sent the new state when the next turn starts
+        interested = self.game_logic.get_interested_players(self.game_state, current_player_id)
+        self._interested = None if interested is None else set(interested)
+
+        return TURN_COMPLETE
+
+    def _on_round_move(self, message: Message) -> int:
+        """Validate and collect a MOVE made during a round."""
+        player_id = self.current_player_id
+        connection, _ = self.players[player_id]
+
+        if player_id not in self._round_players:
+            connection.send(MoveRejectedMessage(error="It's not your turn", seq=message.seq))
+            return KEEP_WAITING
+        if self._round_single_move and player_id in self._round_moves:
+            connection.send(MoveRejectedMessage(
+                error="You have already moved this round", seq=message.seq))
+            return KEEP_WAITING
+
+        # Moves are validated against the state at the start of the round
+        is_valid, error_msg = self.game_logic.validate_move(self.game_state, player_id, message.move)
+        if not is_valid:
+            connection.send(
+                MoveRejectedMessage(error=error_msg or "Invalid move", seq=message.seq))
+            return KEEP_WAITING
+
+        self._round_moves[player_id] = message.move
+        self._round_latencies[player_id] = time.monotonic() - self._turn_started
+        player_state = self.view_cache.get_view(self.game_state, player_id)
+        accepted = self._state_message(MoveAcceptedMessage, player_id, player_state)
+        accepted.seq = message.seq
+        connection.send(accepted)
+        return KEEP_WAITING
+
+    def _on_disconnect(self, message: Message) -> int:
+        """Handle the current player leaving the game."""
+        self._handle_player_disconnect(self.current_player_id)
+        return SESSION_ENDED
+
+    def _on_invalid_message(self, message: Message) -> int:
+        """Reject a frame that failed to decode or validate."""
+        current_connection, _ = self.players[self.current_player_id]
+        current_connection.send(MoveRejectedMessage(error=message.error or "Invalid message"))
+        return KEEP_WAITING
+
+    def _on_unexpected_message(self, message: Message) -> int:
+        """Reject messages the session has no handler for."""
+        current_connection, _ = self.players[self.current_player_id]
+        current_connection.send(ErrorMessage(error="Unexpected message type"))
+        return KEEP_WAITING
+
+    def _make_game_handler(self, msg_type: str, handler):
+        """Bind a game-specific message handler to this session."""
+        def on_game_message(message: Message) -> int:
+            reply = handler(self.game_state, self.current_player_id, message)
+            if reply is not None:
+                current_connection, _ = self.players[self.current_player_id]
+                current_connection.send(GenericMessage(msg_type, reply))
+            return KEEP_WAITING
+        return on_game_message
+
+    def _player_names(self) -> List[Optional[str]]:
+        """Names the players negotiated, by player ID; None for anonymous players."""
+        return [self.server.get_client_option(connection, 'name')
+                for connection, _ in self.players]
+
+    def _handle_game_end(self, game_result: Dict):
+        """Handle game end and notify all players."""
+        self.log(game_result['message'])
+        if self.recorder:
+            path = self.recorder.finish(game_result)
+            self.log(f"Replay saved to {path}")
+        names = self._player_names()
+        changes = {}
+        if self.server.ratings:
+            changes = self.server.ratings.record_result(
+                self.game_key, names, game_result.get('winner'), game_result.get('draw', False))
+            if changes:
+                self.log("Ratings: " + ', '.join(
+                    f"{name} {change:+.1f}" for name, change in changes.items()))
+        self.server.events.publish(
+            GAME_ENDED, self.session_id, game=self.game_key, players=names,
+            winner=game_result.get('winner'), draw=game_result.get('draw', False),
+            message=game_result['message'], duration=time.time() - self.started,
+            rating_changes=changes)
+
+        for idx, (connection, _) in enumerate(self.players):
+            if game_result.get('draw'):
+                won = False
+            else:
+                won = (game_result.get('winner') == idx)
+
+            connection.send(GameEndMessage(
+                winner=game_result.get('winner'),
+                draw=game_result.get('draw', False),
+                won=won,
+                message=game_result['message']
+            ))
+
+    def _handle_player_disconnect(self, disconnected_player_id: int):
+        """Handle a player disconnecting."""
+        if self.stopped:
+            # The connection was closed by stop(), which told everyone already
+            return
+        if self._can_suspend():
+            self._suspend(disconnected_player_id)
+            return
+        self.log(f"Player {disconnected_player_id + 1} disconnected")
+        self.server.events.publish(PLAYER_DISCONNECTED, self.session_id,
+                                   player=disconnected_player_id)
+
+        # Notify remaining players
+        for idx, (connection, _) in enumerate(self.players):
+            if idx != disconnected_player_id:
+                try:
+                    connection.send(ErrorMessage(
+                        error=f"Player {disconnected_player_id + 1} disconnected. Game ended."))
+                except:
+                    pass
+
+        # Close all connections
+        for connection, _ in self.players:
+            try:
+                connection.close()
+            except:
+                pass
+
+    def _can_suspend(self) -> bool:
+        """Whether the server can keep this session for its players to resume."""
+        if self.server.session_table is None:
+            return False
+        names = self._player_names()
+        return None not in names and len(set(names)) == len(names)
+
+    def _suspend(self, disconnected_player_id: int):
+        """Hand the session to the server's session table and disconnect everyone."""
+        self.suspended = True
+        names = self._player_names()
+        replay = self.recorder.replay.to_dict() if self.recorder and self.recorder.replay else None
+        self.log(f"Player {disconnected_player_id + 1} disconnected; suspending the game")
+        self.server.events.publish(SESSION_SUSPENDED, self.session_id, game=self.game_key,
+                                   player=disconnected_player_id, moves=self.moves_played)
+
+        for idx, (connection, _) in enumerate(self.players):
+            if idx != disconnected_player_id:
+                connection.send(ErrorMessage(
+                    error=f"Player {disconnected_player_id + 1} disconnected. The game is "
+                          f"saved; reconnect as {names[idx]} with your resume token to "
+                          f"resume it."))
+            try:
+                connection.close()
+            except:
+                pass
+
+        self.server.session_table.suspend(SessionSnapshot(
+            self.session_id, self.game_key, names, self.game_state, self.started,
+            self.moves_played, replay,
+            tokens=[self.server.get_client_option(connection, 'resume_token')
+                    for connection, _ in self.players]))
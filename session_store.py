@@ -0,0 +1,472 @@
+"""
+Suspended sessions and their memory budget.
+When a player of a rated game drops, the session is suspended instead of
+ended: its state moves into a SessionTable and the sockets are closed. The
+table keeps suspended sessions in memory up to a byte budget, evicts the
+least recently used and the idle ones to compact snapshot files, and hands
+a session back, from memory or disk, once all of its players reconnect
+under their names with the resume tokens the server gave them.
+"""
+import collections
+import gzip
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from transport import Transport
+from events import SESSION_EXPIRED
+
+
+SNAPSHOT_FORMAT_VERSION = 2
+
+# File extension of snapshots written by SessionTable
+SNAPSHOT_EXTENSION = '.session.gz'
+
+# Bytes of suspended sessions kept in memory before the oldest go to disk
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Seconds a suspended session stays in memory without anyone returning
+DEFAULT_IDLE_TTL = 60.0
+
+# Seconds before a suspended session nobody returned to is discarded
+DEFAULT_EXPIRE_AFTER = 24 * 60 * 60.0
+
+# Seconds between checks for idle and expired sessions
+SWEEP_INTERVAL = 5.0
+
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+
+
+def estimate_size(*objects: Any, seen: Optional[set] = None) -> int:
+    """
+    Estimate the memory held by JSON-like values.
+
+    Follows dictionaries, lists, tuples and sets and counts every object
+    once, so values shared between the arguments are not counted twice.
+    Other objects count their own size only.
+
+    Args:
+        *objects: Values to measure
+        seen: IDs of objects already counted, shared between calls to
+            measure several parts of one structure without overlap
+
+    Returns:
+        Size in bytes as reported by sys.getsizeof
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, _CONTAINERS):
+            stack.extend(obj)
+    return total
+
+
+class SessionSnapshot:
+    """State needed to resume a suspended session."""
+
+    __slots__ = ('session_id', 'game_key', 'names', 'game_state', 'started', 'moves_played',
+                 'replay', 'suspended_at', 'tokens', 'size', 'returned')
+
+    def __init__(self, session_id: int, game_key: str, names: List[str],
+                 game_state: Dict[str, Any], started: float, moves_played: int = 0,
+                 replay: Optional[Dict[str, Any]] = None, suspended_at: Optional[float] = None,
+                 tokens: Optional[List[Optional[str]]] = None):
+        """
+        Initialize a snapshot.
+
+        Args:
+            session_id: ID of the suspended session
+            game_key: Registry key of the game
+            names: Player names by player ID
+            game_state: Game state when the session was suspended
+            started: Unix timestamp of the game start
+            moves_played: Moves applied before the session was suspended
+            replay: Serialized replay recorded so far, or None
+            suspended_at: Unix timestamp of the suspension; now if omitted
+            tokens: Resume token of each player by player ID; players without
+                one cannot return
+        """
+        self.session_id = session_id
+        self.game_key = game_key
+        self.names = names
+        self.game_state = game_state
+        self.started = started
+        self.moves_played = moves_played
+        self.replay = replay
+        self.suspended_at = suspended_at if suspended_at is not None else time.time()
+        self.tokens = tokens if tokens is not None else [None] * len(names)
+        self.size = estimate_size(game_state, replay, names)
+        # Connections of the players that are back, by player ID
+        self.returned: Dict[int, Tuple[Transport, str]] = {}
+
+    def check_token(self, player_id: int, token: Optional[str]) -> bool:
+        """Whether a token is the resume token of a player."""
+        expected = self.tokens[player_id]
+        if not expected or not token:
+            return False
+        return hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
+
+    @property
+    def complete(self) -> bool:
+        """Whether every player has reconnected."""
+        return len(self.returned) == len(self.names)
+
+    def players(self) -> List[Tuple[Transport, str]]:
+        """The returned players' (transport, address) tuples, indexed by player ID."""
+        return [self.returned[player_id] for player_id in range(len(self.names))]
+
+    def header(self) -> Dict[str, Any]:
+        """Fields needed to index a snapshot without loading its state."""
+        return {
+            'version': SNAPSHOT_FORMAT_VERSION,
+            'session': self.session_id,
+            'game': self.game_key,
+            'names': self.names,
+            'started': self.started,
+            'moves': self.moves_played,
+            'suspended_at': self.suspended_at,
+        }
+
+    def info(self) -> Dict[str, Any]:
+        """Summarize the snapshot for the admin API."""
+        return dict(self.header(), size=self.size,
+                    returned=[self.names[player_id] for player_id in sorted(self.returned)])
+
+
+def save_snapshot(snapshot: SessionSnapshot, path: str):
+    """
+    Write a snapshot to a gzip-compressed file.
+
+    The first line holds the header, so tables can index snapshot files
+    without decoding the game state; resume tokens are kept out of it, in
+    the body with the state. The file is written under a temporary
+    name and renamed, so it is never seen half-written.
+
+    Args:
+        snapshot: Snapshot to write
+        path: Destination file path
+    """
+    body = {'state': snapshot.game_state, 'replay': snapshot.replay, 'tokens': snapshot.tokens}
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(json.dumps(snapshot.header(), separators=(',', ':')))
+        f.write('\n')
+        f.write(json.dumps(body, separators=(',', ':')))
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path: str) -> Dict[str, Any]:
+    """Read the header line of a snapshot file."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+    if header.get('version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+    return header
+
+
+def load_snapshot(path: str) -> SessionSnapshot:
+    """
+    Read a snapshot written by save_snapshot.
+
+    Args:
+        path: Snapshot file path
+
+    Returns:
+        The loaded snapshot
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        body = json.loads(f.readline())
+    if header.get('version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+    return SessionSnapshot(header['session'], header['game'], header['names'], body['state'],
+                           header['started'], header['moves'], body['replay'],
+                           header['suspended_at'], body['tokens'])
+
+
+class SessionTable:
+    """
+    Suspended sessions by ID, in memory up to a budget and on disk beyond it.
+
+    Sessions in memory are kept in least recently used order. A session
+    goes to disk when it has been idle for idle_ttl, or when the memory
+    budget is exceeded and it is the least recently used one that has no
+    players waiting on it. Sessions are discarded expire_after seconds after
+    they were suspended. Every method is thread-safe.
+    """
+
+    def __init__(self, directory: str, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 idle_ttl: float = DEFAULT_IDLE_TTL,
+                 expire_after: float = DEFAULT_EXPIRE_AFTER,
+                 sweep_interval: float = SWEEP_INTERVAL, events=None):
+        """
+        Initialize the table, indexing snapshots left in the directory.
+
+        Args:
+            directory: Directory snapshot files are kept in
+            memory_budget: Bytes of suspended sessions kept in memory
+            idle_ttl: Seconds a session stays in memory without a player returning
+            expire_after: Seconds before an abandoned session is discarded
+            sweep_interval: Seconds between checks for idle and expired sessions
+            events: EventBus to publish expired sessions to, or None
+        """
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.idle_ttl = idle_ttl
+        self.expire_after = expire_after
+        self.events = events
+        self.memory_used = 0
+        self.suspended = 0
+        self.evicted = 0
+        self.rehydrated = 0
+        self.resumed = 0
+        self.expired = 0
+        self.last_session_id = 0
+        # In-memory snapshots in least recently used order, with when each was last used
+        self._memory: 'collections.OrderedDict[int, SessionSnapshot]' = \
+            collections.OrderedDict()
+        self._last_used: Dict[int, float] = {}
+        # Headers of snapshots on disk, by session ID
+        self._disk: Dict[int, Dict[str, Any]] = {}
+        # Session ID of every suspended player, by (game key, name)
+        self._players: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        for header in self._scan():
+            self._disk[header['session']] = header
+            self._index(header['session'], header['game'], header['names'])
+            self.last_session_id = max(self.last_session_id, header['session'])
+
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                         daemon=True)
+        self._sweeper.start()
+
+    def _path(self, session_id: int) -> str:
+        return os.path.join(self.directory, f"{session_id}{SNAPSHOT_EXTENSION}")
+
+    def _scan(self) -> Iterator[Dict[str, Any]]:
+        """Yield the headers of the snapshot files in the directory."""
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(SNAPSHOT_EXTENSION):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                yield read_snapshot_header(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping unreadable session snapshot {path}: {e}")
+
+    def _index(self, session_id: int, game_key: str, names: List[str]):
+        for name in names:
+            self._players[(game_key, name)] = session_id
+
+    def _unindex(self, game_key: str, names: List[str]):
+        for name in names:
+            self._players.pop((game_key, name), None)
+
+    def suspend(self, snapshot: SessionSnapshot):
+        """
+        Add a suspended session, evicting others if it exceeds the budget.
+
+        Args:
+            snapshot: State of the session
+        """
+        with self._lock:
+            self._memory[snapshot.session_id] = snapshot
+            self._last_used[snapshot.session_id] = time.monotonic()
+            self._index(snapshot.session_id, snapshot.game_key, snapshot.names)
+            self.memory_used += snapshot.size
+            self.suspended += 1
+            self.last_session_id = max(self.last_session_id, snapshot.session_id)
+            self._enforce_budget()
+
+    def is_suspended(self, game_key: str, name: str) -> bool:
+        """Whether a player has a suspended session in a game."""
+        with self._lock:
+            return (game_key, name) in self._players
+
+    def rejoin(self, game_key: str, name: str, token: Optional[str], connection: Transport,
+               address: str
+               ) -> Optional[Tuple[SessionSnapshot, int, Optional[List[Tuple[Transport, str]]]]]:
+        """
+        Return a player to their suspended session, loading it from disk if needed.
+
+        Once every player is back the session leaves the table, and the
+        call that completed it gets the players to resume it with.
+
+        Args:
+            game_key: Registry key of the game the player asked for
+            name: Player name
+            token: Resume token the player was given when they first connected
+            connection: The player's new connection
+            address: The player's address
+
+        Returns:
+            Tuple of (snapshot, player ID, players), where players is the
+            (transport, address) list by player ID once everyone is back and
+            None before; None if the player has no suspended session in this game
+
+        Raises:
+            PermissionError: If the token is not the player's resume token
+        """
+        with self._lock:
+            session_id = self._players.get((game_key, name))
+            if session_id is None:
+                return None
+            snapshot = self._memory.get(session_id)
+            if snapshot is None:
+                snapshot = self._rehydrate(session_id)
+                if snapshot is None:
+                    return None
+            player_id = snapshot.names.index(name)
+            if not snapshot.check_token(player_id, token):
+                raise PermissionError(f"Wrong resume token for {name}")
+            self._memory.move_to_end(session_id)
+            self._last_used[session_id] = time.monotonic()
+
+            replaced = snapshot.returned.get(player_id)
+            snapshot.returned[player_id] = (connection, address)
+            players = None
+            if snapshot.complete:
+                self._discard(snapshot)
+                self.resumed += 1
+                players = snapshot.players()
+        if replaced is not None:
+            # The player reconnected again before everyone was back
+            replaced[0].close()
+        return snapshot, player_id, players
+
+    def _rehydrate(self, session_id: int) -> Optional[SessionSnapshot]:
+        """Load a snapshot from disk into memory; the caller holds the lock."""
+        header = self._disk.pop(session_id)
+        path = self._path(session_id)
+        try:
+            snapshot = load_snapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load session snapshot {path}: {e}")
+            self._unindex(header['game'], header['names'])
+            return None
+        os.remove(path)
+        self._memory[session_id] = snapshot
+        self.memory_used += snapshot.size
+        self.rehydrated += 1
+        return snapshot
+
+    def _discard(self, snapshot: SessionSnapshot):
+        """Remove an in-memory snapshot from the table; the caller holds the lock."""
+        del self._memory[snapshot.session_id]
+        del self._last_used[snapshot.session_id]
+        self._unindex(snapshot.game_key, snapshot.names)
+        self.memory_used -= snapshot.size
+
+    def _evict(self, snapshot: SessionSnapshot) -> bool:
+        """Move an in-memory snapshot to disk; the caller holds the lock."""
+        try:
+            save_snapshot(snapshot, self._path(snapshot.session_id))
+        except (OSError, TypeError, ValueError) as e:
+            # Only JSON-serializable states can go to disk; keep the session in memory
+            print(f"Could not write session snapshot {snapshot.session_id}: {e}")
+            return False
+        del self._memory[snapshot.session_id]
+        del self._last_used[snapshot.session_id]
+        self.memory_used -= snapshot.size
+        self._disk[snapshot.session_id] = snapshot.header()
+        self.evicted += 1
+        return True
+
+    def _enforce_budget(self):
+        """Evict least recently used sessions until within budget; the caller holds the lock."""
+        if self.memory_used <= self.memory_budget:
+            return
+        for snapshot in list(self._memory.values()):
+            # Sessions with players waiting are about to resume
+            if not snapshot.returned and self._evict(snapshot):
+                if self.memory_used <= self.memory_budget:
+                    return
+
+    def sweep(self):
+        """Evict idle sessions to disk and discard expired ones."""
+        now = time.monotonic()
+        expire_before = time.time() - self.expire_after
+        expired = []
+        with self._lock:
+            for session_id, snapshot in list(self._memory.items()):
+                if snapshot.returned:
+                    continue
+                if snapshot.suspended_at < expire_before:
+                    self._discard(snapshot)
+                    expired.append(snapshot.header())
+                elif now - self._last_used[session_id] >= self.idle_ttl:
+                    self._evict(snapshot)
+            for session_id, header in list(self._disk.items()):
+                if header['suspended_at'] < expire_before:
+                    del self._disk[session_id]
+                    self._unindex(header['game'], header['names'])
+                    try:
+                        os.remove(self._path(session_id))
+                    except OSError:
+                        pass
+                    expired.append(header)
+            self.expired += len(expired)
+        if self.events is not None:
+            for header in expired:
+                self.events.publish(SESSION_EXPIRED, header['session'], game=header['game'],
+                                    players=header['names'])
+
+    def _sweep_loop(self, interval: float):
+        while not self._stopped.wait(interval):
+            self.sweep()
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Summarize every suspended session, in memory or on disk."""
+        with self._lock:
+            in_memory = [dict(snapshot.info(), in_memory=True)
+                         for snapshot in self._memory.values()]
+            on_disk = [dict(header, in_memory=False) for header in self._disk.values()]
+        return sorted(in_memory + on_disk, key=lambda info: info['session'])
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counts, memory use and eviction counters."""
+        with self._lock:
+            return {
+                'in_memory': len(self._memory),
+                'on_disk': len(self._disk),
+                'memory_used': self.memory_used,
+                'memory_budget': self.memory_budget,
+                'suspended': self.suspended,
+                'evicted': self.evicted,
+                'rehydrated': self.rehydrated,
+                'resumed': self.resumed,
+                'expired': self.expired,
+            }
+
+    def close(self):
+        """
+        Stop sweeping and write the sessions in memory to disk.
+
+        Snapshots on disk are indexed again when a table is created on the
+        same directory, so suspended games survive a server restart.
+        """
+        self._stopped.set()
+        self._sweeper.join()
+        with self._lock:
+            for snapshot in list(self._memory.values()):
+                waiting = list(snapshot.returned.values())
+                snapshot.returned.clear()
+                for connection, _ in waiting:
+                    connection.close()
+                self._evict(snapshot)
@@ -0,0 +1,131 @@
+"""
+Caching helpers for values derived from the game state.
+A session bumps the state version whenever a move is applied, so anything
+derived from the state only needs to be computed once per version.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from game_interface import GameInterface
+from state_delta import diff_state
+
+
+class RenderCache:
+    """Memoizes format_state_for_display for the current state version."""
+
+    def __init__(self, game_logic: GameInterface):
+        """
+        Initialize the render cache.
+
+        Args:
+            game_logic: GameInterface implementation used for rendering
+        """
+        self.game_logic = game_logic
+        self.version = 0
+        self._display: Optional[str] = None
+
+    def invalidate(self):
+        """Mark cached values as stale after the game state changed."""
+        self.version += 1
+        self._display = None
+
+    def get_display(self, game_state: Dict[str, Any]) -> str:
+        """
+        Get the display string for the current state version.
+
+        Args:
+            game_state: Current game state
+
+        Returns:
+            Formatted string representation
+        """
+        if self._display is None:
+            self._display = self.game_logic.format_state_for_display(game_state)
+        return self._display
+
+    def cached(self) -> List[Any]:
+        """Values currently cached, for memory accounting."""
+        return [self._display]
+
+
+class ViewCache:
+    """Memoizes each player's view of the state for the current state version."""
+
+    def __init__(self, game_logic: GameInterface):
+        """
+        Initialize the view cache.
+
+        Args:
+            game_logic: GameInterface implementation that builds player views
+        """
+        self.game_logic = game_logic
+        self.version = 0
+        self._private_fields = game_logic.get_private_fields()
+        self._public: Optional[Dict[str, Any]] = None
+        self._views: Dict[int, Dict[str, Any]] = {}
+        # Changes to the current views, by ids of the earlier and current view
+        self._changes: Dict[Tuple[int, int], List[List[Any]]] = {}
+
+    def invalidate(self):
+        """Mark cached views as stale after the game state changed."""
+        self.version += 1
+        self._public = None
+        self._views.clear()
+        self._changes.clear()
+
+    def get_view(self, game_state: Dict[str, Any], player_id: int) -> Dict[str, Any]:
+        """
+        Get a player's view of the current state version.
+
+        Games that declare their private fields share one copy of the public
+        fields between all players, so only the private fields are computed
+        per player. Views are shared and must not be modified.
+
+        Args:
+            game_state: Current game state
+            player_id: ID of the player the view is for
+
+        Returns:
+            Game state dictionary for the player
+        """
+        view = self._views.get(player_id)
+        if view is not None:
+            return view
+
+        private_fields = self._private_fields
+        if private_fields is None:
+            view = self.game_logic.get_game_state_for_player(game_state, player_id)
+        else:
+            if self._public is None:
+                self._public = {key: value for key, value in game_state.items()
+                                if key not in private_fields}
+            view = self._public
+            if private_fields:
+                view = view.copy()
+                for field, redact in private_fields.items():
+                    if field in game_state:
+                        view[field] = redact(game_state, player_id)
+        self._views[player_id] = view
+        return view
+
+    def get_changes(self, base: Dict[str, Any], view: Dict[str, Any]) -> List[List[Any]]:
+        """
+        Get the changes from a view sent earlier to a view of the current version.
+
+        Players that share views also share the changes, so they are
+        computed once per version however many players are sent them.
+
+        Args:
+            base: View the player was sent last
+            view: View from get_view for the current version
+
+        Returns:
+            Changes from diff_state, which must not be modified
+        """
+        key = (id(base), id(view))
+        changes = self._changes.get(key)
+        if changes is None:
+            changes = self._changes[key] = diff_state(base, view)
+        return changes
+
+    def cached(self) -> List[Any]:
+        """Values currently cached, for memory accounting."""
+        return [self._public, self._views, self._changes]
@@ -0,0 +1,108 @@
+"""
+State deltas: the changes between two versions of a game state.
+Clients that negotiate the 'deltas' option receive these instead of the
+whole state, so a move on a large board costs a few bytes per player.
+"""
+from typing import Dict, Any, List
+
+
+# Lists with more than this fraction of their items changed are sent whole
+WHOLE_LIST_FRACTION = 0.5
+
+
+def diff_state(old: Any, new: Any) -> List[List[Any]]:
+    """
+    Compute the changes that turn one state into another.
+
+    Dictionaries and lists of the same length are compared item by item;
+    anything else that differs is replaced whole. Dictionary keys must be
+    strings, as GameInterface requires, so paths mean the same on clients
+    that got the state as JSON and on in-process clients that did not. Values that are the same
+    object are skipped without comparing them, which makes states that
+    share unchanged parts cheap to diff.
+
+    Args:
+        old: Previous state
+        new: Current state
+
+    Returns:
+        List of changes, each [path, value] to set a value or [path] to
+        delete a key, where path is a list of keys and indexes
+
+    Raises:
+        TypeError: If a dictionary in the states has a key that is not a string
+    """
+    changes: List[List[Any]] = []
+    _diff(old, new, [], changes)
+    return changes
+
+
+def _diff(old: Any, new: Any, path: List[Any], changes: List[List[Any]]):
+    """Append the changes from old to new, both found at path, to changes."""
+    if old is new:
+        return
+    old_type = type(old)
+    if old_type is not type(new):
+        changes.append([path, new])
+    elif old_type is dict:
+        for key, value in new.items():
+            if type(key) is not str:
+                raise TypeError(f"Game state keys must be strings, not {key!r} at {path}")
+            if key not in old:
+                changes.append([path + [key], value])
+            else:
+                _diff(old[key], value, path + [key], changes)
+        for key in old:
+            if key not in new:
+                if type(key) is not str:
+                    raise TypeError(f"Game state keys must be strings, not {key!r} at {path}")
+                changes.append([path + [key]])
+    elif old_type is list and len(old) == len(new):
+        changed = [index for index, (old_item, new_item) in enumerate(zip(old, new))
+                   if old_item is not new_item and old_item != new_item]
+        if len(changed) > len(new) * WHOLE_LIST_FRACTION:
+            changes.append([path, new])
+            return
+        for index in changed:
+            _diff(old[index], new[index], path + [index], changes)
+    elif old != new:
+        changes.append([path, new])
+
+
+def apply_changes(state: Dict[str, Any], changes: List[List[Any]]) -> Dict[str, Any]:
+    """
+    Apply changes from diff_state to a state.
+
+    The state is not modified: containers along each changed path are
+    copied, so earlier states held elsewhere stay valid.
+
+    Args:
+        state: State the changes were computed against
+        changes: Changes from diff_state
+
+    Returns:
+        The new state
+    """
+    if not changes:
+        return state
+    if not changes[0][0]:
+        # The whole state was replaced
+        return changes[0][1]
+    new_state = dict(state)
+    # Containers already copied for this update, by id
+    copied = {id(new_state)}
+    for change in changes:
+        path = change[0]
+        container = new_state
+        for key in path[:-1]:
+            child = container[key]
+            if id(child) not in copied:
+                child = child.copy()
+                copied.add(id(child))
+                container[key] = child
+            container = child
+        if len(change) == 1:
+            del container[path[-1]]
+        else:
+            container[path[-1]] = change[1]
+    return new_state
@@ -0,0 +1,53 @@
+"""Admin API authentication and request body checks."""
+import socket
+
+import pytest
+
+from admin import AdminServer, request
+from game_registry import GameRegistry
+from server import GameServer
+
+TOKEN = 'test-token'
+
+
+@pytest.fixture(scope='module')
+def admin():
+    game_server = GameServer(registry=GameRegistry())
+    game_server.logging = False
+    admin = AdminServer(game_server, port=0, token=TOKEN)
+    admin.start()
+    yield admin
+    admin.stop()
+
+
+def raw_post(admin, headers, body=b''):
+    """Send a POST with exactly these headers and return the status code."""
+    lines = ["POST /config HTTP/1.1", f"Host: 127.0.0.1:{admin.port}",
+             f"Authorization: Bearer {TOKEN}", "Content-Type: application/json",
+             "Connection: close"] + headers
+    with socket.create_connection(('127.0.0.1', admin.port), timeout=5) as sock:
+        sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('ascii') + body)
+        status_line = sock.makefile('rb').readline().decode('ascii')
+    return int(status_line.split()[1])
+
+
+def test_requests_need_the_token(admin):
+    assert request('GET', '/stats', port=admin.port, token=TOKEN)[0] == 200
+    assert request('GET', '/stats', port=admin.port, token='wrong')[0] == 401
+
+
+@pytest.mark.parametrize('length', ['abc', '-5', '+2', '1_0', ' ', '1.5'])
+def test_bad_content_length_is_rejected(admin, length):
+    assert raw_post(admin, [f"Content-Length: {length}"], b'{}') == 400
+
+
+def test_body_must_be_json(admin):
+    assert raw_post(admin, ["Content-Length: 2"], b'{}') == 200
+    assert raw_post(admin, ["Content-Length: 2"], b'[]') == 400
+    assert raw_post(admin, [f"Content-Length: {2 ** 20}"]) == 413
+
+
+def test_profile_dir_cannot_change_at_runtime(admin):
+    status, _ = request('POST', '/config', {'profile_dir': '/tmp'}, port=admin.port,
+                        token=TOKEN)
+    assert status == 400
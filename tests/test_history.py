@@ -0,0 +1,134 @@
+"""GameHistory hashing, undo and repetition."""
+import copy
+from typing import Any, Dict, Optional
+
+import pytest
+
+from game_interface import GameInterface
+from history import GameHistory, position_hash
+from mnk_game import MNKGame
+from tictactoe import TicTacToeGame
+
+
+class ShuttleGame(GameInterface):
+    """Two players move one token left or right; positions repeat easily."""
+
+    def get_game_name(self) -> str:
+        return 'Shuttle'
+
+    def get_min_players(self) -> int:
+        return 2
+
+    def get_max_players(self) -> int:
+        return 2
+
+    def initialize_game(self, num_players: int) -> Dict[str, Any]:
+        return {'position': 0, 'current_player': 0}
+
+    def validate_move(self, game_state, player_id, move):
+        return move in ('left', 'right'), None
+
+    def apply_move(self, game_state, player_id, move):
+        return {'position': game_state['position'] + (1 if move == 'right' else -1),
+                'current_player': 1 - player_id}
+
+    def check_game_over(self, game_state) -> Optional[Dict[str, Any]]:
+        return None
+
+    def get_current_player(self, game_state) -> int:
+        return game_state['current_player']
+
+    def get_game_state_for_player(self, game_state, player_id):
+        return game_state
+
+    def format_state_for_display(self, game_state) -> str:
+        return str(game_state['position'])
+
+    def get_move_help(self) -> str:
+        return 'left or right'
+
+    def get_repetition_limit(self) -> Optional[int]:
+        return 3
+
+
+@pytest.mark.parametrize('in_place', [True, False])
+def test_undo_restores_state_and_hash(in_place):
+    game = TicTacToeGame()
+    start = game.initialize_game(2)
+    history = GameHistory(game, start, in_place=in_place)
+    states = [copy.deepcopy(history.state)]
+    hashes = [history.hash]
+    for player_id, move in [(0, '5'), (1, '1'), (0, '9')]:
+        history.play(player_id, move)
+        states.append(copy.deepcopy(history.state))
+        hashes.append(history.hash)
+        assert history.hash == position_hash(game, history.state)
+
+    for expected_state, expected_hash in zip(reversed(states[:-1]), reversed(hashes[:-1])):
+        record = history.undo()
+        assert history.state == expected_state
+        assert history.hash == expected_hash
+        assert record.move in ('5', '1', '9')
+    assert len(history) == 0
+    with pytest.raises(IndexError):
+        history.undo()
+
+
+def test_in_place_history_does_not_touch_the_starting_state():
+    game = MNKGame(3, 3, 3)
+    start = game.initialize_game(2)
+    history = GameHistory(game, start)
+    history.play(0, '2,2')
+    assert start == game.initialize_game(2)
+
+
+def test_takeback_returns_to_the_players_turn():
+    game = TicTacToeGame()
+    history = GameHistory(game, game.initialize_game(2))
+    history.play(0, '1')
+    history.play(1, '2')
+    history.play(0, '3')
+    taken = history.takeback(1)
+    assert [record.move for record in taken] == ['3', '2']
+    assert game.get_current_player(history.state) == 1
+    assert history.moves() == [(0, '1')]
+    with pytest.raises(ValueError):
+        history.takeback(1)
+
+
+def test_max_undo_limits_how_far_back_undo_goes():
+    game = TicTacToeGame()
+    history = GameHistory(game, game.initialize_game(2), max_undo=1)
+    history.play(0, '1')
+    history.play(1, '2')
+    history.undo()
+    with pytest.raises(IndexError):
+        history.undo()
+
+
+def test_transpositions_hash_alike():
+    game = TicTacToeGame()
+    first = GameHistory(game, game.initialize_game(2))
+    second = GameHistory(game, game.initialize_game(2))
+    for player_id, move in [(0, '1'), (1, '5'), (0, '9')]:
+        first.play(player_id, move)
+    for player_id, move in [(0, '9'), (1, '5'), (0, '1')]:
+        second.play(player_id, move)
+    assert first.hash == second.hash
+    assert first.state == second.state
+
+
+def test_repetition_counts_and_draw():
+    game = ShuttleGame()
+    history = GameHistory(game, game.initialize_game(2), in_place=False)
+    start = history.hash
+    assert history.repetitions() == 1
+    for player_id, move in [(0, 'right'), (1, 'left'), (0, 'right'), (1, 'left')]:
+        history.play(player_id, move)
+    assert history.repetitions() == 3
+    result = history.check_game_over()
+    assert result['draw'] and result['winner'] is None
+
+    history.undo()
+    assert history.repetitions(start) == 2
+    assert history.check_game_over() is None
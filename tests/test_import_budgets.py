@@ -0,0 +1,18 @@
+"""Cold import times of the entry points stay within their budgets."""
+import pytest
+
+from benchmarks import IMPORT_BUDGETS, time_import
+
+# Timing on shared CI machines is noisy; only fail well past the budget
+MARGIN = 1.5
+
+# Fresh interpreters per module; the best time is compared
+REPEAT = 3
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS))
+def test_import_within_budget(module):
+    best = min(time_import(module) for _ in range(REPEAT))
+    budget = IMPORT_BUDGETS[module]
+    assert best <= budget * MARGIN, \
+        f"import {module} took {best * 1e3:.1f} ms, budget {budget * 1e3:.0f} ms"
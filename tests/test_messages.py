@@ -0,0 +1,85 @@
+"""Message decoding and schema validation."""
+import json
+
+import pytest
+
+from messages import (ConnectedMessage, ErrorMessage, GameEndMessage, GenericMessage, Message,
+                      MoveMessage, MessageType, MessageValidationError, build_message,
+                      decode_message)
+
+
+def connected(**overrides):
+    data = {'player_id': 0, 'game_name': 'Tic-Tac-Toe', 'min_players': 2, 'max_players': 2,
+            'current_players': 1}
+    data.update(overrides)
+    return json.dumps({'type': 'CONNECTED', 'data': data})
+
+
+def test_decodes_typed_message():
+    message = decode_message(connected(options={'compression': None}))
+    assert isinstance(message, ConnectedMessage)
+    assert message.message_type is MessageType.CONNECTED
+    assert message.player_id == 0
+    assert message.options == {'compression': None}
+
+
+def test_encode_decode_round_trip():
+    message = GameEndMessage(winner=None, draw=True, won=False, message='Draw')
+    assert decode_message(message.encode()) == message
+
+
+def test_optional_fields_default_to_none():
+    message = decode_message(connected())
+    assert message.options is None
+    assert 'options' not in message.to_dict()['data']
+
+
+@pytest.mark.parametrize('raw', ['not json', '[]', '{"data": {}}', '{"type": 3}'])
+def test_malformed_input_becomes_error(raw):
+    message = decode_message(raw)
+    assert isinstance(message, ErrorMessage)
+    assert message.error == 'Invalid message format'
+
+
+@pytest.mark.parametrize('raw, problem', [
+    (connected(player_id=None), 'must not be null'),
+    (connected(player_id='0'), 'wrong type'),
+    (json.dumps({'type': 'CONNECTED', 'data': {'player_id': 0}}), 'missing field'),
+    (json.dumps({'type': 'MOVE', 'data': []}), 'data must be an object'),
+    (json.dumps({'type': 'MOVE', 'data': {'move': '1'}, 'error': 5}), 'error must be a string'),
+])
+def test_schema_violations_become_errors(raw, problem):
+    message = decode_message(raw)
+    assert isinstance(message, ErrorMessage)
+    assert problem in message.error
+
+
+def test_nullable_field_accepts_null():
+    raw = json.dumps({'type': 'GAME_END',
+                      'data': {'winner': None, 'draw': True, 'won': False, 'message': 'Draw'}})
+    assert isinstance(decode_message(raw), GameEndMessage)
+
+
+def test_move_accepts_any_json_move():
+    for move in ('5', 5, [1, 2], {'row': 1}):
+        assert decode_message(MoveMessage(move=move).encode()).move == move
+
+
+def test_unknown_type_decodes_generically():
+    message = decode_message(json.dumps({'type': 'CHAT', 'data': {'text': 'hi'}}))
+    assert isinstance(message, GenericMessage)
+    assert message.type == 'CHAT'
+    assert message.data == {'text': 'hi'}
+
+
+def test_build_message_validates():
+    message = build_message(MessageType.MOVE, {'move': '3', 'seq': 1})
+    assert isinstance(message, MoveMessage)
+    assert message.seq == 1
+    with pytest.raises(MessageValidationError):
+        build_message(MessageType.MOVE, {'seq': 1})
+
+
+def test_message_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        Message()
@@ -0,0 +1,89 @@
+"""MNKGame move validation and win detection."""
+import pytest
+
+from history import GameHistory
+from mnk_game import MNKGame
+
+
+def play(game, moves, num_players=2):
+    """Apply (row, col) moves in turn order and return the final state."""
+    state = game.initialize_game(num_players)
+    for row, col in moves:
+        player_id = game.get_current_player(state)
+        move = f"{row},{col}"
+        assert game.validate_move(state, player_id, move) == (True, None)
+        state = game.apply_move(state, player_id, move)
+    return state
+
+
+@pytest.mark.parametrize('first_player_moves', [
+    [(2, 1), (2, 2), (2, 3), (2, 4)],  # row
+    [(1, 3), (2, 3), (3, 3), (4, 3)],  # column
+    [(1, 1), (2, 2), (3, 3), (4, 4)],  # diagonal
+    [(1, 5), (2, 4), (3, 3), (4, 2)],  # anti-diagonal
+])
+def test_k_in_a_row_wins(first_player_moves):
+    game = MNKGame(5, 5, 4)
+    filler = [(5, 1), (5, 2), (5, 3)]
+    moves = [move for pair in zip(first_player_moves, filler + [None]) for move in pair if move]
+    state = play(game, moves)
+    result = game.check_game_over(state)
+    assert result['winner'] == 0 and not result['draw']
+
+
+def test_winning_stone_in_the_middle_of_the_line():
+    game = MNKGame(5, 5, 4)
+    state = play(game, [(3, 1), (1, 1), (3, 2), (1, 2), (3, 4), (1, 4), (3, 3)])
+    assert game.check_game_over(state)['winner'] == 0
+
+
+def test_lines_do_not_wrap_around_rows():
+    game = MNKGame(4, 4, 3)
+    # Cells 3, 4 and 5 in row-major order: the end of row 1 and the start of row 2
+    state = play(game, [(1, 3), (4, 1), (1, 4), (4, 2), (2, 1)])
+    assert game.check_game_over(state) is None
+
+
+def test_k_minus_one_does_not_win():
+    game = MNKGame(5, 5, 4)
+    state = play(game, [(1, 1), (5, 5), (1, 2), (5, 4), (1, 3)])
+    assert game.check_game_over(state) is None
+
+
+def test_full_board_without_line_is_a_draw():
+    game = MNKGame(3, 3, 3)
+    state = play(game, [(1, 1), (1, 2), (1, 3), (2, 2), (2, 1), (2, 3), (3, 2), (3, 1), (3, 3)])
+    result = game.check_game_over(state)
+    assert result['draw'] and result['winner'] is None
+
+
+def test_third_player_can_win():
+    game = MNKGame(4, 4, 3, min_players=3, max_players=3)
+    state = play(game, [(1, 1), (2, 1), (4, 1), (1, 2), (2, 2), (4, 2), (3, 4), (3, 3),
+                        (4, 3)], num_players=3)
+    assert game.check_game_over(state)['winner'] == 2
+
+
+def test_reversible_moves_detect_wins_and_undo():
+    game = MNKGame(3, 3, 3)
+    history = GameHistory(game, game.initialize_game(2))
+    for player_id, move in [(0, '1,1'), (1, '2,1'), (0, '1,2'), (1, '2,2'), (0, '1,3')]:
+        history.play(player_id, move)
+    assert history.check_game_over()['winner'] == 0
+    history.undo()
+    assert history.check_game_over() is None
+    assert history.state['winner'] is None
+
+
+@pytest.mark.parametrize('move', ['0,1', '4,1', '1', 'a,b', None])
+def test_malformed_moves_are_rejected(move):
+    game = MNKGame(3, 3, 3)
+    is_valid, error = game.validate_move(game.initialize_game(2), 0, move)
+    assert not is_valid and error
+
+
+def test_occupied_cell_and_wrong_turn_are_rejected():
+    game = MNKGame(3, 3, 3)
+    state = play(game, [(2, 2)])
+    assert not game.validate_move(state, 1, '2,2')[0]
+    assert not game.validate_move(state, 0, '1,1')[0]
@@ -0,0 +1,91 @@
+"""Framing, compression and frame size limits."""
+import socket
+import zlib
+
+import pytest
+
+from messages import ConnectMessage, ErrorMessage, ServerMessage
+from protocol import COMPRESSED_FLAG, MAX_FRAME_SIZE, Protocol, _SYNC_FLUSH_TAIL, _ZLIB_DICTIONARY
+
+
+@pytest.fixture
+def sockets():
+    left, right = socket.socketpair()
+    left.settimeout(5)
+    right.settimeout(5)
+    yield left, right
+    left.close()
+    right.close()
+
+
+def test_frame_round_trip(sockets):
+    left, right = sockets
+    message = ConnectMessage(options={'game': 'tictactoe', 'name': 'ada'})
+    assert Protocol.send(left, message)
+    assert Protocol.receive_message(right) == message
+
+
+def test_frame_header_is_body_length(sockets):
+    left, _ = sockets
+    encoded = ServerMessage(message='hi').encode()
+    frame = Protocol.encode_frame(left, encoded)
+    assert int.from_bytes(frame[:4], 'big') == len(encoded.encode('utf-8'))
+    assert frame[4:] == encoded.encode('utf-8')
+
+
+def test_receive_returns_none_when_peer_closes(sockets):
+    left, right = sockets
+    left.sendall((10).to_bytes(4, 'big') + b'{"ty')
+    left.close()
+    assert Protocol.receive_message(right) is None
+
+
+def test_compressed_round_trip_keeps_stream_context(sockets):
+    left, right = sockets
+    Protocol.enable_compression(left)
+    Protocol.enable_compression(right)
+    messages = [ServerMessage(message='x' * 1000 + str(index)) for index in range(5)]
+    messages.append(ServerMessage(message='short'))
+    for message in messages:
+        Protocol.send(left, message)
+    for message in messages:
+        assert Protocol.receive_message(right) == message
+
+
+def test_large_frames_are_compressed_and_small_ones_are_not(sockets):
+    left, _ = sockets
+    Protocol.enable_compression(left, threshold=100)
+    large = Protocol.encode_frame(left, ServerMessage(message='a' * 500).encode())
+    small = Protocol.encode_frame(left, ServerMessage(message='a').encode())
+    assert int.from_bytes(large[:4], 'big') & COMPRESSED_FLAG
+    assert len(large) < 500
+    assert not int.from_bytes(small[:4], 'big') & COMPRESSED_FLAG
+
+
+def test_compressed_frame_on_uncompressed_connection(sockets):
+    _, right = sockets
+    message = Protocol.decode_frame(right, 3 | COMPRESSED_FLAG, b'abc')
+    assert isinstance(message, ErrorMessage)
+
+
+def test_body_length_limit():
+    assert Protocol.body_length(MAX_FRAME_SIZE | COMPRESSED_FLAG) == MAX_FRAME_SIZE
+    with pytest.raises(ValueError):
+        Protocol.body_length(MAX_FRAME_SIZE + 1)
+
+
+def test_oversized_header_closes_without_reading_body(sockets):
+    left, right = sockets
+    left.sendall((MAX_FRAME_SIZE + 1).to_bytes(4, 'big'))
+    assert Protocol.receive_message(right) is None
+
+
+def test_decompression_bomb_is_rejected(sockets):
+    _, right = sockets
+    Protocol.enable_compression(right)
+    compressor = zlib.compressobj(wbits=-15, zdict=_ZLIB_DICTIONARY)
+    body = compressor.compress(b' ' * (MAX_FRAME_SIZE + 1)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    body = body[:-len(_SYNC_FLUSH_TAIL)]
+    assert len(body) < MAX_FRAME_SIZE
+    with pytest.raises(ValueError):
+        Protocol.decode_frame(right, len(body) | COMPRESSED_FLAG, body)
@@ -0,0 +1,77 @@
+"""Recording and verifying replays of every registered game."""
+import random
+
+import pytest
+
+from game_interface import TURN_SEQUENTIAL
+from game_registry import BUILTIN_GAMES, GameRegistry
+from replay import (Replay, ReplayEngine, ReplayRecorder, batch_replay, load_replay,
+                    resolve_game)
+
+
+def record_random_game(game_logic, key, directory, seed=0, max_moves=10000):
+    """Play random legal moves, recording them as the server does; return the replay path."""
+    rng = random.Random(seed)
+    num_players = game_logic.get_min_players()
+    state = game_logic.initialize_game(num_players)
+    recorder = ReplayRecorder(str(directory))
+    recorder.start(game_logic.get_game_name(), num_players, state, key)
+    for _ in range(max_moves):
+        if game_logic.check_game_over(state):
+            break
+        if game_logic.get_turn_mode() == TURN_SEQUENTIAL:
+            player_id = game_logic.get_current_player(state)
+            move = rng.choice(game_logic.get_legal_moves(state, player_id))
+            state = game_logic.apply_move(state, player_id, move)
+            recorder.record_move(player_id, move)
+        else:
+            moves = {player_id: rng.choice(game_logic.get_legal_moves(state, player_id))
+                     for player_id in game_logic.get_players_to_move(state)}
+            state = game_logic.apply_moves(state, moves)
+            recorder.record_round(moves)
+    return recorder.finish(game_logic.check_game_over(state))
+
+
+@pytest.mark.parametrize('key', sorted(BUILTIN_GAMES))
+def test_recorded_game_verifies(key, tmp_path):
+    game_logic = GameRegistry.default().get(key)
+    path = record_random_game(game_logic, key, tmp_path)
+    replay = load_replay(path)
+    assert replay.game_key == key
+    engine = ReplayEngine(resolve_game(replay), replay, snapshot_interval=4)
+    assert engine.verify()
+    final_state, result = engine.run()
+    assert result == replay.result
+    assert engine.seek(len(replay.moves)) == final_state
+    assert engine.seek(0) == replay.initial_state
+
+
+@pytest.mark.parametrize('key', sorted(BUILTIN_GAMES))
+def test_changed_result_fails_verification(key, tmp_path):
+    game_logic = GameRegistry.default().get(key)
+    replay = load_replay(record_random_game(game_logic, key, tmp_path, seed=1))
+    replay.result = dict(replay.result, message='Tampered')
+    assert not ReplayEngine(game_logic, replay).verify()
+
+
+def test_invalid_move_fails_verification(tmp_path):
+    game_logic = GameRegistry.default().get('tictactoe')
+    replay = load_replay(record_random_game(game_logic, 'tictactoe', tmp_path))
+    replay.moves[1] = (replay.moves[1][0], replay.moves[0][1])
+    assert not ReplayEngine(game_logic, replay).verify()
+
+
+def test_replays_without_a_key_resolve_by_game_name():
+    game_logic = GameRegistry.default().get('gomoku')
+    replay = Replay(game_logic.get_game_name(), 2, game_logic.initialize_game(2))
+    assert resolve_game(replay).get_game_name() == game_logic.get_game_name()
+
+
+def test_batch_replay_mixes_games(tmp_path):
+    registry = GameRegistry.default()
+    paths = [record_random_game(registry.get(key), key, tmp_path, seed=index)
+             for index, key in enumerate(sorted(BUILTIN_GAMES))]
+    results = batch_replay(paths, processes=1)
+    assert len(results) == len(paths)
+    assert [result['error'] for result in results] == [None] * len(paths)
+    assert all(result['matches'] for result in results)
@@ -0,0 +1,139 @@
+"""SessionTable suspension, eviction, rehydration and resume tokens."""
+import os
+import time
+
+import pytest
+
+from session_store import (SNAPSHOT_EXTENSION, SessionSnapshot, SessionTable, load_snapshot,
+                           save_snapshot)
+from transport import QueueTransport
+
+
+def snapshot(session_id, names=('ada', 'bob'), game_key='tictactoe', suspended_at=None):
+    return SessionSnapshot(session_id, game_key, list(names),
+                           {'board': ['X'] + ['#'] * 8, 'current_player': 1}, time.time(),
+                           moves_played=1, suspended_at=suspended_at,
+                           tokens=[f"token-{name}" for name in names])
+
+
+@pytest.fixture
+def make_table(tmp_path):
+    tables = []
+
+    def make(**options):
+        options.setdefault('sweep_interval', 3600)
+        table = SessionTable(str(tmp_path), **options)
+        tables.append(table)
+        return table
+
+    yield make
+    for table in tables:
+        table.close()
+
+
+def connection():
+    return QueueTransport.pair()[0]
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    original = snapshot(7)
+    path = str(tmp_path / f"7{SNAPSHOT_EXTENSION}")
+    save_snapshot(original, path)
+    loaded = load_snapshot(path)
+    assert loaded.header() == original.header()
+    assert loaded.game_state == original.game_state
+    assert loaded.tokens == original.tokens
+
+
+def test_resume_from_memory(make_table):
+    table = make_table()
+    table.suspend(snapshot(1))
+    assert table.is_suspended('tictactoe', 'ada')
+    assert not table.is_suspended('gomoku', 'ada')
+
+    first = table.rejoin('tictactoe', 'bob', 'token-bob', connection(), 'b')
+    assert first[1] == 1 and first[2] is None
+    restored, player_id, players = table.rejoin('tictactoe', 'ada', 'token-ada', connection(), 'a')
+    assert player_id == 0
+    assert [address for _, address in players] == ['a', 'b']
+    assert restored.game_state['board'][0] == 'X'
+    assert not table.is_suspended('tictactoe', 'ada')
+    assert table.stats()['resumed'] == 1
+    assert table.stats()['memory_used'] == 0
+
+
+def test_rejoin_needs_the_players_token(make_table):
+    table = make_table()
+    table.suspend(snapshot(1))
+    for token in (None, '', 'token-bob', 'token-ada-but-longer'):
+        with pytest.raises(PermissionError):
+            table.rejoin('tictactoe', 'ada', token, connection(), 'a')
+    assert table.rejoin('tictactoe', 'carol', None, connection(), 'c') is None
+    assert table.is_suspended('tictactoe', 'ada')
+
+
+def test_over_budget_sessions_are_evicted_and_rehydrated(make_table, tmp_path):
+    table = make_table(memory_budget=0)
+    table.suspend(snapshot(1))
+    stats = table.stats()
+    assert (stats['in_memory'], stats['on_disk'], stats['evicted']) == (0, 1, 1)
+    assert os.path.exists(tmp_path / f"1{SNAPSHOT_EXTENSION}")
+
+    table.rejoin('tictactoe', 'ada', 'token-ada', connection(), 'a')
+    assert table.stats()['rehydrated'] == 1
+    assert not os.path.exists(tmp_path / f"1{SNAPSHOT_EXTENSION}")
+    _, _, players = table.rejoin('tictactoe', 'bob', 'token-bob', connection(), 'b')
+    assert len(players) == 2
+
+
+def test_least_recently_used_session_is_evicted_first(make_table):
+    first, second = snapshot(1), snapshot(2, names=('cy', 'dee'))
+    table = make_table(memory_budget=first.size + second.size - 1)
+    table.suspend(first)
+    table.suspend(second)
+    sessions = {info['session']: info['in_memory'] for info in table.sessions()}
+    assert sessions == {1: False, 2: True}
+
+
+def test_sessions_with_players_waiting_stay_in_memory(make_table):
+    first = snapshot(1)
+    table = make_table(memory_budget=first.size)
+    table.suspend(first)
+    table.rejoin('tictactoe', 'ada', 'token-ada', connection(), 'a')
+    table.suspend(snapshot(2, names=('cy', 'dee')))
+    sessions = {info['session']: info['in_memory'] for info in table.sessions()}
+    assert sessions == {1: True, 2: False}
+
+
+def test_idle_sessions_go_to_disk_and_expired_ones_are_discarded(make_table):
+    table = make_table(idle_ttl=0, expire_after=60)
+    table.suspend(snapshot(1))
+    table.suspend(snapshot(2, names=('cy', 'dee'), suspended_at=time.time() - 120))
+    table.sweep()
+    stats = table.stats()
+    assert (stats['in_memory'], stats['on_disk'], stats['expired']) == (0, 1, 1)
+    assert not table.is_suspended('tictactoe', 'cy')
+    assert table.is_suspended('tictactoe', 'ada')
+
+
+def test_suspended_sessions_survive_a_restart(make_table):
+    table = make_table()
+    table.suspend(snapshot(5))
+    table.close()
+
+    reopened = make_table()
+    assert reopened.last_session_id == 5
+    assert reopened.is_suspended('tictactoe', 'bob')
+    assert 'tokens' not in reopened.sessions()[0]
+    reopened.rejoin('tictactoe', 'ada', 'token-ada', connection(), 'a')
+    _, _, players = reopened.rejoin('tictactoe', 'bob', 'token-bob', connection(), 'b')
+    assert players is not None
+
+
+def test_reconnecting_again_replaces_the_waiting_connection(make_table):
+    table = make_table()
+    table.suspend(snapshot(1))
+    old = connection()
+    table.rejoin('tictactoe', 'ada', 'token-ada', old, 'a')
+    table.rejoin('tictactoe', 'ada', 'token-ada', connection(), 'a2')
+    assert old.closed
@@ -0,0 +1,98 @@
+"""Board rendering once per state version, and clients that render it themselves."""
+import threading
+from collections import Counter
+
+from client import GameClient
+from game_registry import GameRegistry
+from messages import GameStateMessage, MessageType, MoveMessage
+from server import DEFAULT_CLIENT_OPTIONS, GameServer
+from session import GameSession
+from state_cache import RenderCache
+from tictactoe import TicTacToeGame
+from transport import QueueTransport
+
+
+class CountingTicTacToe(TicTacToeGame):
+    """Tic-Tac-Toe that counts how often each board is rendered."""
+
+    def __init__(self):
+        super().__init__()
+        self.renders = Counter()
+
+    def format_state_for_display(self, game_state):
+        self.renders[tuple(game_state['board'])] += 1
+        return super().format_state_for_display(game_state)
+
+
+def play_first_legal_moves(connection, game, received):
+    """Play the first legal move whenever asked, keeping every message received."""
+    player_id = None
+    while True:
+        message = connection.receive()
+        if message is None or message.message_type == MessageType.GAME_END:
+            return
+        received.append(message)
+        if message.message_type == MessageType.GAME_START:
+            player_id = message.player_id
+        elif message.message_type == MessageType.YOUR_TURN:
+            moves = game.get_legal_moves(message.game_state, player_id)
+            connection.send(MoveMessage(move=moves[0]))
+
+
+def test_render_cache_renders_once_per_version():
+    game = CountingTicTacToe()
+    cache = RenderCache(game)
+    state = game.initialize_game(2)
+    first = cache.get_display(state)
+    assert cache.get_display(state) is first
+    assert sum(game.renders.values()) == 1
+
+    state = game.apply_move(state, 0, '5')
+    cache.invalidate()
+    assert cache.get_display(state) != first
+    assert sum(game.renders.values()) == 2
+
+
+def test_session_renders_each_state_once_and_only_for_clients_that_want_it():
+    game = CountingTicTacToe()
+    server = GameServer(registry=GameRegistry())
+    server.running = True
+    server.logging = True
+    players, bots, received = [], [], []
+    for player_id, board_display in enumerate((True, False)):
+        server_side, client_side = QueueTransport.pair()
+        players.append((server_side, f"player-{player_id}"))
+        server.client_options[server_side] = dict(DEFAULT_CLIENT_OPTIONS,
+                                                  board_display=board_display)
+        received.append([])
+        bot = threading.Thread(target=play_first_legal_moves,
+                               args=(client_side, game, received[player_id]), daemon=True)
+        bot.start()
+        bots.append(bot)
+
+    GameSession(server, game, players).run()
+    for bot in bots:
+        bot.join(5)
+
+    # Every state was rendered once, however many messages and log lines showed it
+    assert game.renders and max(game.renders.values()) == 1
+    states = [message for message in received[0] if message.message_type in
+              (MessageType.YOUR_TURN, MessageType.GAME_STATE, MessageType.MOVE_ACCEPTED)]
+    assert states and all(message.board_display for message in states)
+    assert not any(getattr(message, 'board_display', None) for message in received[1])
+
+
+def test_client_with_game_logic_opts_out_and_renders_locally(capsys):
+    game = TicTacToeGame()
+    _, client_side = QueueTransport.pair()
+    client = GameClient(transport=client_side, game_logic=game)
+    assert client._requested_options()['board_display'] is False
+
+    client.game_state = game.apply_move(game.initialize_game(2), 0, '5')
+    client._show_board(GameStateMessage(game_state=client.game_state))
+    assert game.format_state_for_display(client.game_state) in capsys.readouterr().out
+
+
+def test_client_without_game_logic_asks_for_the_board():
+    _, client_side = QueueTransport.pair()
+    assert GameClient(transport=client_side)._requested_options()['board_display'] is True
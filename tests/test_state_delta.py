@@ -0,0 +1,59 @@
+"""State deltas between game states."""
+import copy
+import json
+import random
+
+import pytest
+
+from mnk_game import GomokuGame
+from state_delta import apply_changes, diff_state
+
+
+def test_changes_rebuild_the_new_state():
+    old = {'board': ['.'] * 8, 'scores': {'a': 1, 'b': 2}, 'gone': True, 'turn': 0}
+    new = {'board': ['.'] * 7 + ['X'], 'scores': {'a': 1, 'b': 3, 'c': 0}, 'turn': 1}
+    changes = diff_state(old, new)
+    assert [['gone']] in changes
+    assert [['board', 7], 'X'] in changes
+    assert apply_changes(old, changes) == new
+
+
+def test_apply_leaves_the_old_state_alone():
+    old = {'nested': {'values': [1, 2, 3]}}
+    before = copy.deepcopy(old)
+    apply_changes(old, diff_state(old, {'nested': {'values': [1, 5, 3]}}))
+    assert old == before
+
+
+def test_mostly_changed_lists_are_sent_whole():
+    changes = diff_state({'row': [0, 0, 0, 0]}, {'row': [1, 1, 1, 0]})
+    assert changes == [[['row'], [1, 1, 1, 0]]]
+
+
+def test_whole_state_replacement():
+    assert apply_changes({'a': 1}, diff_state({'a': 1}, [1])) == [1]
+
+
+def test_changes_apply_the_same_to_json_decoded_states():
+    game = GomokuGame()
+    rng = random.Random(3)
+    state = game.initialize_game(2)
+    client_state = json.loads(json.dumps(state))
+    for _ in range(40):
+        player_id = game.get_current_player(state)
+        new_state = game.apply_move(state, player_id,
+                                    rng.choice(game.get_legal_moves(state, player_id)))
+        changes = json.loads(json.dumps(diff_state(state, new_state)))
+        client_state = apply_changes(client_state, changes)
+        assert client_state == new_state
+        state = new_state
+
+
+@pytest.mark.parametrize('old, new', [
+    ({'scores': {0: 1}}, {'scores': {0: 2}}),
+    ({'scores': {}}, {'scores': {1: 0}}),
+    ({'scores': {1: 0}}, {'scores': {}}),
+])
+def test_non_string_keys_are_rejected(old, new):
+    with pytest.raises(TypeError):
+        diff_state(old, new)
@@ -3,12 +3,19 @@ Tic-Tac-Toe game logic implementation.
 Implements the GameInterface for use with the server-client protocol.
 """
 from game_interface import GameInterface
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, List
 
 
 class TicTacToeGame(GameInterface):
     """Tic-Tac-Toe game implementation."""
     
+    # Board positions of every row, column and diagonal
+    WINNING_LINES = (
+        (0, 1, 2), (3, 4, 5), (6, 7, 8),  # Rows
+        (0, 3, 6), (1, 4, 7), (2, 5, 8),  # Columns
+        (0, 4, 8), (2, 4, 6),             # Diagonals
+    )
+    
     def __init__(self):
         self.symbols = ['X', 'O']
     
@@ -108,6 +115,31 @@ class TicTacToeGame(GameInterface):
         
         return new_state
     
+    def apply_move_reversibly(self, game_state: Dict[str, Any], player_id: int,
+                              move: Any) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """
+        Apply a move in place, recording the cell and counters it changes.
+        
+        Args:
+            game_state: Current game state, changed in place
+            player_id: ID of the player making the move (0-indexed)
+            move: The move to apply
+            
+        Returns:
+            List of (path, previous value) changes
+        """
+        board = game_state['board']
+        position = int(move) - 1
+        changes = [
+            (('board', position), board[position]),
+            (('move_count',), game_state['move_count']),
+            (('current_player',), game_state['current_player']),
+        ]
+        board[position] = self.symbols[player_id]
+        game_state['move_count'] += 1
+        game_state['current_player'] = (player_id + 1) % 2
+        return changes
+    
     def check_game_over(self, game_state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Check if the game is over and determine the result.
@@ -119,17 +151,11 @@ class TicTacToeGame(GameInterface):
             None if game is not over, otherwise a dictionary with game result
         """
         board = game_state['board']
-        winning_positions = [
-            [0, 1, 2], [3, 4, 5], [6, 7, 8],  # Rows
-            [0, 3, 6], [1, 4, 7], [2, 5, 8],  # Columns
-            [0, 4, 8], [2, 4, 6]              # Diagonals
-        ]
         
         # Check for winner
-        for positions in winning_positions:
-            symbols = [board[pos] for pos in positions]
-            if symbols[0] != '#' and all(s == symbols[0] for s in symbols):
-                winner_symbol = symbols[0]
+        for first, second, third in self.WINNING_LINES:
+            winner_symbol = board[first]
+            if winner_symbol != '#' and winner_symbol == board[second] == board[third]:
                 winner_id = self.symbols.index(winner_symbol)
                 return {
                     'over': True,
@@ -149,6 +175,22 @@ class TicTacToeGame(GameInterface):
         
         return None
     
+    def get_legal_moves(self, game_state: Dict[str, Any], 
+                        player_id: int) -> Optional[List[Any]]:
+        """
+        Get the moves a player could legally make.
+        
+        Args:
+            game_state: Current game state
+            player_id: ID of the player to list moves for
+            
+        Returns:
+            List of empty positions as strings '1'-'9'
+        """
+        if game_state['current_player'] != player_id:
+            return []
+        return [str(pos + 1) for pos, val in enumerate(game_state['board']) if val == '#']
+    
     def get_current_player(self, game_state: Dict[str, Any]) -> int:
         """
         Get the ID of the player whose turn it is.
@@ -177,6 +219,15 @@ class TicTacToeGame(GameInterface):
         # Tic-Tac-Toe has no hidden information, return full state
         return game_state.copy()
     
+    def get_private_fields(self) -> Dict[str, Any]:
+        """
+        Tic-Tac-Toe has no private fields, so all players share one view.
+        
+        Returns:
+            Empty dictionary
+        """
+        return {}
+    
     def format_state_for_display(self, game_state: Dict[str, Any]) -> str:
         """
         Format the game state as a string for display.
@@ -0,0 +1,293 @@
+"""
+Optional TLS for server and client connections.
+Contexts enable kernel TLS where the ssl module supports it, and clients
+keep the session tickets of their last connections so reconnects can skip
+the full handshake.
+"""
+import os
+import select
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+from transport import TCPTransport
+
+
+# Oldest protocol version either side accepts
+MINIMUM_TLS_VERSION = ssl.TLSVersion.TLSv1_2
+
+# Session tickets a server issues per handshake; one per expected reconnect
+SERVER_SESSION_TICKETS = 2
+
+
+def _configure(context: ssl.SSLContext, ciphers: Optional[str], ktls: bool):
+    """Apply the options shared by server and client contexts."""
+    context.minimum_version = MINIMUM_TLS_VERSION
+    if ciphers:
+        # Only affects TLS 1.2; TLS 1.3 suites are fixed by OpenSSL
+        context.set_ciphers(ciphers)
+    if ktls and hasattr(ssl, 'OP_ENABLE_KTLS'):
+        # Lets the kernel encrypt records when OpenSSL and the cipher allow it
+        context.options |= ssl.OP_ENABLE_KTLS
+
+
+def server_context(certfile: str, keyfile: Optional[str] = None,
+                   ciphers: Optional[str] = None, ktls: bool = True) -> ssl.SSLContext:
+    """
+    Create a TLS context for GameServer.
+
+    Session tickets are enabled, so returning clients resume their session
+    as long as the server keeps using the same context.
+
+    Args:
+        certfile: PEM certificate chain file
+        keyfile: PEM private key file, if not included in certfile
+        ciphers: OpenSSL cipher string for TLS 1.2, or None for the defaults
+        ktls: Enable kernel TLS offload if available
+
+    Returns:
+        Configured server-side SSLContext
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    _configure(context, ciphers, ktls)
+    context.load_cert_chain(certfile, keyfile)
+    context.num_tickets = SERVER_SESSION_TICKETS
+    return context
+
+
+def client_context(cafile: Optional[str] = None, verify: bool = True,
+                   ciphers: Optional[str] = None, ktls: bool = True) -> ssl.SSLContext:
+    """
+    Create a TLS context for GameClient.
+
+    Args:
+        cafile: PEM file of CAs to trust, e.g. a self-signed server certificate;
+            the system CAs are used if omitted
+        verify: Verify the server certificate and hostname
+        ciphers: OpenSSL cipher string for TLS 1.2, or None for the defaults
+        ktls: Enable kernel TLS offload if available
+
+    Returns:
+        Configured client-side SSLContext
+    """
+    context = ssl.create_default_context(cafile=cafile)
+    _configure(context, ciphers, ktls)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class TLSSessionCache:
+    """Remembers the last TLS session per server for one client context."""
+
+    def __init__(self):
+        self._sessions: Dict[Tuple[str, int], ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int) -> Optional[ssl.SSLSession]:
+        """Get the session to resume with a server, if any."""
+        with self._lock:
+            return self._sessions.get((host, port))
+
+    def put(self, host: str, port: int, session: Optional[ssl.SSLSession]):
+        """Store a session for a server; sessions without a ticket are ignored."""
+        if session is None or not session.has_ticket:
+            return
+        with self._lock:
+            self._sessions[(host, port)] = session
+
+    def clear(self):
+        """Forget all sessions."""
+        with self._lock:
+            self._sessions.clear()
+
+
+# Session caches per client context; sessions can only be resumed by the
+# context that created them
+_session_caches: "weakref.WeakKeyDictionary[ssl.SSLContext, TLSSessionCache]" = \
+    weakref.WeakKeyDictionary()
+_session_caches_lock = threading.Lock()
+
+
+def session_cache_for(context: ssl.SSLContext) -> TLSSessionCache:
+    """Get the session cache shared by every connection made with a context."""
+    with _session_caches_lock:
+        cache = _session_caches.get(context)
+        if cache is None:
+            cache = _session_caches[context] = TLSSessionCache()
+        return cache
+
+
+class _SerializedSSLSocket:
+    """
+    SSLSocket wrapper that never lets two threads into the SSL object at once.
+
+    The session thread waits for moves while admin broadcasts send from
+    another thread, but OpenSSL connections must not be read and written
+    concurrently. Reads and writes are made non-blocking under a lock, and
+    waiting for the socket happens outside it, so a thread waiting for a
+    frame does not hold up one sending.
+    """
+
+    def __init__(self, sock: ssl.SSLSocket):
+        self._sock = sock
+        self._lock = threading.Lock()
+        sock.setblocking(False)
+
+    def __getattr__(self, name: str):
+        # fileno, shutdown, close, session and the rest need no serializing
+        return getattr(self._sock, name)
+
+    def _wait(self, error: ssl.SSLError):
+        """Wait until the socket is ready for the operation OpenSSL asked for."""
+        if isinstance(error, ssl.SSLWantWriteError):
+            select.select([], [self._sock], [])
+        else:
+            select.select([self._sock], [], [])
+
+    def recv(self, size: int) -> bytes:
+        while True:
+            with self._lock:
+                try:
+                    return self._sock.recv(size)
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError) as e:
+                    error = e
+            self._wait(error)
+
+    def sendall(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            with self._lock:
+                try:
+                    view = view[self._sock.send(view):]
+                    continue
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError) as e:
+                    error = e
+            # OpenSSL expects the same data again, which the caller's send lock guarantees
+            self._wait(error)
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._sock.pending()
+
+
+class TLSTransport(TCPTransport):
+    """
+    Transport over a TLS connection.
+
+    Frames are still written with a single sendall of header and body, so
+    each frame up to the maximum record size costs one TLS record.
+    """
+
+    def __init__(self, sock: ssl.SSLSocket, session_cache: Optional[TLSSessionCache] = None,
+                 address: Optional[Tuple[str, int]] = None):
+        """
+        Wrap a connected TLS socket.
+
+        Args:
+            sock: SSLSocket that completed its handshake
+            session_cache: Cache to store the session in when closing (client side)
+            address: (host, port) the session is cached under
+        """
+        super().__init__(sock)
+        self.sock = _SerializedSSLSocket(sock)
+        self.session_cache = session_cache
+        self.address = address
+        # Whether the handshake resumed an earlier session
+        self.session_reused = sock.session_reused
+
+    def pending(self) -> bool:
+        # Decrypted bytes buffered inside the SSL object are invisible to select
+        return self.sock.pending() > 0
+
+    def close(self):
+        if self.session_cache is not None and self.address is not None:
+            try:
+                self.session_cache.put(*self.address, self.sock.session)
+            except (OSError, ValueError):
+                pass
+        super().close()
+
+    @classmethod
+    def connect(cls, host: str, port: int, context: ssl.SSLContext,
+                server_hostname: Optional[str] = None) -> 'TLSTransport':
+        """
+        Open a TLS connection, resuming the last session with the server if possible.
+
+        Args:
+            host: Server host address
+            port: Server port number
+            context: Client SSLContext, e.g. from client_context
+            server_hostname: Name to verify the certificate against (defaults to host)
+
+        Returns:
+            Connected TLSTransport
+        """
+        cache = session_cache_for(context)
+        sock = socket.create_connection((host, port))
+        try:
+            tls_sock = context.wrap_socket(sock, server_hostname=server_hostname or host,
+                                           session=cache.get(host, port))
+        except Exception:
+            sock.close()
+            raise
+        return cls(tls_sock, cache, (host, port))
+
+    @classmethod
+    def accept(cls, sock: socket.socket, context: ssl.SSLContext,
+               timeout: Optional[float] = None) -> 'TLSTransport':
+        """
+        Run the server side of the handshake on an accepted socket.
+
+        Args:
+            sock: Accepted client socket
+            context: Server SSLContext, e.g. from server_context
+            timeout: Seconds the client has to complete the handshake
+
+        Returns:
+            Connected TLSTransport
+
+        Raises:
+            ssl.SSLError, OSError: If the handshake fails or times out
+        """
+        sock.settimeout(timeout)
+        tls_sock = context.wrap_socket(sock, server_side=True)
+        tls_sock.settimeout(None)
+        return cls(tls_sock)
+
+
+def generate_self_signed_cert(directory: str, common_name: str = 'localhost',
+                              days: int = 30) -> Tuple[str, str]:
+    """
+    Create a self-signed certificate for local testing with the openssl CLI.
+
+    Args:
+        directory: Directory to write cert.pem and key.pem to
+        common_name: Host name the certificate is issued for
+        days: Validity period
+
+    Returns:
+        Tuple of (certfile, keyfile)
+
+    Raises:
+        RuntimeError: If the openssl command is unavailable or fails
+    """
+    openssl = shutil.which('openssl')
+    if openssl is None:
+        raise RuntimeError("The openssl command is required to generate certificates")
+    os.makedirs(directory, exist_ok=True)
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    result = subprocess.run(
+        [openssl, 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+         '-nodes', '-keyout', keyfile, '-out', certfile, '-days', str(days),
+         '-subj', f'/CN={common_name}',
+         '-addext', f'subjectAltName=DNS:{common_name},IP:127.0.0.1'],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"openssl failed: {result.stderr.strip()}")
+    return certfile, keyfile
@@ -0,0 +1,555 @@
+"""
+Headless tournaments between move strategies.
+Games are played by calling a GameInterface directly, without sessions or
+sockets, across a process pool. Work is handed out in chunks of games
+between one pair of entrants and workers send back only the counts, so a
+tournament of millions of games moves a few kilobytes between processes.
+"""
+import importlib
+import math
+import random
+import time
+from multiprocessing import Pool
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from game_interface import GameInterface, TURN_SEQUENTIAL, TURN_REALTIME
+from bots import MoveStrategy
+
+
+FORMAT_ROUND_ROBIN = 'round-robin'
+FORMAT_SWISS = 'swiss'
+TOURNAMENT_FORMATS = (FORMAT_ROUND_ROBIN, FORMAT_SWISS)
+
+# Games per work unit handed to a worker process
+DEFAULT_CHUNKSIZE = 2000
+
+# Moves after which a game is stopped and scored as a draw
+DEFAULT_MAX_MOVES = 1000
+
+# Normal quantile of the reported confidence intervals (95%)
+DEFAULT_Z = 1.96
+
+# Creates an entrant's strategy from the game and a seed, e.g. RandomStrategy
+StrategyFactory = Callable[[GameInterface, int], MoveStrategy]
+
+# Games constructed in this worker process, by factory
+_worker_games: Dict[Callable[[], GameInterface], GameInterface] = {}
+
+
+def derive_seed(*parts: int) -> int:
+    """
+    Mix integers into a 64-bit seed.
+
+    Seeds are derived from the tournament seed and the position of a chunk
+    in the schedule, so results do not depend on which process plays it.
+
+    Args:
+        *parts: Integers to mix, e.g. (seed, round, pairing, chunk)
+
+    Returns:
+        Seed between 0 and 2**64 - 1
+    """
+    seed = 0xcbf29ce484222325
+    for part in parts:
+        seed = ((seed ^ (part & 0xffffffffffffffff)) * 0x100000001b3) & 0xffffffffffffffff
+    return seed
+
+
+def score_interval(wins: int, draws: int, losses: int,
+                   z: float = DEFAULT_Z) -> Tuple[float, float, float]:
+    """
+    Estimate a player's expected score with a confidence interval.
+
+    A game scores 1 for a win, 0.5 for a draw and 0 for a loss; the
+    interval is the normal approximation from the per-game variance.
+
+    Args:
+        wins: Games won
+        draws: Games drawn
+        losses: Games lost
+        z: Normal quantile of the interval, e.g. 1.96 for 95%
+
+    Returns:
+        Tuple of (score, low, high), each between 0 and 1
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return 0.5, 0.0, 1.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins + 0.25 * draws) / games - score * score
+    margin = z * math.sqrt(max(variance, 0.0) / games)
+    return score, max(0.0, score - margin), min(1.0, score + margin)
+
+
+def elo_difference(score: float) -> float:
+    """
+    Rating difference that makes a score expected under the Elo model.
+
+    Args:
+        score: Expected score between 0 and 1
+
+    Returns:
+        Elo points; infinite for scores of 0 or 1
+    """
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+class GameFault(Exception):
+    """Raised when a strategy fails to produce a valid move."""
+
+    def __init__(self, player_id: int, message: str):
+        super().__init__(message)
+        self.player_id = player_id
+
+
+def play_game(game_logic: GameInterface, strategies: List[MoveStrategy],
+              max_moves: int = DEFAULT_MAX_MOVES) -> Tuple[Optional[int], int]:
+    """
+    Play one game between strategies, validating every move.
+
+    Strategies see the player's view of the state, unless the game declares
+    that it has no private fields.
+
+    Args:
+        game_logic: GameInterface of the game
+        strategies: Strategy of each player, indexed by player ID
+        max_moves: Moves after which the game is scored as a draw
+
+    Returns:
+        Tuple of (winner player ID or None for a draw, moves played)
+
+    Raises:
+        GameFault: If a strategy raised or chose an invalid move
+    """
+    game_state = game_logic.initialize_game(len(strategies))
+    turn_mode = game_logic.get_turn_mode()
+    shared_view = game_logic.get_private_fields() == {}
+    check_game_over = game_logic.check_game_over
+    validate_move = game_logic.validate_move
+
+    def choose(player_id: int) -> Any:
+        view = game_state if shared_view else \
+            game_logic.get_game_state_for_player(game_state, player_id)
+        try:
+            move = strategies[player_id].choose_move(view, player_id)
+        except Exception as e:
+            raise GameFault(player_id, f"Strategy of player {player_id + 1} failed: {e}")
+        is_valid, error_msg = validate_move(game_state, player_id, move)
+        if not is_valid:
+            raise GameFault(player_id, f"Player {player_id + 1} played {move!r}: {error_msg}")
+        return move
+
+    moves = 0
+    while moves < max_moves:
+        result = check_game_over(game_state)
+        if result:
+            return (None if result.get('draw') else result.get('winner')), moves
+        if turn_mode == TURN_SEQUENTIAL:
+            player_id = game_logic.get_current_player(game_state)
+            game_state = game_logic.apply_move(game_state, player_id, choose(player_id))
+            moves += 1
+        else:
+            if turn_mode == TURN_REALTIME:
+                players = range(len(strategies))
+            else:
+                players = game_logic.get_players_to_move(game_state)
+            round_moves = {player_id: choose(player_id) for player_id in players}
+            game_state = game_logic.apply_moves(game_state, round_moves)
+            moves += len(round_moves)
+    return None, moves
+
+
+class MatchResult:
+    """Games between two entrants, counted from the first entrant's side."""
+
+    __slots__ = ('first', 'second', 'wins', 'losses', 'draws', 'faults', 'opponent_faults',
+                 'errors', 'moves', 'error')
+
+    def __init__(self, first: str, second: str):
+        self.first = first
+        self.second = second
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        # Games lost by either side for an invalid move or a failing strategy
+        self.faults = 0
+        self.opponent_faults = 0
+        # Games aborted by an exception in the game logic, and the first message
+        self.errors = 0
+        self.moves = 0
+        self.error: Optional[str] = None
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.draws
+
+    def add(self, counts: Dict[str, Any]):
+        """Add the counts returned for a chunk of games."""
+        self.wins += counts['wins']
+        self.losses += counts['losses']
+        self.draws += counts['draws']
+        self.faults += counts['faults']
+        self.opponent_faults += counts['opponent_faults']
+        self.errors += counts['errors']
+        self.moves += counts['moves']
+        if self.error is None:
+            self.error = counts['error']
+
+    def interval(self, z: float = DEFAULT_Z) -> Tuple[float, float, float]:
+        """The first entrant's score against the second, with its confidence interval."""
+        return score_interval(self.wins, self.draws, self.losses, z)
+
+    def to_dict(self, z: float = DEFAULT_Z) -> Dict[str, Any]:
+        score, low, high = self.interval(z)
+        return {
+            'first': self.first,
+            'second': self.second,
+            'games': self.games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'draws': self.draws,
+            'faults': self.faults,
+            'opponent_faults': self.opponent_faults,
+            'errors': self.errors,
+            'error': self.error,
+            'score': score,
+            'score_low': low,
+            'score_high': high,
+            'elo': elo_difference(score),
+            'elo_low': elo_difference(low),
+            'elo_high': elo_difference(high),
+        }
+
+
+def _worker_game(game_factory: Callable[[], GameInterface]) -> GameInterface:
+    game_logic = _worker_games.get(game_factory)
+    if game_logic is None:
+        game_logic = _worker_games[game_factory] = game_factory()
+    return game_logic
+
+
+def _play_chunk(work: Tuple) -> Tuple[int, Dict[str, Any]]:
+    """Play a chunk of games between two entrants in a worker process."""
+    index, game_factory, factories, seed, first_game, games, max_moves = work
+    game_logic = _worker_game(game_factory)
+    # Games that draw on the random module are seeded per chunk as well
+    random.seed(seed)
+    first = factories[0](game_logic, derive_seed(seed, 0))
+    second = factories[1](game_logic, derive_seed(seed, 1))
+    counts = {'wins': 0, 'losses': 0, 'draws': 0, 'faults': 0, 'opponent_faults': 0,
+              'errors': 0, 'moves': 0, 'error': None}
+    for game_index in range(first_game, first_game + games):
+        # Entrants take turns playing first
+        first_seat = game_index % 2
+        strategies = [second, first] if first_seat else [first, second]
+        try:
+            winner, moves = play_game(game_logic, strategies, max_moves)
+        except GameFault as e:
+            if e.player_id == first_seat:
+                counts['faults'] += 1
+                counts['losses'] += 1
+            else:
+                counts['opponent_faults'] += 1
+                counts['wins'] += 1
+            if counts['error'] is None:
+                counts['error'] = str(e)
+            continue
+        except Exception as e:
+            counts['errors'] += 1
+            if counts['error'] is None:
+                counts['error'] = f"Game logic failed: {e}"
+            continue
+        counts['moves'] += moves
+        if winner is None:
+            counts['draws'] += 1
+        elif winner == first_seat:
+            counts['wins'] += 1
+        else:
+            counts['losses'] += 1
+    return index, counts
+
+
+class TournamentResult:
+    """Outcome of a tournament: every match and each entrant's points."""
+
+    def __init__(self, tournament_format: str, entrants: List[str]):
+        self.format = tournament_format
+        self.entrants = entrants
+        self.matches: List[MatchResult] = []
+        # Round-robin points are game scores; Swiss points are match points
+        self.points: Dict[str, float] = {name: 0.0 for name in entrants}
+        self.elapsed = 0.0
+
+    @property
+    def games(self) -> int:
+        return sum(match.games + match.errors for match in self.matches)
+
+    def standings(self, z: float = DEFAULT_Z) -> List[Dict[str, Any]]:
+        """
+        Rank the entrants by points, then by score.
+
+        Args:
+            z: Normal quantile of the score intervals
+
+        Returns:
+            One dictionary per entrant, in rank order, with its points,
+            record and overall score with confidence interval
+        """
+        records = {name: [0, 0, 0, 0] for name in self.entrants}
+        for match in self.matches:
+            for name, wins, losses, faults in ((match.first, match.wins, match.losses,
+                                                match.faults),
+                                               (match.second, match.losses, match.wins,
+                                                match.opponent_faults)):
+                record = records[name]
+                record[0] += wins
+                record[1] += losses
+                record[2] += match.draws
+                record[3] += faults
+        standings = []
+        for name, (wins, losses, draws, faults) in records.items():
+            score, low, high = score_interval(wins, draws, losses, z)
+            standings.append({
+                'name': name,
+                'points': self.points[name],
+                'games': wins + losses + draws,
+                'wins': wins,
+                'losses': losses,
+                'draws': draws,
+                'faults': faults,
+                'score': score,
+                'score_low': low,
+                'score_high': high,
+            })
+        standings.sort(key=lambda entry: (-entry['points'], -entry['score'], entry['name']))
+        for rank, entry in enumerate(standings, 1):
+            entry['rank'] = rank
+        return standings
+
+    def format_table(self, z: float = DEFAULT_Z) -> str:
+        """Render the standings and matches as text."""
+        lines = [f"{'#':>3} {'entrant':<24} {'points':>9} {'games':>9} {'W':>8} {'D':>8} "
+                 f"{'L':>8} {'score':>7}  interval"]
+        for entry in self.standings(z):
+            lines.append(f"{entry['rank']:>3} {entry['name']:<24} {entry['points']:>9.1f} "
+                         f"{entry['games']:>9} {entry['wins']:>8} {entry['draws']:>8} "
+                         f"{entry['losses']:>8} {entry['score']:>7.3f}  "
+                         f"[{entry['score_low']:.3f}, {entry['score_high']:.3f}]")
+        lines.append('')
+        for match in self.matches:
+            result = match.to_dict(z)
+            line = (f"{match.first} vs {match.second}: +{match.wins} ={match.draws} "
+                    f"-{match.losses}  score {result['score']:.3f} "
+                    f"[{result['score_low']:.3f}, {result['score_high']:.3f}]  "
+                    f"elo {result['elo']:+.0f} [{result['elo_low']:+.0f}, "
+                    f"{result['elo_high']:+.0f}]")
+            if match.faults or match.opponent_faults or match.errors:
+                line += (f"  faults {match.faults}/{match.opponent_faults} "
+                         f"errors {match.errors}: {match.error}")
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+class Tournament:
+    """Plays round-robin or Swiss tournaments between strategies across processes."""
+
+    def __init__(self, game_factory: Callable[[], GameInterface],
+                 entrants: Dict[str, StrategyFactory], seed: int = 0,
+                 processes: Optional[int] = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                 max_moves: int = DEFAULT_MAX_MOVES):
+        """
+        Initialize the tournament.
+
+        Results are reproducible for the same seed and chunksize, whatever
+        the number of processes.
+
+        Args:
+            game_factory: Picklable callable returning a GameInterface, e.g. the class
+            entrants: Strategy factory by entrant name; factories must be
+                picklable and are called with (game_logic, seed)
+            seed: Seed every game's randomness is derived from
+            processes: Worker processes (defaults to the CPU count); 1 plays
+                in this process
+            chunksize: Games per work unit handed to a worker
+            max_moves: Moves after which a game is scored as a draw
+        """
+        if len(entrants) < 2:
+            raise ValueError("A tournament needs at least two entrants")
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        game_logic = game_factory()
+        if not game_logic.get_min_players() <= 2 <= game_logic.get_max_players():
+            raise ValueError(f"{game_logic.get_game_name()} cannot be played by two players")
+        self.game_factory = game_factory
+        self.entrants = entrants
+        self.seed = seed
+        self.processes = processes
+        self.chunksize = chunksize
+        self.max_moves = max_moves
+
+    def _play_matches(self, pool, round_index: int, pairs: List[Tuple[str, str]],
+                      games: int) -> List[MatchResult]:
+        """Play games between each pair, spreading chunks over the pool."""
+        matches = [MatchResult(first, second) for first, second in pairs]
+        work = []
+        for pair_index, (first, second) in enumerate(pairs):
+            factories = (self.entrants[first], self.entrants[second])
+            for chunk_index, first_game in enumerate(range(0, games, self.chunksize)):
+                seed = derive_seed(self.seed, round_index, pair_index, chunk_index)
+                work.append((pair_index, self.game_factory, factories, seed, first_game,
+                             min(self.chunksize, games - first_game), self.max_moves))
+        chunks = pool.imap_unordered(_play_chunk, work) if pool else map(_play_chunk, work)
+        for pair_index, counts in chunks:
+            matches[pair_index].add(counts)
+        return matches
+
+    def _pool(self):
+        if self.processes == 1:
+            return None
+        return Pool(self.processes)
+
+    def round_robin(self, games_per_pair: int) -> TournamentResult:
+        """
+        Play every entrant against every other one.
+
+        Args:
+            games_per_pair: Games per pair of entrants, alternating who plays first
+
+        Returns:
+            Result whose points are each entrant's total game score
+        """
+        names = list(self.entrants)
+        result = TournamentResult(FORMAT_ROUND_ROBIN, names)
+        pairs = [(names[i], names[j]) for i in range(len(names)) for j in range(i + 1, len(names))]
+        start = time.perf_counter()
+        pool = self._pool()
+        try:
+            result.matches = self._play_matches(pool, 0, pairs, games_per_pair)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        result.elapsed = time.perf_counter() - start
+        for match in result.matches:
+            result.points[match.first] += match.wins + 0.5 * match.draws
+            result.points[match.second] += match.losses + 0.5 * match.draws
+        return result
+
+    def swiss(self, rounds: int, games_per_match: int) -> TournamentResult:
+        """
+        Play rounds pairing entrants with similar points.
+
+        Each round pairs the entrants in standings order with the nearest
+        one they have not met yet; with an odd number of entrants the
+        lowest ranked one without a bye sits out for a point. A match is
+        worth 1 point to the entrant scoring more than half its games and
+        half a point to each on an even score.
+
+        Args:
+            rounds: Number of rounds
+            games_per_match: Games per match, alternating who plays first
+
+        Returns:
+            Result whose points are match points
+        """
+        names = list(self.entrants)
+        result = TournamentResult(FORMAT_SWISS, names)
+        met = set()
+        byes = set()
+        start = time.perf_counter()
+        pool = self._pool()
+        try:
+            for round_index in range(rounds):
+                order = [entry['name'] for entry in result.standings()]
+                if len(order) % 2:
+                    bye = next(name for name in reversed(order) if name not in byes)
+                    byes.add(bye)
+                    order.remove(bye)
+                    result.points[bye] += 1.0
+                pairs = []
+                while order:
+                    first = order.pop(0)
+                    opponent = next((name for name in order
+                                     if frozenset((first, name)) not in met), order[0])
+                    order.remove(opponent)
+                    met.add(frozenset((first, opponent)))
+                    pairs.append((first, opponent))
+                matches = self._play_matches(pool, round_index, pairs, games_per_match)
+                for match in matches:
+                    score = match.interval()[0]
+                    if score > 0.5:
+                        result.points[match.first] += 1.0
+                    elif score < 0.5:
+                        result.points[match.second] += 1.0
+                    else:
+                        result.points[match.first] += 0.5
+                        result.points[match.second] += 0.5
+                result.matches.extend(matches)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        result.elapsed = time.perf_counter() - start
+        return result
+
+
+def _load_factory(spec: str) -> Callable:
+    """Import a 'module:attribute' spec."""
+    module_name, _, attr = spec.partition(':')
+    try:
+        return getattr(importlib.import_module(module_name), attr)
+    except AttributeError:
+        raise ImportError(f"{module_name} has no attribute {attr}")
+
+
+def main():
+    """Run a tournament from the command line."""
+    import argparse
+    from game_registry import GameRegistry, DEFAULT_GAME
+
+    parser = argparse.ArgumentParser(description='Play a headless tournament between strategies')
+    parser.add_argument('--game', default=DEFAULT_GAME, help='Registry key of the game')
+    parser.add_argument('--games-config', default=None, help='JSON file registering extra games')
+    parser.add_argument('--entrant', action='append', default=None, metavar='NAME=MODULE:CLASS',
+                        help='Strategy factory called with (game, seed); repeatable '
+                             '(default: two RandomStrategy entrants)')
+    parser.add_argument('--format', choices=TOURNAMENT_FORMATS, default=FORMAT_ROUND_ROBIN,
+                        help='Tournament format')
+    parser.add_argument('--games', type=int, default=10000,
+                        help='Games per pair (round robin) or per match (Swiss)')
+    parser.add_argument('--rounds', type=int, default=5, help='Swiss rounds')
+    parser.add_argument('--seed', type=int, default=0, help='Tournament seed')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes (defaults to the CPU count)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='Games per work unit')
+    parser.add_argument('--max-moves', type=int, default=DEFAULT_MAX_MOVES,
+                        help='Moves after which a game is a draw')
+
+    args = parser.parse_args()
+
+    game_factory = type(GameRegistry.default(args.games_config).get(args.game))
+    specs = args.entrant or ['random-1=bots:RandomStrategy', 'random-2=bots:RandomStrategy']
+    entrants = {}
+    for spec in specs:
+        name, _, factory = spec.partition('=')
+        if not factory:
+            parser.error(f"--entrant must be NAME=MODULE:CLASS, got {spec!r}")
+        entrants[name] = _load_factory(factory)
+
+    tournament = Tournament(game_factory, entrants, args.seed, args.processes, args.chunksize,
+                            args.max_moves)
+    if args.format == FORMAT_SWISS:
+        result = tournament.swiss(args.rounds, args.games)
+    else:
+        result = tournament.round_robin(args.games)
+    print(result.format_table())
+    print(f"\n{result.games} games in {result.elapsed:.2f}s "
+          f"({result.games / result.elapsed * 60:,.0f} games/min)")
+
+
+if __name__ == "__main__":
+    main()
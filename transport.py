@@ -0,0 +1,292 @@
+"""
+Message transports between the server and its players.
+Sessions talk to players through a Transport instead of a raw socket, so
+the same session loop runs over TCP, Unix-domain sockets, or in-process
+queues that pass message objects without encoding them.
+"""
+import collections
+import os
+import select
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Sequence, Set, Tuple
+from protocol import Protocol, DEFAULT_COMPRESSION_THRESHOLD
+from messages import Message, decode_message
+
+
+# Longest a wait on both sockets and queues goes without checking the queues
+MIXED_POLL_INTERVAL = 0.01
+
+
+class Transport(ABC):
+    """A connection that sends and receives whole protocol messages."""
+
+    # Whether fileno() can be passed to select
+    selectable = True
+
+    @abstractmethod
+    def send(self, message: Message) -> bool:
+        """
+        Send a message.
+
+        Args:
+            message: Message to send
+
+        Returns:
+            True if successful, False otherwise
+        """
+        pass
+
+    @abstractmethod
+    def receive(self) -> Optional[Message]:
+        """
+        Receive the next message, blocking until one arrives.
+
+        Returns:
+            Parsed message object or None if the connection closed
+        """
+        pass
+
+    @abstractmethod
+    def close(self):
+        """Close the connection."""
+        pass
+
+    def pending(self) -> bool:
+        """Check whether a message is already buffered and can be read without waiting."""
+        return False
+
+    def shutdown(self):
+        """Wake up a thread blocked receiving, which then sees the connection closed."""
+        self.close()
+
+    def enable_compression(self, threshold: int = DEFAULT_COMPRESSION_THRESHOLD):
+        """Compress frames from now on, if the transport encodes frames at all."""
+        pass
+
+
+class StreamTransport(Transport):
+    """Transport over a connected stream socket, using the framed wire format."""
+
+    def __init__(self, sock: socket.socket):
+        """
+        Wrap a connected socket.
+
+        Args:
+            sock: Connected stream socket
+        """
+        self.sock = sock
+        # Frames from different threads (e.g. admin broadcasts) must not interleave
+        self.send_lock = threading.Lock()
+
+    def send(self, message: Message) -> bool:
+        with self.send_lock:
+            return Protocol.send(self.sock, message)
+
+    def receive(self) -> Optional[Message]:
+        return Protocol.receive_message(self.sock)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def shutdown(self):
+        # Closing alone does not interrupt a recv blocked in another thread
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def enable_compression(self, threshold: int = DEFAULT_COMPRESSION_THRESHOLD):
+        Protocol.enable_compression(self.sock, threshold)
+
+
+class TCPTransport(StreamTransport):
+    """Transport over a TCP connection."""
+
+    def __init__(self, sock: socket.socket):
+        super().__init__(sock)
+        # Frames are written whole, so there is nothing for Nagle to coalesce
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+    @classmethod
+    def connect(cls, host: str, port: int) -> 'TCPTransport':
+        """Open a TCP connection to a server."""
+        return cls(socket.create_connection((host, port)))
+
+
+class UnixTransport(StreamTransport):
+    """Transport over a Unix-domain socket, a cheaper hop than loopback TCP."""
+
+    @classmethod
+    def connect(cls, path: str) -> 'UnixTransport':
+        """Open a connection to a server listening on a Unix socket path."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            raise
+        return cls(sock)
+
+
+def listen_unix(path: str, backlog: int = 128) -> socket.socket:
+    """
+    Create a listening Unix-domain socket, replacing a stale socket file.
+
+    Args:
+        path: Filesystem path to bind to
+        backlog: Listen backlog
+
+    Returns:
+        Listening socket
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(backlog)
+    return sock
+
+
+# Marks the end of a QueueTransport's inbox
+_EOF = object()
+
+
+class QueueTransport(Transport):
+    """
+    One end of an in-process connection.
+
+    Messages are handed to the other end as objects, so nothing is encoded,
+    framed or copied; both ends must treat received messages as read-only.
+    """
+
+    selectable = False
+
+    def __init__(self, serialize: bool = False):
+        """
+        Create an unconnected end; use pair() to create a connection.
+
+        Args:
+            serialize: Pass messages as JSON strings, for exact wire semantics
+        """
+        self.serialize = serialize
+        self.peer: Optional['QueueTransport'] = None
+        self.closed = False
+        self._inbox: collections.deque = collections.deque()
+        self._ready = threading.Condition()
+        # Events of wait_readable calls waiting on this end
+        self._waiters: Set[threading.Event] = set()
+
+    @classmethod
+    def pair(cls, serialize: bool = False) -> Tuple['QueueTransport', 'QueueTransport']:
+        """
+        Create two connected ends.
+
+        Args:
+            serialize: Pass messages as JSON strings, for exact wire semantics
+
+        Returns:
+            Tuple of (server_end, client_end)
+        """
+        left, right = cls(serialize), cls(serialize)
+        left.peer, right.peer = right, left
+        return left, right
+
+    def _deliver(self, item: Any):
+        with self._ready:
+            self._inbox.append(item)
+            self._ready.notify()
+            waiters = list(self._waiters)
+        for waiter in waiters:
+            waiter.set()
+
+    def send(self, message: Message) -> bool:
+        if self.closed or self.peer is None or self.peer.closed:
+            print("Error sending message: connection closed")
+            return False
+        self.peer._deliver(message.encode() if self.serialize else message)
+        return True
+
+    def receive(self) -> Optional[Message]:
+        with self._ready:
+            while not self._inbox:
+                self._ready.wait()
+            item = self._inbox[0]
+            if item is _EOF:
+                # Leave the marker so every later receive sees the close too
+                return None
+            self._inbox.popleft()
+        return decode_message(item) if self.serialize else item
+
+    def pending(self) -> bool:
+        return bool(self._inbox)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._deliver(_EOF)
+        if self.peer is not None:
+            self.peer._deliver(_EOF)
+
+
+def wait_readable(transports: Sequence[Transport],
+                  timeout: Optional[float] = None) -> List[Transport]:
+    """
+    Wait until at least one transport has a message (or EOF) to read.
+
+    A drop-in replacement for select.select on the read side that also
+    understands in-process queues.
+
+    Args:
+        transports: Transports to wait on
+        timeout: Seconds to wait, or None to wait indefinitely
+
+    Returns:
+        Readable transports in their original order; empty on timeout
+    """
+    ready = [t for t in transports if t.pending()]
+    if ready:
+        return ready
+
+    selectable = [t for t in transports if t.selectable]
+    if len(selectable) == len(transports):
+        readable, _, _ = select.select(selectable, [], [], timeout)
+        return [t for t in transports if t in readable]
+
+    queues = [t for t in transports if not t.selectable]
+    waiter = threading.Event()
+    for transport in queues:
+        transport._waiters.add(waiter)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            waiter.clear()
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable = []
+            if selectable:
+                # Sockets and queues cannot be waited on together, so sockets
+                # are polled in short slices while queues wake us directly
+                poll = 0 if any(t.pending() for t in queues) else MIXED_POLL_INTERVAL
+                if remaining is not None:
+                    poll = min(poll, remaining)
+                readable, _, _ = select.select(selectable, [], [], poll)
+            ready = [t for t in transports if t in readable or t.pending()]
+            if ready or remaining == 0:
+                return ready
+            if not selectable:
+                waiter.wait(remaining)
+    finally:
+        for transport in queues:
+            transport._waiters.discard(waiter)